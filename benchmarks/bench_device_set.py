@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Benchmark reading devices from the device set files against the simctl path.
+
+By default this runs on any platform: a synthetic device set is written to a
+temporary directory, and the simctl path is served from memory (so it covers
+parsing but not the process launch). With `--real`, the user's own device set
+is read and compared against running `xcrun simctl list` (macOS only).
+
+    python benchmarks/bench_device_set.py --output bench_device_set.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+# pylint: disable=wrong-import-position
+import isim
+from isim.base_types import set_list_cache_ttl
+from isim.device_set import DeviceSetReader
+from isim.executor import use_executor
+from isim.fake_simctl import FakeSimctl
+
+from bench_lookups import StaticListExecutor, measure, synthetic_list_output
+
+# pylint: enable=wrong-import-position
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+
+def _recorder(results: List[Dict[str, Any]], device_count: int, repeat: int) -> Callable:
+    """Return a function which measures a benchmark and adds it to the results."""
+
+    def record(name: str, function: Callable[[], Any]) -> None:
+        result = measure(function, repeat)
+        result["benchmark"] = name
+        result["devices"] = device_count
+        results.append(result)
+        print(f"{name:<40} {device_count:>6} devices: {result['median_s'] * 1000:10.3f} ms")
+
+    return record
+
+
+def run_size(device_count: int, repeat: int) -> List[Dict[str, Any]]:
+    """Compare the two paths against a synthetic inventory of the given size."""
+    list_output = synthetic_list_output(device_count)
+    fake = FakeSimctl()
+    fake.devices = list_output["devices"]
+    results: List[Dict[str, Any]] = []
+    record = _recorder(results, device_count, repeat)
+
+    with tempfile.TemporaryDirectory() as device_set_path:
+        fake.write_device_set(device_set_path)
+        reader = DeviceSetReader(device_set_path)
+        serial_reader = DeviceSetReader(device_set_path, max_workers=1)
+
+        with use_executor(StaticListExecutor(list_output)):
+            set_list_cache_ttl(0)
+            record("simctl.Device.list_all", isim.Device.list_all)
+
+        record("device_set.Device.list_all", lambda: isim.Device.list_all(device_set=reader))
+        record(
+            "device_set.serial.Device.list_all",
+            lambda: isim.Device.list_all(device_set=serial_reader),
+        )
+
+    return results
+
+
+def run_real(repeat: int) -> List[Dict[str, Any]]:
+    """Compare the two paths against the user's own devices."""
+    reader = DeviceSetReader()
+    device_count = sum(len(devices) for devices in reader.list_all_raw().values())
+    results: List[Dict[str, Any]] = []
+    record = _recorder(results, device_count, repeat)
+
+    set_list_cache_ttl(0)
+    record("real.simctl.Device.list_all", isim.Device.list_all)
+    record("real.device_set.Device.list_all", lambda: isim.Device.list_all(device_set=reader))
+
+    return results
+
+
+def main() -> None:
+    """Run the benchmarks and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="The inventory sizes (number of devices) to benchmark",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="How many times to run each one")
+    parser.add_argument(
+        "--real", action="store_true", help="Benchmark the real device set and simctl instead"
+    )
+    parser.add_argument(
+        "--output", default="bench_device_set_output.json", help="Where to write results"
+    )
+    arguments = parser.parse_args()
+
+    if arguments.real:
+        results = run_real(arguments.repeat)
+    else:
+        results = []
+        for size in arguments.sizes:
+            results += run_size(size, arguments.repeat)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+    with open(arguments.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    print(f"Results written to {arguments.output}")
+
+
+if __name__ == "__main__":
+    main()
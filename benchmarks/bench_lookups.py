@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Benchmark parsing and lookups over synthetic `simctl list --json` output.
+
+This runs on any platform: the simctl output is generated with the fake
+simctl and served from memory, so the timings cover isim itself rather than
+process launches.
+
+    python benchmarks/bench_lookups.py --output bench.json
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.base_types import SimulatorControlType, set_list_cache_ttl
+from isim.executor import CommandExecutor, use_executor
+from isim.fake_simctl import FakeSimctl
+
+# pylint: enable=wrong-import-position
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+
+
+class StaticListExecutor(CommandExecutor):
+    """Serves pre-generated `simctl list` output so that only isim is measured."""
+
+    outputs: Dict[str, str]
+
+    def __init__(self, list_output: Dict[str, Any]) -> None:
+        self.outputs = {"": json.dumps(list_output, indent=2)}
+        for key, value in list_output.items():
+            self.outputs[key] = json.dumps({key: value}, indent=2)
+
+    def run(self, args: List[str], timeout: Optional[float] = None) -> str:
+        """Return the list output for the command."""
+        del timeout
+        if args[0] != "list":
+            raise ValueError(f"Unsupported command: {args}")
+        keys = [arg for arg in args[1:] if not arg.startswith("-")]
+        return self.outputs[keys[0] if keys else ""]
+
+
+def synthetic_list_output(device_count: int) -> Dict[str, Any]:
+    """Generate `simctl list --json` output with the given number of devices."""
+    fake = FakeSimctl.with_default_inventory()
+    pairings = [
+        (runtime["identifier"], device_type["identifier"], device_type["name"])
+        for runtime in fake.runtimes
+        for device_type in fake.device_types
+        if FakeSimctl.is_compatible(runtime, device_type)
+    ]
+
+    for index in range(device_count):
+        runtime_id, device_type_id, device_type_name = pairings[index % len(pairings)]
+        fake.add_device(f"{device_type_name} ({index})", device_type_id, runtime_id)
+
+    return fake.list_output()
+
+
+def measure(function: Callable[[], Any], repeat: int, track_memory: bool = False) -> Dict[str, Any]:
+    """Time a function, optionally recording its peak memory use."""
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    result: Dict[str, Any] = {
+        "iterations": repeat,
+        "mean_s": statistics.mean(timings),
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "max_s": max(timings),
+    }
+
+    if track_memory:
+        tracemalloc.start()
+        try:
+            function()
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+# pylint: disable=too-many-locals
+def run_size(device_count: int, repeat: int) -> List[Dict[str, Any]]:
+    """Run every benchmark against an inventory of the given size."""
+    list_output = synthetic_list_output(device_count)
+    payload = json.dumps(list_output, indent=2)
+    results = []
+
+    def record(name: str, function: Callable[[], Any], track_memory: bool = False) -> None:
+        result = measure(function, repeat, track_memory)
+        result["benchmark"] = name
+        result["devices"] = device_count
+        results.append(result)
+        print(f"{name:<40} {device_count:>6} devices: {result['median_s'] * 1000:10.3f} ms")
+
+    # Parsing
+    record("parse.json", lambda: json.loads(payload), track_memory=True)
+    record(
+        "parse.Device.from_simctl_info",
+        lambda: isim.Device.from_simctl_info(list_output["devices"]),
+        track_memory=True,
+    )
+    record(
+        "parse.Runtime.from_simctl_info",
+        lambda: isim.Runtime.from_simctl_info(list_output["runtimes"]),
+        track_memory=True,
+    )
+    record(
+        "parse.DeviceType.from_simctl_info",
+        lambda: isim.DeviceType.from_simctl_info(list_output["devicetypes"]),
+        track_memory=True,
+    )
+    record(
+        "parse.DevicePair.from_simctl_info",
+        lambda: isim.DevicePair.from_simctl_info(list_output["pairs"]),
+        track_memory=True,
+    )
+    record(
+        "parse.SimctlSnapshot.full",
+        lambda: isim.Device.index(isim.SimctlSnapshot(json.loads(payload))),
+        track_memory=True,
+    )
+
+    # Lookups, picking targets from the end of the lists (the worst case for a scan)
+    runtime_id = [key for key, value in list_output["devices"].items() if value][-1]
+    device_info = list_output["devices"][runtime_id][-1]
+    runtime_info = [info for info in list_output["runtimes"] if info["identifier"] == runtime_id][0]
+    runtime = isim.Runtime(runtime_info)
+    device_type_info = list_output["devicetypes"][-1]
+
+    lookups: Dict[str, Callable[[], Any]] = {
+        "Device.from_identifier": lambda: isim.Device.from_identifier(device_info["udid"]),
+        "Device.from_name": lambda: isim.Device.from_name(device_info["name"], runtime),
+        "Device.list_all": isim.Device.list_all,
+        "Runtime.from_id": lambda: isim.Runtime.from_id(runtime_info["identifier"]),
+        "Runtime.from_name": lambda: isim.Runtime.from_name(runtime_info["name"]),
+        "DeviceType.from_id": lambda: isim.DeviceType.from_id(device_type_info["identifier"]),
+        "DeviceType.from_name": lambda: isim.DeviceType.from_name(device_type_info["name"]),
+        "DevicePair.list_all": isim.DevicePair.list_all,
+    }
+
+    with use_executor(StaticListExecutor(list_output)):
+        # Every lookup lists and parses again
+        set_list_cache_ttl(0)
+        for name, lookup in lookups.items():
+            record(f"lookup.uncached.{name}", lookup)
+
+        # Lookups are served from the list cache and indexes
+        set_list_cache_ttl(3600)
+        try:
+            for name, lookup in lookups.items():
+                lookup()
+                record(f"lookup.cached.{name}", lookup)
+        finally:
+            set_list_cache_ttl(0)
+
+        # Lookups against a snapshot taken up front
+        snapshot = isim.SimctlSnapshot()
+        for list_type in SimulatorControlType:
+            snapshot.list_type(list_type)
+
+        snapshot_lookups: Dict[str, Callable[[], Any]] = {
+            "Device.from_identifier": lambda: isim.Device.from_identifier(
+                device_info["udid"], snapshot
+            ),
+            "Device.from_name": lambda: isim.Device.from_name(
+                device_info["name"], runtime, snapshot
+            ),
+            "Runtime.from_id": lambda: isim.Runtime.from_id(runtime_info["identifier"], snapshot),
+            "Runtime.from_name": lambda: isim.Runtime.from_name(runtime_info["name"], snapshot),
+            "DeviceType.from_id": lambda: isim.DeviceType.from_id(
+                device_type_info["identifier"], snapshot
+            ),
+            "DeviceType.from_name": lambda: isim.DeviceType.from_name(
+                device_type_info["name"], snapshot
+            ),
+        }
+
+        for name, lookup in snapshot_lookups.items():
+            lookup()
+            record(f"lookup.snapshot.{name}", lookup)
+
+    return results
+
+
+def main() -> None:
+    """Run the benchmarks and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="The inventory sizes (number of devices) to benchmark",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="How many times to run each one")
+    parser.add_argument("--output", default="bench_output.json", help="Where to write results")
+    arguments = parser.parse_args()
+
+    results = []
+    for size in arguments.sizes:
+        results += run_size(size, arguments.repeat)
+
+    try:
+        isim_version: Optional[str] = importlib.metadata.version("isim")
+    except importlib.metadata.PackageNotFoundError:
+        isim_version = None
+
+    report = {
+        "isim": isim_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+    with open(arguments.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    print(f"Results written to {arguments.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,13 @@
 
 import os
 from typing import List, Optional, Union
-import shlex
-import subprocess
 
+from isim.base_types import SimulatorControlBase
 from isim.device import Device, DeviceNotFoundError
 from isim.device_pair import DevicePair
 from isim.device_type import DeviceType, DeviceTypeNotFoundError
 from isim.runtime import Runtime, RuntimeNotFoundError
+from isim.snapshot import SimctlSnapshot
 
 # Advanced:
 
@@ -83,41 +83,33 @@ def diagnose(
     # I'm not entirely sure what the '-l' flag does. It's not documented, but if
     # I don't set it, the command just waits forever without doing anything.
     # LinkedIn use this flag for their Bluepill tool.
-    full_command = [
-        "xcrun",
-        "simctl",
+    command = [
         "diagnose",
         "-l",
         "-b",
         f"--timeout={timeout}",
-        f"--output={shlex.quote(output_path)}",
+        f"--output={output_path}",
     ]
 
     if not archive:
-        full_command.append("--no-archive")
+        command.append("--no-archive")
 
     if include_data_directory:
-        full_command.append("--data-container")
+        command.append("--data-container")
 
     if all_logs:
-        full_command.append("--all-logs")
+        command.append("--all-logs")
 
     if udids is not None:
         if isinstance(udids, str):
-            full_command.append(f"--udid={udids}")
+            command.append(f"--udid={udids}")
         else:
-            full_command += [f"--udid={udid}" for udid in udids]
-
-    command_string = " ".join(full_command)
-
-    # Let the exception bubble up
-    _ = subprocess.run(
-        command_string,
-        universal_newlines=True,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        check=True,
-    )
+            command += [f"--udid={udid}" for udid in udids]
+
+    # The output (with stderr merged in) is streamed and dropped rather than
+    # held in memory, as diagnose can be very chatty. Let the exception bubble up.
+    with SimulatorControlBase.start_command(command) as process:
+        for _ in process.lines():
+            pass
 
     return output_archive
@@ -0,0 +1,4 @@
+"""Async wrapper around `xcrun simctl`, built on asyncio subprocesses."""
+
+from isim.aio.base_types import list_all_types, list_type, run_command, set_concurrency_limit
+from isim.aio.device import AsyncDevice
@@ -0,0 +1,121 @@
+"""Async base types for `xcrun simctl`."""
+
+import asyncio
+import os
+import threading
+from typing import Any, Dict, List
+import weakref
+
+from isim.base_types import (
+    SimulatorControlBase,
+    SimulatorControlType,
+    cached_list_all_types,
+    cached_list_type,
+    remaining_command_time,
+    store_list_all_types,
+    store_list_type,
+    timed_command,
+)
+from isim.executor import get_executor
+
+
+class _ConcurrencyLimit:
+    """Limits how many simctl commands run at once on each event loop."""
+
+    limit: int
+
+    _lock: threading.Lock
+    _semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]"
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def set_limit(self, limit: int) -> None:
+        """Change the limit. Commands which are already running are unaffected."""
+        with self._lock:
+            self.limit = limit
+            self._semaphores = weakref.WeakKeyDictionary()
+
+    def semaphore(self) -> asyncio.Semaphore:
+        """Return the semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.limit)
+                self._semaphores[loop] = semaphore
+
+            return semaphore
+
+
+_CONCURRENCY_LIMIT = _ConcurrencyLimit(os.cpu_count() or 4)
+
+
+def set_concurrency_limit(limit: int) -> None:
+    """Set the maximum number of simctl commands which run at once on an event loop.
+
+    The default is the number of CPUs on the machine.
+    """
+    if limit < 1:
+        raise ValueError("The concurrency limit must be at least 1")
+
+    _CONCURRENCY_LIMIT.set_limit(limit)
+
+
+async def run_command(args: List[str]) -> str:
+    """Run an xcrun simctl command.
+
+    args: The arguments to pass to `xcrun simctl` (e.g. `["boot", udid]`).
+
+    The command is run with `run_async` on the current executor (see
+    `isim.executor.set_executor`).
+
+    Raises `subprocess.CalledProcessError` if the command fails, or
+    `subprocess.TimeoutExpired` if it runs past `isim.base_types.command_timeout`,
+    the same as `SimulatorControlBase.run_command`.
+    """
+    async with _CONCURRENCY_LIMIT.semaphore():
+        timeout = remaining_command_time(["xcrun", "simctl"] + args)
+
+        with timed_command(args) as timer:
+            output = await get_executor().run_async(args, timeout)
+            timer.output = output
+
+        return output
+
+
+async def list_type(item: SimulatorControlType) -> Any:
+    """Run an `xcrun simctl list` command with JSON output.
+
+    This shares the list cache with `SimulatorControlBase.list_type`, so the
+    result must not be modified.
+    """
+    cached, generation, fetch_all = cached_list_type(item)
+
+    if cached is not None:
+        return cached
+
+    if fetch_all:
+        return SimulatorControlBase.extract_list_type(await list_all_types(), item)
+
+    output = await run_command(["list", item.list_key(), "--json"])
+    return store_list_type(item, output, generation)
+
+
+async def list_all_types() -> Dict[str, Any]:
+    """Run `xcrun simctl list --json` once, returning every list type.
+
+    This shares the list cache (and disk cache, if enabled) with
+    `SimulatorControlBase.list_all_types`, so the result must not be modified.
+    """
+    cached, generation, validator = cached_list_all_types()
+
+    if cached is not None:
+        return cached
+
+    output = await run_command(["list", "--json"])
+    return store_list_all_types(output, generation, validator)
@@ -0,0 +1,169 @@
+"""Async operations on simctl devices."""
+
+import asyncio
+import functools
+from typing import Dict, List, Optional, Union
+
+from isim.aio.base_types import list_type, run_command
+from isim.base_types import SimulatorControlType, get_index
+from isim.device import (
+    Device,
+    DeviceIndex,
+    DeviceNotFoundError,
+    invalidate_app_caches,
+    invalidate_device_caches,
+)
+from isim.device_type import DeviceType
+from isim.executor import CommandProcess
+from isim.runtime import Runtime
+
+
+class AsyncDevice:
+    """Async counterpart to `isim.Device`.
+
+    Every method runs its simctl command with `asyncio.create_subprocess_exec`,
+    so many devices can be driven from a single event loop. The number of
+    commands running at once is capped by `isim.aio.set_concurrency_limit`.
+    """
+
+    device: Device
+
+    def __init__(self, device: Device) -> None:
+        """Construct an AsyncDevice.
+
+        device: The device to operate on.
+        """
+        self.device = device
+
+    @property
+    def udid(self) -> str:
+        """Return the UDID of the device."""
+        return self.device.udid
+
+    @property
+    def name(self) -> str:
+        """Return the name of the device."""
+        return self.device.name
+
+    async def boot(self) -> None:
+        """Boot the device."""
+        await run_command(["boot", self.udid])
+
+    async def shutdown(self) -> None:
+        """Shutdown the device."""
+        await run_command(["shutdown", self.udid])
+
+    async def erase(self) -> None:
+        """Erases the device's contents and settings."""
+        try:
+            await run_command(["erase", self.udid])
+        finally:
+            invalidate_device_caches(self.udid)
+
+    async def install(self, path: str) -> None:
+        """Install an application from path."""
+        try:
+            await run_command(["install", self.udid, path])
+        finally:
+            invalidate_app_caches(self.udid, path=path)
+
+    async def uninstall(self, app_identifier: str) -> None:
+        """Uninstall an application by identifier."""
+        try:
+            await run_command(["uninstall", self.udid, app_identifier])
+        finally:
+            invalidate_app_caches(self.udid, bundle_id=app_identifier)
+
+    async def launch(self, identifier: str) -> str:
+        """Launch an application by identifier on a device."""
+        return await run_command(["launch", self.udid, identifier])
+
+    async def spawn_streaming(self, executable: Union[str, List[str]]) -> CommandProcess:
+        """Spawn a process on the device without waiting for it to exit.
+
+        Read the output with `async for line in process`. See
+        `Device.spawn_streaming`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.device.spawn_streaming, executable)
+
+    async def launch_with_console(
+        self,
+        identifier: str,
+        arguments: Optional[List[str]] = None,
+        *,
+        terminate_running_process: bool = False,
+    ) -> CommandProcess:
+        """Launch an application with its console output connected, without waiting for it.
+
+        See `Device.launch_with_console`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(
+                self.device.launch_with_console,
+                identifier,
+                arguments,
+                terminate_running_process=terminate_running_process,
+            ),
+        )
+
+    async def record_video(
+        self, output_path: str, *, codec: Optional[str] = None, force: bool = False
+    ) -> CommandProcess:
+        """Start recording the screen of the device. See `Device.record_video`."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(self.device.record_video, output_path, codec=codec, force=force),
+        )
+
+    async def clone(self, new_name: str) -> str:
+        """Clone the device, returning the UDID of the new device."""
+        device_id = await run_command(["clone", self.udid, new_name])
+
+        # The device ID has a new line at the end. Strip it when returning.
+        return device_id[:-1]
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        return str(self.device)
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return repr(self.device)
+
+    @staticmethod
+    async def index() -> DeviceIndex:
+        """Return the lookup index over all available devices."""
+        device_info = await list_type(SimulatorControlType.DEVICE)
+        return get_index(SimulatorControlType.DEVICE, device_info, DeviceIndex)
+
+    @staticmethod
+    async def from_identifier(identifier: str) -> "AsyncDevice":
+        """Look up an existing device by its UDID."""
+        index = await AsyncDevice.index()
+        device = index.by_udid(identifier)
+
+        if device is None:
+            raise DeviceNotFoundError("No device with ID: " + identifier)
+
+        return AsyncDevice(device)
+
+    @staticmethod
+    async def list_all() -> Dict[str, List["AsyncDevice"]]:
+        """Return all available devices, keyed by runtime ID."""
+        index = await AsyncDevice.index()
+        return {
+            runtime_id: [AsyncDevice(device) for device in devices]
+            for runtime_id, devices in index.devices().items()
+        }
+
+    @staticmethod
+    async def create(name: str, device_type: DeviceType, runtime: Runtime) -> "AsyncDevice":
+        """Create a new device."""
+        device_id = await run_command(["create", name, device_type.identifier, runtime.identifier])
+
+        # The device ID has a new line at the end, so strip it.
+        return await AsyncDevice.from_identifier(device_id[:-1])
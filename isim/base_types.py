@@ -1,10 +1,25 @@
 """Base types for `xcrun simctl`."""
 
+import concurrent.futures
+import contextlib
+import contextvars
 import enum
 import json
-from typing import Any, Dict
+import logging
+import shlex
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+from typing import TYPE_CHECKING
 import subprocess
 
+from isim.executor import CommandProcess, get_executor
+from isim.instrumentation import CommandTimer, record_command
+
+if TYPE_CHECKING:
+    from isim.disk_cache import DiskListCache
+    from isim.snapshot import SimctlSnapshot
+
 
 class ErrorCodes(enum.Enum):
     """Simple lookup for all known error codes."""
@@ -45,8 +60,387 @@ class SimulatorControlType(enum.Enum):
         return self.value + "s"
 
 
+# The key used in the list cache for the full `xcrun simctl list` output
+_ALL_TYPES_KEY = "all"
+
+# Subcommands which change the output of `xcrun simctl list`
+MUTATING_COMMANDS = {
+    "boot",
+    "clone",
+    "create",
+    "delete",
+    "erase",
+    "pair",
+    "pair_activate",
+    "rename",
+    "shutdown",
+    "unpair",
+    "upgrade",
+}
+
+
+def changes_list(args: List[str]) -> bool:
+    """Return True if the command may change the output of `xcrun simctl list`."""
+    if not args:
+        return False
+
+    # `bootstatus -b` boots the device if it isn't already
+    return args[0] in MUTATING_COMMANDS or (args[0] == "bootstatus" and "-b" in args)
+
+
+IndexT = TypeVar("IndexT")
+
+
+class _ListCache:
+    """A process wide, time limited cache of `xcrun simctl list` output.
+
+    Lookup indexes over the cached output are kept alongside it, and dropped
+    along with it.
+    """
+
+    ttl: float
+    generation: int
+    disk: Optional["DiskListCache"]
+
+    _lock: threading.Lock
+    _entries: Dict[str, Tuple[float, Any]]
+    _indexes: Dict[Tuple[SimulatorControlType, int], Tuple[Any, Any]]
+
+    def __init__(self) -> None:
+        self.ttl = 0.0
+        self.generation = 0
+        self.disk = None
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._indexes = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached list output for the key if it is still valid."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            timestamp, value = entry
+
+            if time.monotonic() - timestamp >= self.ttl:
+                del self._entries[key]
+                self._drop_indexes()
+                return None
+
+            return value
+
+    def set(self, key: str, value: Any, generation: int) -> None:
+        """Store list output in the cache (if enabled).
+
+        generation: The cache generation from before the output was fetched. If
+                    the cache has been cleared since, the output may be stale
+                    so it isn't stored.
+        """
+        with self._lock:
+            if self.ttl <= 0 or generation != self.generation:
+                return
+
+            self._entries[key] = (time.monotonic(), value)
+            self._drop_indexes()
+
+    def index(
+        self, item: SimulatorControlType, raw_info: Any, builder: Callable[[Any], IndexT]
+    ) -> IndexT:
+        """Return the lookup index for some list output.
+
+        The index is only kept if the output is in the cache. Otherwise it is
+        built for the one lookup and then dropped.
+        """
+        key = (item, id(raw_info))
+
+        with self._lock:
+            existing = self._indexes.get(key)
+
+            if existing is not None and existing[0] is raw_info:
+                return existing[1]
+
+        index = builder(raw_info)
+
+        with self._lock:
+            if self._holds(item, raw_info):
+                self._indexes[key] = (raw_info, index)
+
+        return index
+
+    def _holds(self, item: SimulatorControlType, raw_info: Any) -> bool:
+        """Check if the list output is in the cache. The lock must be held."""
+        for _, value in self._entries.values():
+            if value is raw_info:
+                return True
+
+            if isinstance(value, dict) and value.get(item.list_key()) is raw_info:
+                return True
+
+        return False
+
+    def _drop_indexes(self) -> None:
+        """Drop the indexes for output no longer in the cache. The lock must be held."""
+        self._indexes = {
+            key: entry for key, entry in self._indexes.items() if self._holds(key[0], entry[0])
+        }
+
+    def clear(self, ttl: Optional[float] = None) -> None:
+        """Drop everything from the cache, optionally changing the TTL."""
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+
+            self.generation += 1
+            self._entries.clear()
+            self._indexes.clear()
+
+
+_LIST_CACHE = _ListCache()
+
+
+def set_list_cache_ttl(ttl: float) -> None:
+    """Set how long, in seconds, `xcrun simctl list` results are cached for.
+
+    The cache is process wide and disabled by default (a TTL of 0). Commands
+    run through isim which change the simulators (create, delete, boot, etc.)
+    invalidate it automatically. Changes made outside of isim are only picked
+    up once the TTL expires, or after calling `invalidate_list_cache()`.
+    """
+    if ttl < 0:
+        raise ValueError("The list cache TTL cannot be negative")
+
+    _LIST_CACHE.clear(ttl)
+
+
+def invalidate_list_cache() -> None:
+    """Drop all cached `xcrun simctl list` results, including any disk cache."""
+    _LIST_CACHE.clear()
+    disk = _LIST_CACHE.disk
+
+    if disk is not None:
+        disk.clear()
+
+
+def set_disk_cache(disk: Optional["DiskListCache"]) -> None:
+    """Set the on-disk cache of `xcrun simctl list` output, or None to not use one.
+
+    See `isim.disk_cache`.
+    """
+    _LIST_CACHE.disk = disk
+    _LIST_CACHE.clear()
+
+
+# The monotonic time by which all commands in the current context must finish
+_COMMAND_DEADLINE: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar(
+    "isim_command_deadline", default=None
+)
+
+
+@contextlib.contextmanager
+def command_timeout(timeout: Optional[float]) -> Iterator[None]:
+    """Limit how long the simctl commands run inside the context can take in total.
+
+    Each command is given whatever time is left. If it runs out, the command
+    is killed and `subprocess.TimeoutExpired` is raised. The timeout applies to
+    the current thread (or asyncio task) only.
+
+    Nested timeouts can only shorten the time available, never extend it.
+
+    timeout: The number of seconds allowed, or None for no limit.
+    """
+    deadline = _COMMAND_DEADLINE.get()
+
+    if timeout is not None:
+        new_deadline = time.monotonic() + timeout
+        deadline = new_deadline if deadline is None else min(deadline, new_deadline)
+
+    token = _COMMAND_DEADLINE.set(deadline)
+
+    try:
+        yield
+    finally:
+        _COMMAND_DEADLINE.reset(token)
+
+
+@contextlib.contextmanager
+def timed_command(args: List[str]) -> Iterator[CommandTimer]:
+    """Time a simctl command for the instrumentation, invalidating the list cache if needed.
+
+    Even a failed command may have changed something. The cache is invalidated
+    before the hooks are called so that they never see stale lists.
+
+    with timed_command(args) as timer:
+        timer.output = run(args)
+    """
+    with CommandTimer(args) as timer:
+        try:
+            yield timer
+        finally:
+            if changes_list(args):
+                invalidate_list_cache()
+
+
+ResultT = TypeVar("ResultT")
+
+
+def submit_in_context(
+    executor: concurrent.futures.Executor, function: Callable[..., ResultT], *args: Any
+) -> "concurrent.futures.Future[ResultT]":
+    """Submit work to an executor, running it in a copy of the current context.
+
+    Worker threads don't otherwise share the context, so any `command_timeout`
+    in effect wouldn't apply to the commands they run.
+    """
+    return executor.submit(contextvars.copy_context().run, function, *args)
+
+
+def remaining_command_time(command: Any) -> Optional[float]:
+    """Return how long the next command may run for in the current context.
+
+    Raises `subprocess.TimeoutExpired` for `command` if there is no time left.
+    """
+    deadline = _COMMAND_DEADLINE.get()
+
+    if deadline is None:
+        return None
+
+    remaining = deadline - time.monotonic()
+
+    if remaining <= 0:
+        raise subprocess.TimeoutExpired(command, 0)
+
+    return remaining
+
+
+def record_cached_list(list_key: Optional[str]) -> None:
+    """Report a list lookup which was served from the list cache to the instrumentation.
+
+    list_key: The list type which was looked up, or None for the full list.
+    """
+    args = ["list", "--json"] if list_key is None else ["list", list_key, "--json"]
+    record_command(args, time.time(), 0.0, None, None, cached=True)
+
+
+def get_index(
+    item: SimulatorControlType,
+    raw_info: Any,
+    builder: Callable[[Any], IndexT],
+    snapshot: Optional["SimctlSnapshot"] = None,
+) -> IndexT:
+    """Return the lookup index for some simctl list output.
+
+    An index is only kept for as long as its output is: for the lifetime of
+    the snapshot, or while the output is in the list cache. Otherwise it is
+    built for the one lookup and then dropped.
+
+    item: The list type the output is for.
+    raw_info: The output of `xcrun simctl list` for the list type.
+    builder: Called with `raw_info` to build a new index if needed.
+    snapshot: The snapshot the output came from, if any.
+    """
+    if snapshot is not None:
+        return snapshot.index(item, raw_info, builder)
+
+    return _LIST_CACHE.index(item, raw_info, builder)
+
+
+def cached_list_type(item: SimulatorControlType) -> Tuple[Optional[Any], int, bool]:
+    """Look for the output of `xcrun simctl list` for a list type in the list cache.
+
+    Returns the cached output (or None), the list cache generation to pass to
+    `store_list_type` if it has to be fetched, and whether the full list should
+    be fetched instead (as only it is kept on disk). Shared by the sync and
+    async APIs.
+    """
+    cached = _LIST_CACHE.get(item.list_key())
+
+    if cached is not None:
+        record_cached_list(item.list_key())
+        return cached, _LIST_CACHE.generation, False
+
+    # If we have the full list cached, it has everything we need
+    all_types = _LIST_CACHE.get(_ALL_TYPES_KEY)
+
+    if all_types is not None:
+        record_cached_list(item.list_key())
+        return (
+            SimulatorControlBase.extract_list_type(all_types, item),
+            _LIST_CACHE.generation,
+            False,
+        )
+
+    return None, _LIST_CACHE.generation, _LIST_CACHE.disk is not None
+
+
+def store_list_type(item: SimulatorControlType, output: str, generation: int) -> Any:
+    """Parse the output of `xcrun simctl list` for a list type and add it to the list cache."""
+    result = SimulatorControlBase.extract_list_type(json.loads(output), item)
+    _LIST_CACHE.set(item.list_key(), result, generation)
+    return result
+
+
+def cached_list_all_types() -> Tuple[Optional[Dict[str, Any]], int, Optional[Dict[str, Any]]]:
+    """Look for the output of `xcrun simctl list --json` in the memory and disk caches.
+
+    Returns the cached output (or None), along with the list cache generation
+    and disk cache validator to pass to `store_list_all_types` if it has to
+    be fetched. Shared by the sync and async APIs.
+    """
+    cached = _LIST_CACHE.get(_ALL_TYPES_KEY)
+
+    if cached is not None:
+        record_cached_list(None)
+        return cached, _LIST_CACHE.generation, None
+
+    generation = _LIST_CACHE.generation
+    disk = _LIST_CACHE.disk
+
+    if disk is None:
+        return None, generation, None
+
+    validator = disk.validator()
+    cached = disk.load(validator)
+
+    if cached is not None:
+        record_cached_list(None)
+        _LIST_CACHE.set(_ALL_TYPES_KEY, cached, generation)
+
+    return cached, generation, validator
+
+
+def store_list_all_types(
+    output: str, generation: int, validator: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Parse the output of `xcrun simctl list --json` and add it to the caches."""
+    json_output = json.loads(output)
+
+    if not isinstance(json_output, dict):
+        raise TypeError("Unexpected list type: " + str(type(json_output)))
+
+    _LIST_CACHE.set(_ALL_TYPES_KEY, json_output, generation)
+    disk = _LIST_CACHE.disk
+
+    # Don't save it if something changed while it was being fetched
+    if disk is not None and validator is not None and generation == _LIST_CACHE.generation:
+        try:
+            disk.save(json_output, validator)
+        except OSError:
+            logging.getLogger("isim").warning("Unable to save the list cache", exc_info=True)
+
+    return json_output
+
+
 class SimulatorControlBase:
-    """Types defined by simctl should inherit from this."""
+    """Types defined by simctl should inherit from this.
+
+    Subclasses use `__slots__` to keep large inventories small. `raw_info` is
+    the dictionary from the simctl output itself rather than a copy, so it is
+    shared with the list cache and snapshots and must not be modified.
+    """
+
+    __slots__ = ("raw_info", "simctl_type")
 
     raw_info: Dict[str, Any]
     simctl_type: SimulatorControlType
@@ -55,12 +449,17 @@ class SimulatorControlBase:
         self.raw_info = raw_info
         self.simctl_type = simctl_type
 
-    def _run_command(self, command: str) -> str:
+    def _run_command(self, command: Union[str, List[str]]) -> str:
         """Convenience method for running an xcrun simctl command."""
         return SimulatorControlBase.run_command(command)
 
+    @property
+    def identity(self) -> str:
+        """Return the stable identifier of the item (e.g. a device's UDID)."""
+        raise NotImplementedError()
+
     def __eq__(self, other: object) -> bool:
-        """Override the default Equals behavior"""
+        """Items are equal if they are the same simctl item, e.g. the same UDID."""
 
         if not isinstance(other, self.__class__):
             return False
@@ -68,44 +467,138 @@ class SimulatorControlBase:
         if not self.simctl_type == other.simctl_type:
             return False
 
-        return self.raw_info == other.raw_info
+        return self.identity == other.identity
 
     def __ne__(self, other: object) -> bool:
         """Define a non-equality test"""
         return not self.__eq__(other)
 
+    def __hash__(self) -> int:
+        """Hash by identity, to match equality."""
+        return hash((self.simctl_type, self.identity))
+
+    def same_identity(self, other: object) -> bool:
+        """Return True if the other item is the same simctl item, even if it has changed.
+
+        This is what `==` checks. It only compares identifiers, so it is cheap.
+        """
+        return self == other
+
+    def same_content(self, other: object) -> bool:
+        """Return True if the other item is the same simctl item and nothing about it differs."""
+        if not self.same_identity(other):
+            return False
+
+        assert isinstance(other, SimulatorControlBase)
+        return self.raw_info is other.raw_info or self.raw_info == other.raw_info
+
     @staticmethod
-    def run_command(command: str) -> str:
-        """Run an xcrun simctl command."""
-        full_command = f"xcrun simctl {command}"
+    def run_command(command: Union[str, List[str]]) -> str:
+        """Run an xcrun simctl command.
+
+        command: The arguments to pass to `xcrun simctl`, e.g. `["boot", udid]`.
+                 These are passed straight to the process without a shell, so
+                 they need no quoting. A string is still accepted for
+                 compatibility and is split using shell syntax.
+
+        The command is run by the current executor (see `isim.executor.set_executor`).
+        """
+        if isinstance(command, str):
+            args = shlex.split(command)
+        else:
+            args = list(command)
+
         # Deliberately don't catch the exception - we want it to bubble up
-        return subprocess.run(
-            full_command,
-            universal_newlines=True,
-            shell=True,
-            check=True,
-            stdout=subprocess.PIPE,
-        ).stdout
+        timeout = remaining_command_time(["xcrun", "simctl"] + args)
+
+        with timed_command(args) as timer:
+            output = get_executor().run(args, timeout)
+            timer.output = output
+
+        return output
+
+    @staticmethod
+    def start_command(command: List[str]) -> CommandProcess:
+        """Start an xcrun simctl command without waiting for it to finish.
+
+        command: The arguments to pass to `xcrun simctl`, e.g. `["bootstatus", udid]`.
+
+        The output can be read line by line as it arrives from the returned
+        process. The command is limited by any `command_timeout` in effect
+        when it is started.
+        """
+        args = list(command)
+        timeout = remaining_command_time(["xcrun", "simctl"] + args)
+        start = time.perf_counter()
+
+        def finished(process: CommandProcess) -> None:
+            error: Optional[BaseException] = None
+
+            if process.timed_out:
+                error = subprocess.TimeoutExpired(process.full_command, timeout or 0)
+            elif process.returncode and not process.stopped:
+                # A command stopped by `close` was meant to stop, so isn't a failure
+                error = subprocess.CalledProcessError(process.returncode, process.full_command)
+
+            if changes_list(args):
+                invalidate_list_cache()
+
+            record_command(
+                args,
+                process.start_time,
+                time.perf_counter() - start,
+                None,
+                error,
+                output_size=process.output_size,
+            )
+
+        process = get_executor().start(args, timeout)
+        process.on_exit.append(finished)
+        return process
 
     @staticmethod
     def list_type(item: SimulatorControlType) -> Any:
-        """Run an `xcrun simctl` command with JSON output."""
-        full_command = f"xcrun simctl list {item.list_key()} --json"
-        # Deliberately don't catch the exception - we want it to bubble up
-        output = subprocess.run(
-            full_command,
-            universal_newlines=True,
-            shell=True,
-            check=True,
-            stdout=subprocess.PIPE,
-        ).stdout
+        """Run an `xcrun simctl` command with JSON output.
 
-        json_output = json.loads(output)
+        The result may come from the list cache (see `set_list_cache_ttl`), so
+        it must not be modified.
+        """
+        cached, generation, fetch_all = cached_list_type(item)
 
+        if cached is not None:
+            return cached
+
+        if fetch_all:
+            return SimulatorControlBase.extract_list_type(
+                SimulatorControlBase.list_all_types(), item
+            )
+
+        output = SimulatorControlBase.run_command(["list", item.list_key(), "--json"])
+        return store_list_type(item, output, generation)
+
+    @staticmethod
+    def list_all_types() -> Dict[str, Any]:
+        """Run `xcrun simctl list --json` once, returning every list type.
+
+        The result may come from the list cache (see `set_list_cache_ttl`), so
+        it must not be modified.
+        """
+        cached, generation, validator = cached_list_all_types()
+
+        if cached is not None:
+            return cached
+
+        output = SimulatorControlBase.run_command(["list", "--json"])
+        return store_list_all_types(output, generation, validator)
+
+    @staticmethod
+    def extract_list_type(json_output: Any, item: SimulatorControlType) -> Any:
+        """Pull the entry for `item` out of the JSON output of `xcrun simctl list`."""
         if not isinstance(json_output, dict):
             raise TypeError("Unexpected list type: " + str(type(json_output)))
 
-        if not json_output.get(item.list_key()):
+        # An empty collection (e.g. no device pairs) is fine, a missing one is not
+        if item.list_key() not in json_output:
             raise ValueError(
                 "Unexpected format for " + item.list_key() + " list type: " + str(json_output)
             )
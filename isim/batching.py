@@ -0,0 +1,256 @@
+"""Add media and install apps without repeating work.
+
+`Device.addmedia` passes every path in a single command, which fails once
+the command line gets too long, and both it and `Device.install` redo the
+work every time they are called. The functions here split media into
+batches which fit on a command line, and skip media and apps which are
+already on the device:
+
+    from isim import batching
+
+    batching.add_media(device, fixture_photos)
+    batching.install(device, "build/MyApp.app")
+
+What has been added to each device is tracked (in memory) by content hash.
+Erasing or deleting a device through isim forgets everything about it, and
+installing or uninstalling an app through isim forgets that app.
+"""
+
+import concurrent.futures
+import os
+import plistlib
+import subprocess
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from isim.base_types import submit_in_context
+from isim.device import Device
+from isim.hashing import hash_file, hash_tree
+
+# The most bytes of arguments to pass in a single `addmedia`. macOS allows
+# 1 MiB for the arguments and environment together, so this leaves plenty
+# of room for the environment.
+DEFAULT_MAX_ARGUMENT_BYTES = 256 * 1024
+
+# Space taken by `xcrun simctl addmedia <udid>` itself
+_COMMAND_OVERHEAD = 256
+
+# Each argument also costs a pointer and a terminating NUL
+_ARGUMENT_OVERHEAD = 9
+
+
+class _DeviceRecords:
+    """What has been added to each device, keyed by UDID."""
+
+    media: Dict[str, Set[str]]
+    apps: Dict[str, Dict[str, str]]
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.media = {}
+        self.apps = {}
+        self.lock = threading.Lock()
+
+    def forget(self, udid: Optional[str] = None) -> None:
+        """Forget what has been added to a device, or to every device if None."""
+        with self.lock:
+            if udid is None:
+                self.media.clear()
+                self.apps.clear()
+            else:
+                self.media.pop(udid, None)
+                self.apps.pop(udid, None)
+
+    def forget_app(self, udid: str, bundle_id: Optional[str] = None) -> None:
+        """Forget an app on a device, or all of the device's apps if None."""
+        with self.lock:
+            if bundle_id is None:
+                self.apps.pop(udid, None)
+            else:
+                self.apps.get(udid, {}).pop(bundle_id, None)
+
+
+_RECORDS = _DeviceRecords()
+
+
+def forget(udid: Optional[str] = None) -> None:
+    """Forget what has been added to a device (or every device, if None).
+
+    Use this if a device has been changed outside of isim.
+    """
+    _RECORDS.forget(udid)
+
+
+def forget_app(udid: str, bundle_id: Optional[str] = None) -> None:
+    """Forget that an app (or any app, if None) has been installed on a device.
+
+    Use this if the app has been installed or removed outside of isim.
+    """
+    _RECORDS.forget_app(udid, bundle_id)
+
+
+def batch_arguments(
+    paths: List[str], max_argument_bytes: int = DEFAULT_MAX_ARGUMENT_BYTES
+) -> List[List[str]]:
+    """Split paths into batches small enough to pass on a single command line."""
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    batch_size = _COMMAND_OVERHEAD
+
+    for path in paths:
+        size = len(os.fsencode(path)) + _ARGUMENT_OVERHEAD
+
+        if batch and batch_size + size > max_argument_bytes:
+            batches.append(batch)
+            batch = []
+            batch_size = _COMMAND_OVERHEAD
+
+        batch.append(path)
+        batch_size += size
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def _media_to_add(device: Device, paths: List[str], max_workers: Optional[int]) -> Dict[str, str]:
+    """Return the digest of each file which hasn't been added to the device, keyed by path.
+
+    Only the first of any files with the same contents is included.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        digests = list(executor.map(hash_file, paths))
+
+    with _RECORDS.lock:
+        already_added = set(_RECORDS.media.get(device.udid, set()))
+
+    to_add: Dict[str, str] = {}
+
+    for path, digest in zip(paths, digests):
+        if digest not in already_added:
+            already_added.add(digest)
+            to_add[path] = digest
+
+    return to_add
+
+
+def add_media(
+    device: Device,
+    paths: List[str],
+    *,
+    max_workers: Optional[int] = None,
+    max_argument_bytes: int = DEFAULT_MAX_ARGUMENT_BYTES,
+) -> List[str]:
+    """Add photos, live photos or videos to the device, skipping any already added.
+
+    Files are compared by content, so a file which has already been added to
+    the device (or appears twice in `paths`) is only added once. The rest are
+    added in batches which fit on a command line, several at once.
+
+    max_workers: The most files to hash, and batches to add, at once.
+    max_argument_bytes: The most bytes of paths to pass to a single `addmedia`.
+
+    Returns the paths which were added. If a batch fails, the first error is
+    raised once the others have finished; the batches which succeeded are
+    still recorded.
+    """
+    digest_for_path = _media_to_add(device, paths, max_workers)
+
+    def add_batch(batch: List[str]) -> None:
+        device.addmedia(batch)
+
+        with _RECORDS.lock:
+            added = _RECORDS.media.setdefault(device.udid, set())
+            added.update(digest_for_path[path] for path in batch)
+
+    batches = batch_arguments(list(digest_for_path), max_argument_bytes)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [submit_in_context(executor, add_batch, batch) for batch in batches]
+
+    for future in futures:
+        error = future.exception()
+
+        if error is not None:
+            raise error
+
+    return list(digest_for_path)
+
+
+def read_bundle_version(path: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """Return the bundle identifier, version and short version from an app's Info.plist."""
+    with open(os.path.join(path, "Info.plist"), "rb") as info_plist_file:
+        info = plistlib.load(info_plist_file)
+
+    return (
+        info["CFBundleIdentifier"],
+        info.get("CFBundleVersion"),
+        info.get("CFBundleShortVersionString"),
+    )
+
+
+def is_installed(
+    device: Device, path: str, digest: str, *, max_workers: Optional[int] = None
+) -> bool:
+    """Return True if the app at `path` is already installed on the device, unchanged.
+
+    The installed app is found with `get_app_container`. Its version must
+    match, and its contents must match `digest` (the `hash_tree` of `path`),
+    either as recorded when isim installed it or by hashing the installed copy.
+    """
+    version = read_bundle_version(path)
+    bundle_id = version[0]
+
+    try:
+        installed_path = device.get_app_container(bundle_id, "app")
+    except subprocess.CalledProcessError:
+        return False
+
+    try:
+        if read_bundle_version(installed_path) != version:
+            return False
+    except (OSError, plistlib.InvalidFileException, KeyError):
+        # The installed copy can't be read (e.g. on a remote Mac), so rely on the record
+        pass
+
+    with _RECORDS.lock:
+        recorded_digest = _RECORDS.apps.get(device.udid, {}).get(bundle_id)
+
+    if recorded_digest is not None:
+        return recorded_digest == digest
+
+    if os.path.isdir(installed_path):
+        return hash_tree(installed_path, max_workers=max_workers) == digest
+
+    return False
+
+
+def install(
+    device: Device,
+    path: str,
+    *,
+    digest: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> bool:
+    """Install the app at `path` on the device, unless it is already installed unchanged.
+
+    digest: The `hash_tree` of `path`, if already known (e.g. when installing
+            the same app on many devices).
+    max_workers: The most files to hash at once.
+
+    Returns True if the app was installed, or False if it was skipped.
+    """
+    if digest is None:
+        digest = hash_tree(path, max_workers=max_workers)
+
+    if is_installed(device, path, digest, max_workers=max_workers):
+        return False
+
+    device.install(path)
+    bundle_id = read_bundle_version(path)[0]
+
+    with _RECORDS.lock:
+        _RECORDS.apps.setdefault(device.udid, {})[bundle_id] = digest
+
+    return True
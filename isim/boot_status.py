@@ -0,0 +1,101 @@
+"""Following a simulator as it boots, using `xcrun simctl bootstatus`."""
+
+import re
+import time
+from typing import Callable, List, Optional
+
+from isim.base_types import SimulatorControlBase, command_timeout
+
+# e.g. "Waiting on System App"
+_PHASE_PATTERN = re.compile(r"^\s*Waiting on (.+?)\s*$")
+
+
+class BootProgress:
+    """A line of `bootstatus` output for a device which is booting."""
+
+    udid: str
+    line: str
+    phase: Optional[str]
+    elapsed: float
+
+    def __init__(self, udid: str, line: str, phase: Optional[str], elapsed: float) -> None:
+        """Construct a BootProgress.
+
+        udid: The UDID of the device.
+        line: The line of output.
+        phase: What the device was last reported to be waiting on (e.g.
+               `System App`), or None if nothing has been reported yet.
+        elapsed: The number of seconds since we started following the boot.
+        """
+        self.udid = udid
+        self.line = line
+        self.phase = phase
+        self.elapsed = elapsed
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        return f"{self.udid} ({self.elapsed:.1f}s): {self.line}"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str(
+            {"udid": self.udid, "line": self.line, "phase": self.phase, "elapsed": self.elapsed}
+        )
+
+
+BootProgressCallback = Callable[[BootProgress], None]
+
+
+def parse_phase(line: str) -> Optional[str]:
+    """Return the phase a line of `bootstatus` output starts, if it starts one."""
+    match = _PHASE_PATTERN.match(line)
+
+    if match is None:
+        return None
+
+    return match.group(1)
+
+
+def follow_boot(
+    udid: str,
+    *,
+    boot: bool = False,
+    timeout: Optional[float] = None,
+    progress: Optional[BootProgressCallback] = None,
+) -> List[BootProgress]:
+    """Wait until a device has finished booting, reporting progress as it happens.
+
+    The output of `bootstatus` is read as it arrives rather than after the
+    command finishes, so there is no polling involved.
+
+    udid: The UDID of the device.
+    boot: If True, boot the device if it isn't already booted.
+    timeout: The number of seconds to wait, or None for no limit. If it runs
+             out, `subprocess.TimeoutExpired` is raised.
+    progress: Called with each line of output as it arrives.
+
+    Returns every line of progress reported. Raises
+    `subprocess.CalledProcessError` if the device fails to boot.
+    """
+    command = ["bootstatus", udid]
+
+    if boot:
+        command.append("-b")
+
+    start = time.monotonic()
+    phase = None
+    reported = []
+
+    with command_timeout(timeout):
+        process = SimulatorControlBase.start_command(command)
+
+    with process:
+        for line in process.lines():
+            phase = parse_phase(line) or phase
+            update = BootProgress(udid, line, phase, time.monotonic() - start)
+            reported.append(update)
+
+            if progress is not None:
+                progress(update)
+
+    return reported
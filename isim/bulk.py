@@ -0,0 +1,193 @@
+"""Run the same operation across many devices in parallel."""
+
+import concurrent.futures
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+from isim import batching
+from isim.base_types import command_timeout
+from isim.boot_status import BootProgress, BootProgressCallback, follow_boot
+from isim.device import Device
+from isim.hashing import hash_tree
+
+ResultT = TypeVar("ResultT")
+
+
+class BulkResult(Generic[ResultT]):
+    """The outcome of running an operation on a single device."""
+
+    udid: str
+    value: Optional[ResultT]
+    error: Optional[BaseException]
+
+    def __init__(
+        self, udid: str, value: Optional[ResultT] = None, error: Optional[BaseException] = None
+    ) -> None:
+        """Construct a BulkResult.
+
+        udid: The UDID of the device the operation ran on.
+        value: The value the operation returned, if it succeeded.
+        error: The exception the operation raised, if it failed. If the
+               operation never ran (because of fail fast), this is a
+               `concurrent.futures.CancelledError`.
+        """
+        self.udid = udid
+        self.value = value
+        self.error = error
+
+    @property
+    def succeeded(self) -> bool:
+        """Return True if the operation completed without raising."""
+        return self.error is None
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        if self.error is None:
+            return f"{self.udid}: {self.value!r}"
+        return f"{self.udid}: {self.error!r}"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str({"udid": self.udid, "value": self.value, "error": self.error})
+
+
+def run_on_devices(
+    devices: List[Device],
+    operation: Callable[[Device], ResultT],
+    *,
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    fail_fast: bool = False,
+) -> Dict[str, BulkResult[ResultT]]:
+    """Run an operation on every device using a bounded pool of threads.
+
+    devices: The devices to run the operation on.
+    operation: Called with each device, e.g. `lambda device: device.erase()`.
+    max_workers: The most devices to work on at once. Defaults to the
+                 `concurrent.futures.ThreadPoolExecutor` default.
+    timeout: The number of seconds the simctl commands for a single device may
+             take in total. Commands still running at the limit are killed and
+             the device's result holds a `subprocess.TimeoutExpired`.
+    fail_fast: If True, no new devices are started once one fails. Devices
+               already in progress are allowed to finish. Devices which never
+               started get a `concurrent.futures.CancelledError`.
+
+    Returns the result for each device, keyed by UDID. Exceptions raised by
+    the operation are captured in the results rather than raised.
+    """
+
+    def run_one(device: Device) -> ResultT:
+        with command_timeout(timeout):
+            return operation(device)
+
+    results: Dict[str, BulkResult[ResultT]] = {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_one, device): device for device in devices}
+
+        for future in concurrent.futures.as_completed(futures):
+            device = futures[future]
+
+            if future.cancelled():
+                results[device.udid] = BulkResult(
+                    device.udid, error=concurrent.futures.CancelledError()
+                )
+                continue
+
+            error = future.exception()
+
+            if error is None:
+                results[device.udid] = BulkResult(device.udid, value=future.result())
+                continue
+
+            results[device.udid] = BulkResult(device.udid, error=error)
+
+            if fail_fast:
+                for other_future in futures:
+                    other_future.cancel()
+
+    # Keep the results in the same order as the devices that were passed in
+    return {device.udid: results[device.udid] for device in devices}
+
+
+def boot(devices: List[Device], **kwargs: Any) -> Dict[str, BulkResult[None]]:
+    """Boot each of the devices. See `run_on_devices` for the arguments."""
+    return run_on_devices(devices, lambda device: device.boot(), **kwargs)
+
+
+def wait_until_booted(
+    devices: List[Device],
+    *,
+    boot: bool = True,  # pylint: disable=redefined-outer-name
+    progress: Optional[BootProgressCallback] = None,
+    **kwargs: Any,
+) -> Dict[str, BulkResult[List[BootProgress]]]:
+    """Wait for all of the devices to finish booting, following them all at once.
+
+    Every device is followed at the same time (unless `max_workers` is set),
+    so the total wait is that of the slowest device.
+
+    boot: If True, boot any devices which aren't already booted.
+    progress: Called with each progress update as it arrives. It is called
+              from several threads, possibly at the same time.
+
+    See `run_on_devices` for the other arguments.
+    """
+    kwargs.setdefault("max_workers", max(len(devices), 1))
+    return run_on_devices(
+        devices,
+        lambda device: follow_boot(device.udid, boot=boot, progress=progress),
+        **kwargs,
+    )
+
+
+def shutdown(devices: List[Device], **kwargs: Any) -> Dict[str, BulkResult[None]]:
+    """Shutdown each of the devices. See `run_on_devices` for the arguments."""
+    return run_on_devices(devices, lambda device: device.shutdown(), **kwargs)
+
+
+def erase(devices: List[Device], **kwargs: Any) -> Dict[str, BulkResult[None]]:
+    """Erase each of the devices. See `run_on_devices` for the arguments."""
+    return run_on_devices(devices, lambda device: device.erase(), **kwargs)
+
+
+def install(devices: List[Device], path: str, **kwargs: Any) -> Dict[str, BulkResult[None]]:
+    """Install the app at `path` on each of the devices. See `run_on_devices` for the arguments."""
+    return run_on_devices(devices, lambda device: device.install(path), **kwargs)
+
+
+def install_if_changed(
+    devices: List[Device], path: str, **kwargs: Any
+) -> Dict[str, BulkResult[bool]]:
+    """Install the app at `path` on each device it isn't already installed on, unchanged.
+
+    The app is hashed once for all of the devices. Each result is True if
+    the app was installed. See `batching.install` and `run_on_devices` for
+    the arguments.
+    """
+    digest = hash_tree(path)
+    return run_on_devices(
+        devices, lambda device: batching.install(device, path, digest=digest), **kwargs
+    )
+
+
+def add_media(
+    devices: List[Device], paths: List[str], **kwargs: Any
+) -> Dict[str, BulkResult[List[str]]]:
+    """Add media to each device, skipping files already added to it.
+
+    Each result is the paths added. See `batching.add_media` and
+    `run_on_devices` for the arguments.
+    """
+    return run_on_devices(devices, lambda device: batching.add_media(device, paths), **kwargs)
+
+
+def uninstall(
+    devices: List[Device], app_identifier: str, **kwargs: Any
+) -> Dict[str, BulkResult[None]]:
+    """Uninstall the app from each of the devices. See `run_on_devices` for the arguments."""
+    return run_on_devices(devices, lambda device: device.uninstall(app_identifier), **kwargs)
+
+
+def launch(devices: List[Device], identifier: str, **kwargs: Any) -> Dict[str, BulkResult[str]]:
+    """Launch the app on each of the devices. See `run_on_devices` for the arguments."""
+    return run_on_devices(devices, lambda device: device.launch(identifier), **kwargs)
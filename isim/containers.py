@@ -0,0 +1,213 @@
+"""Resolve many app containers at once, with a cache per device.
+
+`Device.get_app_container` runs simctl for every (app, container kind)
+pair. `resolve_containers` (used by `Device.get_app_containers`) runs the
+lookups concurrently and caches the results for each device until an app
+is installed or uninstalled, or the device is erased or deleted, through
+isim.
+
+The containers can also be found by reading the metadata CoreSimulator
+keeps in each container directory, which resolves every container on the
+device without running simctl at all.
+"""
+
+import concurrent.futures
+import os
+import plistlib
+import subprocess
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from isim.base_types import SimulatorControlBase, submit_in_context
+
+# The file in each container directory which says what the container belongs to
+METADATA_FILE_NAME = ".com.apple.mobile_container_manager.metadata.plist"
+
+# (bundle identifier, container kind)
+ContainerKey = Tuple[str, str]
+
+
+class _ContainerCache:
+    """The resolved containers of each device, keyed by UDID."""
+
+    containers: Dict[str, Dict[ContainerKey, str]]
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.containers = {}
+        self.lock = threading.Lock()
+
+    def get(self, udid: str, key: ContainerKey) -> Optional[str]:
+        """Return a cached container path, if there is one."""
+        with self.lock:
+            return self.containers.get(udid, {}).get(key)
+
+    def update(self, udid: str, containers: Dict[ContainerKey, str]) -> None:
+        """Add resolved containers to the cache."""
+        with self.lock:
+            self.containers.setdefault(udid, {}).update(containers)
+
+    def forget(self, udid: Optional[str] = None) -> None:
+        """Forget the containers of a device, or of every device if None."""
+        with self.lock:
+            if udid is None:
+                self.containers.clear()
+            else:
+                self.containers.pop(udid, None)
+
+
+_CACHE = _ContainerCache()
+
+
+def forget(udid: Optional[str] = None) -> None:
+    """Forget the cached containers of a device (or every device, if None).
+
+    Use this if apps have been installed or removed outside of isim.
+    """
+    _CACHE.forget(udid)
+
+
+def _read_metadata(path: str) -> Optional[str]:
+    """Return the identifier a container belongs to, from its metadata file."""
+    try:
+        with open(os.path.join(path, METADATA_FILE_NAME), "rb") as metadata_file:
+            return plistlib.load(metadata_file).get("MCMMetadataIdentifier")
+    except (OSError, plistlib.InvalidFileException, AttributeError):
+        return None
+
+
+def _app_bundle(container_path: str) -> Optional[str]:
+    """Return the .app inside an app bundle container."""
+    try:
+        names = os.listdir(container_path)
+    except OSError:
+        return None
+
+    for name in names:
+        if name.endswith(".app"):
+            return os.path.join(container_path, name)
+
+    return None
+
+
+def read_containers(
+    data_path: str, *, max_workers: Optional[int] = None
+) -> Dict[ContainerKey, str]:
+    """Find every container on a device from the metadata on disk.
+
+    data_path: The device's data directory (`Device.raw_info["dataPath"]`).
+    max_workers: The most metadata files to read at once.
+
+    Returns the containers keyed by (identifier, kind), where the kind is
+    "app" or "data" for apps, and the group identifier for app groups (with
+    the group identifier also used as the first part of the key).
+    """
+    directories: List[Tuple[str, str]] = []
+
+    for kind, relative_path in [
+        ("app", os.path.join("Containers", "Bundle", "Application")),
+        ("data", os.path.join("Containers", "Data", "Application")),
+        ("group", os.path.join("Containers", "Shared", "AppGroup")),
+    ]:
+        root = os.path.join(data_path, relative_path)
+
+        try:
+            names = os.listdir(root)
+        except OSError:
+            continue
+
+        directories += [(kind, os.path.join(root, name)) for name in names]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        identifiers = list(executor.map(_read_metadata, [path for _, path in directories]))
+
+    containers: Dict[ContainerKey, str] = {}
+
+    for (kind, path), identifier in zip(directories, identifiers):
+        if identifier is None:
+            continue
+
+        if kind == "group":
+            containers[(identifier, identifier)] = path
+        elif kind == "app":
+            bundle_path = _app_bundle(path)
+            if bundle_path is not None:
+                containers[(identifier, "app")] = bundle_path
+        else:
+            containers[(identifier, kind)] = path
+
+    return containers
+
+
+def _lookup(udid: str, key: ContainerKey) -> Optional[str]:
+    """Look up a container with simctl, returning None if the app isn't installed."""
+    try:
+        output = SimulatorControlBase.run_command(["get_app_container", udid, *key])
+    except subprocess.CalledProcessError:
+        return None
+
+    return output[:-1] if output.endswith("\n") else output
+
+
+def _lookup_all(
+    udid: str, keys: List[ContainerKey], max_workers: Optional[int]
+) -> Dict[ContainerKey, Optional[str]]:
+    """Look up containers with simctl concurrently, caching those found."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {key: submit_in_context(executor, _lookup, udid, key) for key in keys}
+
+    results = {key: future.result() for key, future in futures.items()}
+    _CACHE.update(udid, {key: path for key, path in results.items() if path is not None})
+    return results
+
+
+def resolve_containers(
+    udid: str,
+    bundle_ids: Iterable[str],
+    kinds: Iterable[str] = ("app",),
+    *,
+    data_path: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Dict[str, Optional[str]]]:
+    """Resolve the containers of many apps on a device.
+
+    udid: The UDID of the device.
+    bundle_ids: The bundle identifiers of the apps.
+    kinds: The kinds of container to look up: "app", "data", "groups" or an
+           app group identifier.
+    data_path: If set, the device's data directory. The containers are read
+               from the metadata on disk first, and simctl is only used for
+               any which aren't found there.
+    max_workers: The most lookups to run at once.
+
+    Returns the path of each container, keyed by bundle identifier and then
+    kind. Containers of apps which aren't installed are None.
+    """
+    kinds = list(kinds)
+    keys = [(bundle_id, kind) for bundle_id in bundle_ids for kind in kinds]
+    resolved: Dict[ContainerKey, Optional[str]] = {}
+
+    for key in keys:
+        resolved[key] = _CACHE.get(udid, key)
+
+    missing = [key for key in keys if resolved[key] is None]
+
+    if missing and data_path is not None:
+        on_disk = read_containers(data_path, max_workers=max_workers)
+        _CACHE.update(udid, on_disk)
+
+        for key in missing:
+            # Group containers are keyed by the group, whichever app asks for them
+            resolved[key] = on_disk.get(key) or on_disk.get((key[1], key[1]))
+
+        missing = [key for key in missing if resolved[key] is None]
+
+    if missing:
+        resolved.update(_lookup_all(udid, missing, max_workers))
+
+    results: Dict[str, Dict[str, Optional[str]]] = {}
+
+    for (bundle_id, kind), path in resolved.items():
+        results.setdefault(bundle_id, {})[kind] = path
+
+    return results
@@ -3,13 +3,23 @@
 # pylint: disable=too-many-public-methods
 
 import os
-import re
+import plistlib
 import shlex
-from typing import Any, Dict, List, Optional, Union
+import signal
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union, TYPE_CHECKING
 
 from isim.runtime import Runtime
 from isim.device_type import DeviceType
-from isim.base_types import SimulatorControlBase, SimulatorControlType
+from isim.boot_status import BootProgress, BootProgressCallback, follow_boot
+from isim.containers import forget as forget_containers, resolve_containers
+from isim.install_logs import find_data_container
+from isim.base_types import SimulatorControlBase, SimulatorControlType, get_index
+from isim.executor import CommandProcess
+
+
+if TYPE_CHECKING:
+    from isim.device_set import DeviceSetReader
+    from isim.snapshot import SimctlSnapshot
 
 
 class MultipleMatchesException(Exception):
@@ -24,10 +34,59 @@ class InvalidDeviceError(Exception):
     """Raised when a device is not of the correct type."""
 
 
+def invalidate_app_caches(
+    udid: str, *, path: Optional[str] = None, bundle_id: Optional[str] = None
+) -> None:
+    """Drop what isim has cached about the apps on a device.
+
+    This is done by `Device.install` and `Device.uninstall`. The device's
+    containers are dropped, along with the `isim.batching` record of the app
+    (or of every app, if it isn't known).
+
+    path: The path of the app which was installed, if known.
+    bundle_id: The bundle identifier of the app which changed, if known.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from isim import batching
+
+    if bundle_id is None and path is not None:
+        try:
+            bundle_id = batching.read_bundle_version(path)[0]
+        except (OSError, plistlib.InvalidFileException, KeyError):
+            pass
+
+    forget_containers(udid)
+    batching.forget_app(udid, bundle_id)
+
+
+def invalidate_device_caches(udid: Optional[str] = None) -> None:
+    """Drop everything isim has cached about the contents of a device (or every device, if None).
+
+    This is done when a device is erased or deleted.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from isim import batching
+
+    forget_containers(udid)
+    batching.forget(udid)
+
+
 # pylint: disable=too-many-instance-attributes
 class Device(SimulatorControlBase):
     """Represents a device for the iOS simulator."""
 
+    __slots__ = (
+        "availability",
+        "is_available",
+        "name",
+        "runtime_id",
+        "device_type_id",
+        "state",
+        "udid",
+        "_runtime",
+        "_device_type",
+    )
+
     raw_info: Dict[str, Any]
 
     availability: Optional[str]
@@ -70,26 +129,32 @@ class Device(SimulatorControlBase):
         self.state = device.state
         self.udid = device.udid
 
-    def runtime(self) -> Runtime:
-        """Return the runtime of the device."""
+    def runtime(self, snapshot: Optional["SimctlSnapshot"] = None) -> Runtime:
+        """Return the runtime of the device.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
         if self._runtime is None:
-            self._runtime = Runtime.from_id(self.runtime_id)
+            self._runtime = Runtime.from_id(self.runtime_id, snapshot)
 
         return self._runtime
 
-    def device_type(self) -> DeviceType:
-        """Return the device type of the device."""
+    def device_type(self, snapshot: Optional["SimctlSnapshot"] = None) -> DeviceType:
+        """Return the device type of the device.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
         if self._device_type is None:
-            self._device_type = DeviceType.from_id(self.device_type_id)
+            self._device_type = DeviceType.from_id(self.device_type_id, snapshot)
 
         return self._device_type
 
     def get_app_container(self, app_identifier: str, container: Optional[str] = None) -> str:
         """Get the path of the installed app's container."""
-        command = f'get_app_container "{self.udid}" "{app_identifier}"'
+        command = ["get_app_container", self.udid, app_identifier]
 
         if container is not None:
-            command += f' "{container}"'
+            command.append(container)
 
         path = self._run_command(command)
 
@@ -98,13 +163,46 @@ class Device(SimulatorControlBase):
         return path[:-1]
         # pylint: enable=unsubscriptable-object
 
+    def get_app_containers(
+        self,
+        app_identifiers: Iterable[str],
+        containers: Iterable[str] = ("app",),
+        *,
+        from_disk: bool = False,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, Dict[str, Optional[str]]]:
+        """Get the paths of many containers at once.
+
+        app_identifiers: The bundle identifiers of the apps.
+        containers: The containers to get for each app: "app", "data",
+                    "groups" or an app group identifier.
+        from_disk: Read the container metadata in the device's data directory
+                   rather than running simctl for each container (simctl is
+                   still used for any which can't be found).
+        max_workers: The most lookups to run at once.
+
+        Returns the paths keyed by app identifier and then container. The
+        containers of apps which aren't installed are None. Results are cached
+        until an app is installed or uninstalled, or the device is erased or
+        deleted.
+        """
+        return resolve_containers(
+            self.udid,
+            app_identifiers,
+            containers,
+            data_path=self.raw_info.get("dataPath") if from_disk else None,
+            max_workers=max_workers,
+        )
+
     def get_data_directory(self, app_identifier: str) -> Optional[str]:
         """Get the path of the data directory for the app. (The location where
         the app can store data, files, etc.)
 
         There's no real way of doing this. This method works by scanning the
         installation logs for the simulator to try and find out where the app
-        actually lives.
+        actually lives. The logs are read backwards from the end and what was
+        learned is cached (see `isim.install_logs`), so repeated lookups don't
+        re-read unchanged logs.
         """
         app_container = self.get_app_container(app_identifier)
 
@@ -122,47 +220,34 @@ class Device(SimulatorControlBase):
         # We sort these since we want the latest file (.0) first
         log_file_names = sorted(log_file_names)
 
-        container_pattern = re.compile(f".*Data container for {app_identifier} is now at (.*)")
-
-        # We are looking for the last match in the file
+        # We are looking for the last match, starting with the latest file
         for log_file in log_file_names:
             log_path = os.path.join(mobile_installation_folder, log_file)
+            container = find_data_container(log_path, app_identifier)
 
-            with open(log_path, "r", encoding="utf-8") as log_file_handle:
-                log_lines = log_file_handle.readlines()
-
-            # We want the last mention in the file (i.e. the latest)
-            log_lines.reverse()
-
-            for line in log_lines:
-                matches = container_pattern.findall(line.strip())
-
-                if not matches:
-                    continue
-
-                # We found a match, so return it
-                return matches[0]
+            if container is not None:
+                return container
 
         return None
 
     def openurl(self, url: str) -> None:
         """Open the url on the device."""
-        command = f'openurl "{self.udid}" "{url}"'
+        command = ["openurl", self.udid, url]
         self._run_command(command)
 
     def logverbose(self, enable: bool) -> None:
         """Enable or disable verbose logging."""
-        command = f'logverbose "{self.udid}" "{"enable" if enable else "disable"}"'
+        command = ["logverbose", self.udid, "enable" if enable else "disable"]
         self._run_command(command)
 
     def icloud_sync(self) -> None:
         """Trigger iCloud sync."""
-        command = f'icloud_sync "{self.udid}"'
+        command = ["icloud_sync", self.udid]
         self._run_command(command)
 
     def getenv(self, variable_name: str) -> str:
         """Return the specified environment variable."""
-        command = f'getenv "{self.udid}" "{variable_name}"'
+        command = ["getenv", self.udid, variable_name]
         variable = self._run_command(command)
         # The variable has an extra new line at the end, so remove it when returning
         # pylint: disable=unsubscriptable-object
@@ -177,70 +262,102 @@ class Device(SimulatorControlBase):
         if not paths:
             return
 
-        command = f'addmedia "{self.udid}" '
-
-        # Now we need to add the paths
-        quoted_paths = ['"' + path + '"' for path in paths]
-        paths_arg = " ".join(quoted_paths)
-        command += paths_arg
-
+        command = ["addmedia", self.udid] + paths
         self._run_command(command)
 
     def terminate(self, app_identifier: str) -> None:
         """Terminate an application by identifier."""
-        command = f'terminate "{self.udid}" "{app_identifier}"'
+        command = ["terminate", self.udid, app_identifier]
         self._run_command(command)
 
     def install(self, path: str) -> None:
         """Install an application from path."""
-        command = f'install "{self.udid}" "{path}"'
-        self._run_command(command)
+        command = ["install", self.udid, path]
+
+        # Even a failed install may have replaced the app
+        try:
+            self._run_command(command)
+        finally:
+            invalidate_app_caches(self.udid, path=path)
 
     def uninstall(self, app_identifier: str) -> None:
         """Uninstall an application by identifier."""
-        command = f'uninstall "{self.udid}" "{app_identifier}"'
-        self._run_command(command)
+        command = ["uninstall", self.udid, app_identifier]
+
+        try:
+            self._run_command(command)
+        finally:
+            invalidate_app_caches(self.udid, bundle_id=app_identifier)
 
     def delete(self) -> None:
         """Delete the device."""
-        command = f'delete "{self.udid}"'
-        self._run_command(command)
+        command = ["delete", self.udid]
+
+        try:
+            self._run_command(command)
+        finally:
+            invalidate_device_caches(self.udid)
 
     def rename(self, name: str) -> None:
         """Rename the device."""
-        command = f'rename "{self.udid}" "{name}"'
+        command = ["rename", self.udid, name]
         self._run_command(command)
 
-    def boot(self) -> None:
-        """Boot the device."""
-        command = f'boot "{self.udid}"'
-        self._run_command(command)
+    def boot(
+        self,
+        wait: bool = False,
+        timeout: Optional[float] = None,
+        progress: Optional[BootProgressCallback] = None,
+    ) -> None:
+        """Boot the device.
+
+        wait: If True, don't return until the device has finished booting and is usable.
+        timeout: When waiting, the number of seconds to wait for, or None for no limit.
+        progress: When waiting, called with each progress update as it arrives.
+        """
+        if wait:
+            follow_boot(self.udid, boot=True, timeout=timeout, progress=progress)
+            return
 
-    def boot_status(self) -> None:
-        """Get the boot status of the device."""
-        command = f'bootstatus "{self.udid}"'
+        command = ["boot", self.udid]
         self._run_command(command)
 
+    def boot_status(
+        self,
+        timeout: Optional[float] = None,
+        progress: Optional[BootProgressCallback] = None,
+    ) -> List[BootProgress]:
+        """Wait for the device to finish booting, returning the progress reported.
+
+        timeout: The number of seconds to wait for, or None for no limit.
+        progress: Called with each progress update as it arrives.
+        """
+        return follow_boot(self.udid, timeout=timeout, progress=progress)
+
     def shutdown(self) -> None:
         """Shutdown the device."""
-        command = f'shutdown "{self.udid}"'
+        command = ["shutdown", self.udid]
         self._run_command(command)
 
     def erase(self) -> None:
         """Erases the device's contents and settings."""
-        command = f'erase "{self.udid}"'
-        self._run_command(command)
+        command = ["erase", self.udid]
+
+        try:
+            self._run_command(command)
+        finally:
+            invalidate_device_caches(self.udid)
 
     def upgrade(self, runtime: Runtime) -> None:
         """Upgrade the device to a newer runtime."""
-        command = f'upgrade "{self.udid}" "{runtime.identifier}"'
+        command = ["upgrade", self.udid, runtime.identifier]
         self._run_command(command)
         self._runtime = None
         self.runtime_id = runtime.identifier
 
     def clone(self, new_name: str) -> str:
         """Clone the device."""
-        command = f'clone "{self.udid}" "{new_name}"'
+        command = ["clone", self.udid, new_name]
         device_id = self._run_command(command)
 
         # The device ID has a new line at the end. Strip it when returning.
@@ -268,7 +385,7 @@ class Device(SimulatorControlBase):
         if watch is None or phone is None:
             raise InvalidDeviceError("One device should be a watch and the other a phone")
 
-        command = f'pair "{watch.udid}" "{phone.udid}"'
+        command = ["pair", watch.udid, phone.udid]
         pair_id = self._run_command(command)
 
         # The pair ID has a new line at the end. Strip it when returning.
@@ -282,18 +399,107 @@ class Device(SimulatorControlBase):
         if os.path.exists(output_path):
             raise FileExistsError("Output file path already exists")
 
-        self._run_command(f"io {self.udid} screenshot {shlex.quote(output_path)}")
+        self._run_command(["io", self.udid, "screenshot", output_path])
+
+    def spawn(self, executable: Union[str, List[str]]) -> str:
+        """Spawn a process by executing a given executable on a device.
+
+        executable: The path to the executable followed by its arguments. A
+                    string is split into arguments using shell syntax.
+        """
+        if isinstance(executable, str):
+            executable = shlex.split(executable)
 
-    def spawn(self, executable: str) -> str:
-        """Spawn a process by executing a given executable on a device."""
-        command = f'spawn "{self.udid}" {executable}'
+        command = ["spawn", self.udid] + executable
         return self._run_command(command)
 
+    def spawn_streaming(self, executable: Union[str, List[str]]) -> CommandProcess:
+        """Spawn a process on the device without waiting for it to exit.
+
+        executable: The path to the executable followed by its arguments. A
+                    string is split into arguments using shell syntax.
+
+        Returns the running process, whose output can be read line by line as
+        it arrives. Closing it terminates the process.
+        """
+        if isinstance(executable, str):
+            executable = shlex.split(executable)
+
+        return SimulatorControlBase.start_command(["spawn", self.udid] + executable)
+
     def launch(self, identifier: str) -> str:
         """Launch an application by identifier on a device."""
-        command = f'launch "{self.udid}" "{identifier}"'
+        command = ["launch", self.udid, identifier]
         return self._run_command(command)
 
+    def launch_with_console(
+        self,
+        identifier: str,
+        arguments: Optional[List[str]] = None,
+        *,
+        terminate_running_process: bool = False,
+    ) -> CommandProcess:
+        """Launch an application with its console output connected, without waiting for it.
+
+        identifier: The bundle identifier of the application.
+        arguments: Arguments to pass to the application.
+        terminate_running_process: Terminate the application first if it is
+                                   already running.
+
+        Returns the running `launch --console-pty` command. The first line of
+        output is the process ID, followed by the application's output as it
+        arrives. Closing it terminates the application.
+        """
+        command = ["launch", "--console-pty"]
+
+        if terminate_running_process:
+            command.append("--terminate-running-process")
+
+        command += [self.udid, identifier] + (arguments or [])
+        return SimulatorControlBase.start_command(command)
+
+    def record_video(
+        self, output_path: str, *, codec: Optional[str] = None, force: bool = False
+    ) -> CommandProcess:
+        """Start recording the screen of the device to `output_path`.
+
+        codec: The codec to use (e.g. "h264" or "hevc"), or None for the default.
+        force: Overwrite `output_path` if it already exists.
+
+        Returns the running recording. Closing it stops the recording (with
+        SIGINT, as with Ctrl+C) so that the video is finished properly.
+        """
+        if os.path.exists(output_path) and not force:
+            raise FileExistsError("Output file path already exists")
+
+        command = ["io", self.udid, "recordVideo"]
+
+        if codec is not None:
+            command.append(f"--codec={codec}")
+
+        if force:
+            command.append("--force")
+
+        command.append(output_path)
+
+        process = SimulatorControlBase.start_command(command)
+        process.stop_signal = signal.SIGINT
+        return process
+
+    @property
+    def identity(self) -> str:
+        """Return the UDID of the device."""
+        return self.udid
+
+    def same_content(self, other: object) -> bool:
+        """Return True if the other device is the same device and nothing about it differs."""
+        # The runtime isn't part of the raw info, so check it separately (e.g. after an upgrade)
+        return (
+            super().same_content(other)
+            and isinstance(other, Device)
+            and self.runtime_id == other.runtime_id
+        )
+
     def __str__(self):
         """Return the string representation of the object."""
         return self.name + ": " + self.udid
@@ -316,30 +522,44 @@ class Device(SimulatorControlBase):
         return all_devices
 
     @staticmethod
-    def from_identifier(identifier: str) -> "Device":
-        """Create a new device from the simctl info."""
-        for _, devices in Device.list_all().items():
-            for device in devices:
-                if device.udid == identifier:
-                    return device
+    def index(snapshot: Optional["SimctlSnapshot"] = None) -> "DeviceIndex":
+        """Return the lookup index over all available devices.
+
+        snapshot: If set, the index is built from it rather than running simctl.
+        """
+        return get_index(
+            SimulatorControlType.DEVICE, Device.list_all_raw(snapshot), DeviceIndex, snapshot
+        )
+
+    @staticmethod
+    def from_identifier(identifier: str, snapshot: Optional["SimctlSnapshot"] = None) -> "Device":
+        """Create a new device from the simctl info.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
+        device = Device.index(snapshot).by_udid(identifier)
+
+        if device is not None:
+            return device
 
         raise DeviceNotFoundError("No device with ID: " + identifier)
 
     @staticmethod
-    def from_name(name: str, runtime: Optional[Runtime] = None) -> Optional["Device"]:
+    def from_name(
+        name: str, runtime: Optional[Runtime] = None, snapshot: Optional["SimctlSnapshot"] = None
+    ) -> Optional["Device"]:
         """Get a device from the existing devices using the name.
 
         If the name matches multiple devices, the runtime is used as a secondary filter (if supplied).
         If there are still multiple matching devices, an exception is raised.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
         """
 
-        # Only get the ones matching the name (keep track of the runtime_id in case there are multiple)
-        matching_name_devices = []
+        index = Device.index(snapshot)
 
-        for runtime_id, runtime_devices in Device.list_all().items():
-            for device in runtime_devices:
-                if device.name == name:
-                    matching_name_devices.append((device, runtime_id))
+        # Only get the ones matching the name
+        matching_name_devices = index.by_name(name)
 
         # If there were none, then we have none to return
         if not matching_name_devices:
@@ -347,16 +567,14 @@ class Device(SimulatorControlBase):
 
         # If there was 1, then we return it
         if len(matching_name_devices) == 1:
-            return matching_name_devices[0][0]
+            return matching_name_devices[0]
 
         # If we have more than one, we need a run time in order to differentate between them
         if runtime is None:
             raise MultipleMatchesException("Multiple device matches, but no runtime supplied")
 
-        # Get devices where the runtime name matches
-        matching_devices = [
-            device for device in matching_name_devices if device[1] == runtime.identifier
-        ]
+        # Get devices where the runtime matches
+        matching_devices = index.by_name_and_runtime(name, runtime.identifier)
 
         if not matching_devices:
             return None
@@ -365,12 +583,17 @@ class Device(SimulatorControlBase):
         if len(matching_devices) > 1:
             raise MultipleMatchesException("Multiple device matches even with runtime supplied")
 
-        return matching_devices[0][0]
+        return matching_devices[0]
 
     @staticmethod
     def create(name: str, device_type: DeviceType, runtime: Runtime) -> "Device":
         """Create a new device."""
-        command = f'create "{name}" {device_type.identifier} {runtime.identifier}'
+        return Device.from_identifier(Device.create_udid(name, device_type, runtime))
+
+    @staticmethod
+    def create_udid(name: str, device_type: DeviceType, runtime: Runtime) -> str:
+        """Create a new device, returning only its UDID rather than looking it up."""
+        command = ["create", name, device_type.identifier, runtime.identifier]
         device_id = SimulatorControlBase.run_command(command)
 
         # The device ID has a new line at the end, so strip it.
@@ -378,30 +601,148 @@ class Device(SimulatorControlBase):
         device_id = device_id[:-1]
         # pylint: enable=unsubscriptable-object
 
-        return Device.from_identifier(device_id)
+        return device_id
 
     @staticmethod
     def delete_unavailable() -> None:
         """Delete all unavailable devices."""
-        SimulatorControlBase.run_command("delete unavailable")
+        try:
+            SimulatorControlBase.run_command(["delete", "unavailable"])
+        finally:
+            invalidate_device_caches()
 
     @staticmethod
     def delete_all() -> None:
         """Delete all devices."""
-        SimulatorControlBase.run_command("delete all")
+        try:
+            SimulatorControlBase.run_command(["delete", "all"])
+        finally:
+            invalidate_device_caches()
 
     @staticmethod
     def erase_all() -> None:
         """Erase all devices."""
-        SimulatorControlBase.run_command("erase all")
+        try:
+            SimulatorControlBase.run_command(["erase", "all"])
+        finally:
+            invalidate_device_caches()
 
     @staticmethod
-    def list_all() -> Dict[str, List["Device"]]:
-        """Return all available devices."""
-        raw_info = Device.list_all_raw()
+    def list_all(
+        snapshot: Optional["SimctlSnapshot"] = None,
+        device_set: Optional["DeviceSetReader"] = None,
+    ) -> Dict[str, List["Device"]]:
+        """Return all available devices.
+
+        snapshot: If set, the devices are taken from it rather than running simctl.
+        device_set: If set, the devices are read from the device set files on
+                    disk rather than running simctl.
+        """
+        if snapshot is not None:
+            return snapshot.devices()
+
+        raw_info = Device.list_all_raw(device_set=device_set)
         return Device.from_simctl_info(raw_info)
 
     @staticmethod
-    def list_all_raw() -> Dict[str, List[Dict[str, Any]]]:
-        """Return all device info."""
+    def list_all_raw(
+        snapshot: Optional["SimctlSnapshot"] = None,
+        device_set: Optional["DeviceSetReader"] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Return all device info.
+
+        snapshot: If set, the device info is taken from it rather than running simctl.
+        device_set: If set, the device info is read from the device set files
+                    on disk rather than running simctl.
+        """
+        if snapshot is not None:
+            return snapshot.list_type(SimulatorControlType.DEVICE)
+
+        if device_set is not None:
+            return device_set.list_all_raw()
+
         return SimulatorControlBase.list_type(SimulatorControlType.DEVICE)
+
+
+# (runtime ID, the simctl output for the device)
+DeviceEntry = Tuple[str, Dict[str, Any]]
+
+
+class DeviceIndex:
+    """Hash indexes over all available devices.
+
+    The index holds the simctl output rather than `Device` objects, and each
+    lookup returns new objects. Devices change as they are used (e.g. `rename`
+    followed by `refresh_state`), and the index is shared by everyone using
+    the same snapshot or list cache entry, so sharing the objects would leak
+    those changes between callers.
+    """
+
+    entries: Dict[str, List[DeviceEntry]]
+
+    _by_udid: Dict[str, DeviceEntry]
+    _unavailable_by_udid: Dict[str, DeviceEntry]
+    _by_name: Dict[str, List[DeviceEntry]]
+    _by_name_and_runtime: Dict[Tuple[str, str], List[DeviceEntry]]
+
+    def __init__(self, device_info: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Construct the index from simctl output.
+
+        device_info: The simctl output for the devices, keyed by runtime ID.
+        """
+        self.entries = {}
+        self._by_udid = {}
+        self._unavailable_by_udid = {}
+        self._by_name = {}
+        self._by_name_and_runtime = {}
+
+        for runtime_id, runtime_devices_info in device_info.items():
+            runtime_entries = self.entries.setdefault(runtime_id, [])
+
+            for info in runtime_devices_info:
+                entry = (runtime_id, info)
+
+                if not info.get("isAvailable", False):
+                    self._unavailable_by_udid.setdefault(info["udid"], entry)
+                    continue
+
+                runtime_entries.append(entry)
+                self._by_udid.setdefault(info["udid"], entry)
+                self._by_name.setdefault(info["name"], []).append(entry)
+                self._by_name_and_runtime.setdefault((info["name"], runtime_id), []).append(entry)
+
+    @staticmethod
+    def _device(entry: DeviceEntry) -> Device:
+        runtime_id, info = entry
+        return Device(info, runtime_id)
+
+    def devices(self) -> Dict[str, List[Device]]:
+        """Return new objects for all the devices, keyed by runtime ID."""
+        return {
+            runtime_id: [DeviceIndex._device(entry) for entry in runtime_entries]
+            for runtime_id, runtime_entries in self.entries.items()
+        }
+
+    def by_udid(self, udid: str, include_unavailable: bool = False) -> Optional[Device]:
+        """Return a new object for the device with the UDID, if there is one.
+
+        include_unavailable: If True, unavailable devices (e.g. whose runtime
+                             has been removed) are found too.
+        """
+        entry = self._by_udid.get(udid)
+
+        if entry is None and include_unavailable:
+            entry = self._unavailable_by_udid.get(udid)
+
+        return DeviceIndex._device(entry) if entry is not None else None
+
+    def by_name(self, name: str) -> List[Device]:
+        """Return new objects for the devices with the name."""
+        return [DeviceIndex._device(entry) for entry in self._by_name.get(name, [])]
+
+    def by_name_and_runtime(self, name: str, runtime_id: str) -> List[Device]:
+        """Return new objects for the devices with the name and runtime."""
+        return [
+            DeviceIndex._device(entry)
+            for entry in self._by_name_and_runtime.get((name, runtime_id), [])
+        ]
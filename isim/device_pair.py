@@ -1,17 +1,40 @@
 """Handles simulator watch device pairs."""
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 
 from isim.base_types import SimulatorControlBase, SimulatorControlType
+from isim.device import Device, DeviceNotFoundError
 
 
+if TYPE_CHECKING:
+    from isim.snapshot import SimctlSnapshot
+
+
+# pylint: disable=too-many-instance-attributes
 class DevicePair(SimulatorControlBase):
     """Represents a device pair for the iOS simulator."""
 
+    __slots__ = (
+        "identifier",
+        "watch_udid",
+        "phone_udid",
+        "state",
+        "is_active",
+        "is_connected",
+        "_watch",
+        "_phone",
+    )
+
     raw_info: Dict[str, Any]
     identifier: str
     watch_udid: str
     phone_udid: str
+    state: str
+    is_active: bool
+    is_connected: bool
+
+    _watch: Optional[Device]
+    _phone: Optional[Device]
 
     def __init__(self, device_pair_identifier: str, device_pair_info: Dict[str, Any]) -> None:
         """Construct a DevicePair object from simctl output.
@@ -25,24 +48,69 @@ class DevicePair(SimulatorControlBase):
         self.watch_udid = device_pair_info["watch"]["udid"]
         self.phone_udid = device_pair_info["phone"]["udid"]
 
-    def watch(self) -> None:
-        """Return the device representing the watch in the pair."""
-        raise NotImplementedError("Function has not yet been implemented")
+        # The state looks like "(active, connected)" or "(inactive, disconnected)"
+        self.state = device_pair_info.get("state", "")
+        flags = [flag.strip() for flag in self.state.strip("()").split(",")]
+        self.is_active = "active" in flags
+        self.is_connected = "connected" in flags
+
+        self._watch = None
+        self._phone = None
+
+    def _resolve(self, udid: str, snapshot: Optional["SimctlSnapshot"]) -> Device:
+        """Look up one of the devices in the pair, even if it is unavailable."""
+        device = Device.index(snapshot).by_udid(udid, include_unavailable=True)
+
+        if device is None:
+            raise DeviceNotFoundError("No device with ID: " + udid)
+
+        return device
+
+    def watch(self, snapshot: Optional["SimctlSnapshot"] = None) -> Device:
+        """Return the device representing the watch in the pair.
+
+        The device is returned even if it is unavailable (e.g. its runtime
+        has been removed).
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+                  The device is looked up again each time one is passed,
+                  otherwise it is only looked up the first time.
+        """
+        if self._watch is None or snapshot is not None:
+            self._watch = self._resolve(self.watch_udid, snapshot)
+
+        return self._watch
+
+    def phone(self, snapshot: Optional["SimctlSnapshot"] = None) -> Device:
+        """Return the device representing the phone in the pair.
+
+        The device is returned even if it is unavailable (e.g. its runtime
+        has been removed).
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+                  The device is looked up again each time one is passed,
+                  otherwise it is only looked up the first time.
+        """
+        if self._phone is None or snapshot is not None:
+            self._phone = self._resolve(self.phone_udid, snapshot)
 
-    def phone(self) -> None:
-        """Return the device representing the phone in the pair."""
-        raise NotImplementedError("Function has not yet been implemented")
+        return self._phone
 
     def unpair(self) -> None:
         """Unpair a watch and phone pair."""
-        command = f'unpair "{self.identifier}"'
+        command = ["unpair", self.identifier]
         self._run_command(command)
 
     def activate(self) -> None:
         """Activate a pair."""
-        command = f'pair_activate "{self.identifier}"'
+        command = ["pair_activate", self.identifier]
         self._run_command(command)
 
+    @property
+    def identity(self) -> str:
+        """Return the identifier of the device pair."""
+        return self.identifier
+
     def __str__(self) -> str:
         """Return the string representation of the object."""
         return self.identifier
@@ -60,7 +128,38 @@ class DevicePair(SimulatorControlBase):
         return device_pairs
 
     @staticmethod
-    def list_all() -> List["DevicePair"]:
-        """Return all available device pairs."""
+    def list_all(snapshot: Optional["SimctlSnapshot"] = None) -> List["DevicePair"]:
+        """Return all available device pairs.
+
+        snapshot: If set, the device pairs are taken from it rather than running simctl.
+        """
+        if snapshot is not None:
+            return snapshot.device_pairs()
+
         device_pair_info = SimulatorControlBase.list_type(SimulatorControlType.DEVICE_PAIR)
         return DevicePair.from_simctl_info(device_pair_info)
+
+    @staticmethod
+    def list_all_resolved(snapshot: Optional["SimctlSnapshot"] = None) -> List["DevicePair"]:
+        """Return all device pairs, with the watch and phone of each already resolved.
+
+        The pairs and devices all come from a single `xcrun simctl list --json`,
+        however many pairs there are.
+        Pairs whose watch or phone is unavailable (e.g. after its runtime has
+        been removed) are still resolved.
+
+        snapshot: If set, everything is taken from it rather than running simctl.
+        """
+        if snapshot is None:
+            # pylint: disable=import-outside-toplevel,cyclic-import
+            from isim.snapshot import SimctlSnapshot
+
+            snapshot = SimctlSnapshot()
+
+        device_pairs = snapshot.device_pairs()
+
+        for device_pair in device_pairs:
+            device_pair.watch(snapshot)
+            device_pair.phone(snapshot)
+
+        return device_pairs
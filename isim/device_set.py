@@ -0,0 +1,128 @@
+"""Reading devices straight from a CoreSimulator device set on disk.
+
+A device set is a directory holding `device_set.plist` and a directory per
+device, named after its UDID, with the device's details in `device.plist`.
+Reading these files is much faster than running `xcrun simctl list`:
+
+    from isim import Device
+    from isim.device_set import DeviceSetReader
+
+    devices = Device.list_all(device_set=DeviceSetReader())
+
+Only devices can be read this way. Whether a device is available depends on
+its runtime being installed, which isn't recorded in the device set, so
+devices are reported as available unless `available_runtimes` says otherwise.
+"""
+
+import concurrent.futures
+import os
+import plistlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+DEFAULT_DEVICE_SET_PATH = os.path.expanduser("~/Library/Developer/CoreSimulator/Devices")
+DEFAULT_LOGS_PATH = os.path.expanduser("~/Library/Logs/CoreSimulator")
+
+# The values of `state` in device.plist, as shown by `xcrun simctl list`
+DEVICE_STATES = {
+    0: "Creating",
+    1: "Shutdown",
+    2: "Booting",
+    3: "Booted",
+    4: "Shutting Down",
+}
+
+
+class DeviceSetReader:
+    """Builds the `xcrun simctl list devices` output from the device set files."""
+
+    path: str
+    logs_path: str
+    max_workers: Optional[int]
+    available_runtimes: Optional[Set[str]]
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DEVICE_SET_PATH,
+        *,
+        logs_path: str = DEFAULT_LOGS_PATH,
+        max_workers: Optional[int] = None,
+        available_runtimes: Optional[Set[str]] = None,
+    ) -> None:
+        """Construct a DeviceSetReader.
+
+        path: The device set directory.
+        logs_path: The directory holding each device's logs.
+        max_workers: The most device files to read at once.
+        available_runtimes: The identifiers of the installed runtimes, if
+                            known. Devices using other runtimes are marked as
+                            unavailable.
+        """
+        self.path = path
+        self.logs_path = logs_path
+        self.max_workers = max_workers
+        self.available_runtimes = available_runtimes
+
+    def _read_device(self, udid: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Read a device's plist, returning its runtime and simctl style info.
+
+        Returns None if the directory isn't a (live) device.
+        """
+        device_path = os.path.join(self.path, udid)
+
+        try:
+            with open(os.path.join(device_path, "device.plist"), "rb") as device_file:
+                device_plist = plistlib.load(device_file)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+        if device_plist.get("isDeleted", False):
+            return None
+
+        runtime_id = device_plist["runtime"]
+        info: Dict[str, Any] = {
+            "dataPath": os.path.join(device_path, "data"),
+            "logPath": os.path.join(self.logs_path, device_plist["UDID"]),
+            "udid": device_plist["UDID"],
+            "isAvailable": True,
+            "deviceTypeIdentifier": device_plist["deviceType"],
+            "state": DEVICE_STATES.get(device_plist.get("state", 1), "Unknown"),
+            "name": device_plist["name"],
+        }
+
+        last_booted_at = device_plist.get("lastBootedAt")
+        if last_booted_at is not None:
+            info["lastBootedAt"] = last_booted_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        if self.available_runtimes is not None and runtime_id not in self.available_runtimes:
+            info["isAvailable"] = False
+            info["availabilityError"] = "runtime profile not found"
+
+        return runtime_id, info
+
+    def list_all_raw(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Return the info for every device, keyed by runtime, like `xcrun simctl list`.
+
+        Raises `FileNotFoundError` if the directory isn't a device set.
+        """
+        if not os.path.isfile(os.path.join(self.path, "device_set.plist")):
+            raise FileNotFoundError(f"Not a CoreSimulator device set: {self.path}")
+
+        with os.scandir(self.path) as entries:
+            udids = sorted(entry.name for entry in entries if entry.is_dir())
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._read_device, udids))
+
+        devices: Dict[str, List[Dict[str, Any]]] = {}
+
+        for result in results:
+            if result is None:
+                continue
+
+            runtime_id, info = result
+            devices.setdefault(runtime_id, []).append(info)
+
+        for runtime_devices in devices.values():
+            runtime_devices.sort(key=lambda info: info["name"])
+
+        return devices
@@ -1,8 +1,12 @@
 """Handles simulator device types."""
 
-from typing import Dict, List
+from typing import Dict, List, Optional, TYPE_CHECKING
 
-from isim.base_types import SimulatorControlBase, SimulatorControlType
+from isim.base_types import SimulatorControlBase, SimulatorControlType, get_index
+
+
+if TYPE_CHECKING:
+    from isim.snapshot import SimctlSnapshot
 
 
 class DeviceTypeNotFoundError(Exception):
@@ -12,6 +16,8 @@ class DeviceTypeNotFoundError(Exception):
 class DeviceType(SimulatorControlBase):
     """Represents a device type for the iOS simulator."""
 
+    __slots__ = ("bundle_path", "identifier", "name")
+
     raw_info: Dict[str, str]
     bundle_path: str
     identifier: str
@@ -28,6 +34,11 @@ class DeviceType(SimulatorControlBase):
         self.identifier = device_type_info["identifier"]
         self.name = device_type_info["name"]
 
+    @property
+    def identity(self) -> str:
+        """Return the identifier of the device type."""
+        return self.identifier
+
     def __str__(self) -> str:
         """Return a user readable string representing the device type."""
         return self.name + ": " + self.identifier
@@ -45,27 +56,94 @@ class DeviceType(SimulatorControlBase):
         return device_types
 
     @staticmethod
-    def from_id(identifier: str) -> "DeviceType":
-        """Get a device type from its identifier."""
-        for device_type in DeviceType.list_all():
-            if device_type.identifier == identifier:
-                return device_type
+    def index(snapshot: Optional["SimctlSnapshot"] = None) -> "DeviceTypeIndex":
+        """Return the lookup index over all device types.
+
+        snapshot: If set, the index is built from it rather than running simctl.
+        """
+        if snapshot is not None:
+            device_type_info = snapshot.list_type(SimulatorControlType.DEVICE_TYPE)
+        else:
+            device_type_info = SimulatorControlBase.list_type(SimulatorControlType.DEVICE_TYPE)
+
+        return get_index(
+            SimulatorControlType.DEVICE_TYPE, device_type_info, DeviceTypeIndex, snapshot
+        )
+
+    @staticmethod
+    def from_id(identifier: str, snapshot: Optional["SimctlSnapshot"] = None) -> "DeviceType":
+        """Get a device type from its identifier.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
+        device_type = DeviceType.index(snapshot).by_identifier.get(identifier)
+        if device_type is not None:
+            return device_type
         raise DeviceTypeNotFoundError("No device type matching identifier: " + identifier)
 
     @staticmethod
-    def from_name(name: str) -> "DeviceType":
-        """Create a device type by looking up the existing ones matching the supplied name."""
-        # Get all device types
-        device_types = DeviceType.list_all()
+    def from_name(name: str, snapshot: Optional["SimctlSnapshot"] = None) -> "DeviceType":
+        """Create a device type by looking up the existing ones matching the supplied name.
 
-        for device_type in device_types:
-            if device_type.name == name:
-                return device_type
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
+        device_type = DeviceType.index(snapshot).by_name.get(name)
+
+        if device_type is not None:
+            return device_type
 
         raise DeviceTypeNotFoundError("No device type matching name: " + name)
 
     @staticmethod
-    def list_all() -> List["DeviceType"]:
-        """Return all available device types."""
+    def from_name_or_id(
+        name_or_identifier: str, snapshot: Optional["SimctlSnapshot"] = None
+    ) -> "DeviceType":
+        """Get a device type from either its identifier or its name.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
+        index = DeviceType.index(snapshot)
+        device_type = index.by_identifier.get(name_or_identifier) or index.by_name.get(
+            name_or_identifier
+        )
+
+        if device_type is not None:
+            return device_type
+
+        raise DeviceTypeNotFoundError("No device type matching: " + name_or_identifier)
+
+    @staticmethod
+    def list_all(snapshot: Optional["SimctlSnapshot"] = None) -> List["DeviceType"]:
+        """Return all available device types.
+
+        snapshot: If set, the device types are taken from it rather than running simctl.
+        """
+        if snapshot is not None:
+            return snapshot.device_types()
+
         device_type_info = SimulatorControlBase.list_type(SimulatorControlType.DEVICE_TYPE)
         return DeviceType.from_simctl_info(device_type_info)
+
+
+class DeviceTypeIndex:
+    """Hash indexes over a list of device types.
+
+    Where several device types share a key, the first one listed by simctl wins.
+    """
+
+    device_types: List[DeviceType]
+    by_identifier: Dict[str, DeviceType]
+    by_name: Dict[str, DeviceType]
+
+    def __init__(self, device_type_info: List[Dict[str, str]]) -> None:
+        """Construct the index from simctl output.
+
+        device_type_info: The simctl output for the device types.
+        """
+        self.device_types = DeviceType.from_simctl_info(device_type_info)
+        self.by_identifier = {}
+        self.by_name = {}
+
+        for device_type in self.device_types:
+            self.by_identifier.setdefault(device_type.identifier, device_type)
+            self.by_name.setdefault(device_type.name, device_type)
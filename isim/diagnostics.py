@@ -0,0 +1,324 @@
+"""Collect diagnostics from many devices at once.
+
+`isim.diagnose` runs a single `xcrun simctl diagnose` and waits for it to
+finish with its output held in memory. `collect_diagnostics` instead runs
+diagnose for each device in parallel, streams each device's output to a log
+file as it arrives (reporting it as progress), and keeps each device within
+its own time and size budget:
+
+    manifest = collect_diagnostics(devices, "incident-1234", timeout=600)
+    for entry in manifest.entries.values():
+        print(entry)
+
+A `manifest.json` describing what was collected is written alongside the
+archives.
+"""
+
+import json
+import math
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from isim.base_types import SimulatorControlBase
+from isim.bulk import run_on_devices
+from isim.device import Device
+from isim.hashing import disk_usage
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+# How often to measure the diagnostics on disk while they are being collected
+_SIZE_CHECK_INTERVAL = 1.0
+
+
+class DiagnosticsTooLargeError(Exception):
+    """Raised when a device's diagnostics exceed the size budget."""
+
+
+class DiagnoseProgress:
+    """A line of output from diagnose for a single device."""
+
+    udid: str
+    line: str
+    elapsed: float
+
+    def __init__(self, udid: str, line: str, elapsed: float) -> None:
+        """Construct a DiagnoseProgress.
+
+        udid: The UDID of the device.
+        line: The line of output, without its line ending.
+        elapsed: The number of seconds since diagnose started for the device.
+        """
+        self.udid = udid
+        self.line = line
+        self.elapsed = elapsed
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        return f"{self.udid} [{self.elapsed:.1f}s]: {self.line}"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str({"udid": self.udid, "line": self.line, "elapsed": self.elapsed})
+
+
+DiagnoseProgressCallback = Callable[[DiagnoseProgress], None]
+
+
+class DiagnoseEntry:
+    """What was collected for a single device."""
+
+    udid: str
+    log_path: str
+    archive_path: Optional[str]
+    size: Optional[int]
+    error: Optional[BaseException]
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        udid: str,
+        log_path: str,
+        archive_path: Optional[str] = None,
+        size: Optional[int] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """Construct a DiagnoseEntry.
+
+        udid: The UDID of the device.
+        log_path: The file the output of diagnose was written to.
+        archive_path: The archive (or directory, if not archiving) produced,
+                      if diagnose succeeded.
+        size: The size in bytes of the archive or directory.
+        error: The exception raised, if diagnose failed.
+        """
+        self.udid = udid
+        self.log_path = log_path
+        self.archive_path = archive_path
+        self.size = size
+        self.error = error
+
+    # pylint: enable=too-many-arguments
+
+    @property
+    def succeeded(self) -> bool:
+        """Return True if diagnostics were collected for the device."""
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the entry as it is written to the manifest."""
+        return {
+            "udid": self.udid,
+            "log": self.log_path,
+            "archive": self.archive_path,
+            "size": self.size,
+            "error": None if self.error is None else repr(self.error),
+        }
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        if self.error is None:
+            return f"{self.udid}: {self.archive_path} ({self.size} bytes)"
+        return f"{self.udid}: {self.error!r} (see {self.log_path})"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str(self.to_dict())
+
+
+class DiagnoseManifest:
+    """The diagnostics collected for every device."""
+
+    output_path: str
+    entries: Dict[str, DiagnoseEntry]
+
+    def __init__(self, output_path: str, entries: Dict[str, DiagnoseEntry]) -> None:
+        """Construct a DiagnoseManifest.
+
+        output_path: The directory everything was written to.
+        entries: The entry for each device, keyed by UDID.
+        """
+        self.output_path = output_path
+        self.entries = entries
+
+    @property
+    def failed(self) -> List[DiagnoseEntry]:
+        """Return the entries for devices which diagnostics couldn't be collected from."""
+        return [entry for entry in self.entries.values() if not entry.succeeded]
+
+    @property
+    def archives(self) -> List[str]:
+        """Return the paths of every archive produced."""
+        return [
+            entry.archive_path for entry in self.entries.values() if entry.archive_path is not None
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the manifest as it is written to disk."""
+        return {
+            "output": self.output_path,
+            "devices": [entry.to_dict() for entry in self.entries.values()],
+        }
+
+    def write(self) -> str:
+        """Write the manifest into the output directory, returning its path."""
+        path = os.path.join(self.output_path, MANIFEST_FILE_NAME)
+
+        with open(path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self.to_dict(), manifest_file, indent=2)
+
+        return path
+
+
+def _archive_path(device_output: str, archive: bool) -> str:
+    """Return where diagnose puts a device's diagnostics."""
+    return device_output + ".tar.gz" if archive else device_output
+
+
+def _remove(path: str) -> None:
+    """Remove a file or directory, if it exists."""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.unlink(path)
+
+
+# pylint: disable=too-many-locals
+def _diagnose_device(
+    device: Device,
+    command: List[str],
+    *,
+    device_output: str,
+    archive_path: str,
+    max_size: Optional[int],
+    progress: Optional[DiagnoseProgressCallback],
+) -> int:
+    """Run diagnose for a single device, streaming its output to its log file.
+
+    Returns the size of what was produced.
+    """
+    start = time.monotonic()
+    last_size_check = start
+    log_size = 0
+
+    def check_size(produced: int) -> None:
+        if max_size is not None and log_size + produced > max_size:
+            raise DiagnosticsTooLargeError(
+                f"Diagnostics for {device.udid} exceeded {max_size} bytes"
+            )
+
+    try:
+        with open(device_output + ".log", "w", encoding="utf-8") as log_file:
+            with SimulatorControlBase.start_command(command) as process:
+                for line in process.lines():
+                    log_file.write(line + "\n")
+                    log_size += len(line) + 1
+                    now = time.monotonic()
+
+                    if now - last_size_check >= _SIZE_CHECK_INTERVAL:
+                        last_size_check = now
+                        check_size(
+                            disk_usage(device_output) if os.path.exists(device_output) else 0
+                        )
+                    else:
+                        check_size(0)
+
+                    if progress is not None:
+                        progress(DiagnoseProgress(device.udid, line, now - start))
+
+        size = disk_usage(archive_path)
+        check_size(size)
+    except BaseException:
+        # Don't leave partial (or oversized) diagnostics taking up space
+        _remove(device_output)
+        _remove(archive_path)
+        raise
+
+    return size
+
+
+# pylint: enable=too-many-locals
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def collect_diagnostics(
+    devices: List[Device],
+    output_path: str,
+    *,
+    all_logs: bool = False,
+    include_data_directory: bool = False,
+    archive: bool = True,
+    timeout: Optional[float] = 300,
+    max_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    progress: Optional[DiagnoseProgressCallback] = None,
+) -> DiagnoseManifest:
+    """Run `xcrun simctl diagnose` for each device in parallel.
+
+    devices: The devices to collect diagnostics from.
+    output_path: The directory to write everything to. It must not exist yet.
+                 Each device gets `<udid>.log` holding the output of diagnose,
+                 and `<udid>.tar.gz` (or a `<udid>` directory if not archiving).
+    all_logs: Gather logs for devices which aren't booted as well.
+    include_data_directory: Include each device's data directory.
+    archive: Produce an archive for each device rather than a directory.
+    timeout: The number of seconds diagnose may take for each device, or None
+             for no limit. Devices which run out have a `subprocess.TimeoutExpired`.
+    max_size: The most bytes each device's output and diagnostics may take up,
+              or None for no limit. Devices which exceed it are stopped, their
+              diagnostics are deleted and they have a `DiagnosticsTooLargeError`.
+    max_workers: The most devices to run diagnose for at once.
+    progress: Called with each line of output as it arrives, from the worker
+              threads.
+
+    Returns the manifest, which is also written to `manifest.json` in the
+    output directory. Failures are recorded in the manifest rather than raised.
+    """
+    os.makedirs(output_path)
+
+    def diagnose_one(device: Device) -> int:
+        device_output = os.path.join(output_path, device.udid)
+        command = ["diagnose", "-l", "-b", f"--output={device_output}", f"--udid={device.udid}"]
+
+        if timeout is not None:
+            # diagnose only takes whole seconds, and 0 would mean no time at all
+            command.append(f"--timeout={max(1, math.ceil(timeout))}")
+
+        if not archive:
+            command.append("--no-archive")
+
+        if include_data_directory:
+            command.append("--data-container")
+
+        if all_logs:
+            command.append("--all-logs")
+
+        return _diagnose_device(
+            device,
+            command,
+            device_output=device_output,
+            archive_path=_archive_path(device_output, archive),
+            max_size=max_size,
+            progress=progress,
+        )
+
+    results = run_on_devices(devices, diagnose_one, max_workers=max_workers, timeout=timeout)
+    entries = {}
+
+    for udid, result in results.items():
+        device_output = os.path.join(output_path, udid)
+        entries[udid] = DiagnoseEntry(
+            udid,
+            device_output + ".log",
+            archive_path=_archive_path(device_output, archive) if result.succeeded else None,
+            size=result.value,
+            error=result.error,
+        )
+
+    manifest = DiagnoseManifest(output_path, entries)
+    manifest.write()
+    return manifest
+
+
+# pylint: enable=too-many-arguments,too-many-locals
@@ -0,0 +1,179 @@
+"""An optional on-disk cache of `xcrun simctl list` output.
+
+Short lived processes spend most of their time waiting on `xcrun simctl
+list`. With the disk cache enabled, the output is saved alongside the
+modification times of the CoreSimulator files it depends on, and later
+processes reuse it for as long as those files are unchanged:
+
+    from isim import disk_cache
+    disk_cache.enable()
+
+Checking the cache only involves `stat` calls, so no processes are spawned.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from isim.base_types import set_disk_cache
+from isim.device_set import DEFAULT_DEVICE_SET_PATH
+
+# Bump this if the format of the cache file changes
+_FORMAT_VERSION = 1
+
+# Other places whose changes affect the output (new runtimes, a different Xcode, etc.)
+_RUNTIME_PATHS = [
+    "/Library/Developer/CoreSimulator/Profiles/Runtimes",
+    "/Library/Developer/CoreSimulator/Volumes",
+    "/Library/Developer/CoreSimulator/Images",
+]
+_XCODE_SELECT_LINK = "/var/db/xcode_select_link"
+
+
+def default_cache_path() -> str:
+    """Return where the cache is kept by default, in the user's cache directory."""
+    if sys.platform == "darwin":
+        cache_dir = os.path.expanduser("~/Library/Caches")
+    else:
+        cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+    return os.path.join(cache_dir, "isim", "simctl_list.json")
+
+
+def _mtime(path: str) -> Optional[int]:
+    """Return the modification time of a path, or None if it doesn't exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class DiskListCache:
+    """Saves and validates `xcrun simctl list` output in a file."""
+
+    path: str
+    device_set_path: str
+    extra_paths: List[str]
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        device_set_path: Optional[str] = None,
+        extra_paths: Optional[List[str]] = None,
+    ) -> None:
+        """Construct a DiskListCache.
+
+        path: The cache file. Defaults to `default_cache_path()`.
+        device_set_path: The CoreSimulator device set directory, which holds
+                         `device_set.plist` and a directory per device.
+        extra_paths: Other paths whose modification times invalidate the cache.
+                     Defaults to the system runtime directories.
+        """
+        self.path = path if path is not None else default_cache_path()
+        self.device_set_path = (
+            device_set_path if device_set_path is not None else DEFAULT_DEVICE_SET_PATH
+        )
+        self.extra_paths = list(extra_paths) if extra_paths is not None else list(_RUNTIME_PATHS)
+
+    def validator(self) -> Dict[str, Any]:
+        """Return a description of the files the list output depends on.
+
+        The cached output is only used while this is unchanged.
+        """
+        devices: Dict[str, Optional[int]] = {}
+
+        try:
+            entries = os.scandir(self.device_set_path)
+        except OSError:
+            entries = None
+
+        if entries is not None:
+            with entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        devices[entry.name] = _mtime(os.path.join(entry.path, "device.plist"))
+
+        try:
+            xcode = os.readlink(_XCODE_SELECT_LINK)
+        except OSError:
+            xcode = None
+
+        return {
+            "device_set": _mtime(os.path.join(self.device_set_path, "device_set.plist")),
+            "devices": devices,
+            "extra": {path: _mtime(path) for path in self.extra_paths},
+            "xcode": xcode,
+            "developer_dir": os.environ.get("DEVELOPER_DIR"),
+        }
+
+    def load(self, validator: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached output if it is still valid, otherwise None.
+
+        validator: The current validator, if it has already been calculated.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as cache_file:
+                contents = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(contents, dict) or contents.get("version") != _FORMAT_VERSION:
+            return None
+
+        if validator is None:
+            validator = self.validator()
+
+        if contents.get("validator") != validator:
+            return None
+
+        output = contents.get("output")
+        return output if isinstance(output, dict) else None
+
+    def save(self, output: Dict[str, Any], validator: Dict[str, Any]) -> None:
+        """Save list output.
+
+        validator: The validator from before the output was fetched, so that
+                   changes made while it was being fetched invalidate it.
+        """
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        contents = {"version": _FORMAT_VERSION, "validator": validator, "output": output}
+
+        # Write to a temporary file and move it into place so readers never
+        # see a partially written cache
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as temp_file:
+                json.dump(contents, temp_file, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def clear(self) -> None:
+        """Delete the cache file."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def enable(
+    path: Optional[str] = None,
+    device_set_path: Optional[str] = None,
+) -> DiskListCache:
+    """Start using the disk cache for `xcrun simctl list` output.
+
+    See `DiskListCache` for the arguments.
+    """
+    cache = DiskListCache(path, device_set_path)
+    set_disk_cache(cache)
+    return cache
+
+
+def disable() -> None:
+    """Stop using the disk cache. The cache file is left in place."""
+    set_disk_cache(None)
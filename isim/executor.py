@@ -0,0 +1,503 @@
+"""Pluggable execution of `xcrun simctl` commands."""
+
+import asyncio
+import contextlib
+import io
+import queue
+import signal
+import subprocess
+import threading
+import time
+from typing import IO, AsyncIterator, Callable, Iterator, List, NoReturn, Optional, Tuple
+
+# How many lines of output a CommandProcess buffers before pausing the command
+DEFAULT_MAX_BUFFERED_LINES = 1024
+
+
+def _set_result(waiter: "asyncio.Future[None]") -> None:
+    """Wake an async reader, unless it has given up waiting."""
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+# pylint: disable=too-many-instance-attributes
+class CommandProcess:
+    """A simctl command which has been started, with its output read as it arrives.
+
+    Output is read on a background thread into a bounded buffer. If lines
+    aren't consumed quickly enough the buffer fills up, reading stops and the
+    command is paused by the operating system until there is room again.
+
+    Use as a context manager (or call `close`) to make sure the command is
+    terminated and cleaned up. The output can also be read from async code
+    with `async for`, and `async with` closes the command.
+    """
+
+    args: List[str]
+    returncode: Optional[int]
+    output_size: int
+    start_time: float
+    stop_signal: int
+
+    # True if `close` had to stop the command, or it ran out of time
+    stopped: bool
+    timed_out: bool
+    on_exit: List[Callable[["CommandProcess"], None]]
+
+    _process: Optional["subprocess.Popen[str]"]
+    _deadline: Optional[float]
+    _lines: "queue.Queue[Optional[str]]"
+    _reader: threading.Thread
+    _eof: bool
+    _exited: bool
+    _lock: threading.Lock
+
+    # Async readers waiting for output, woken by the reader thread
+    _waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]]
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        args: List[str],
+        output: IO[str],
+        process: Optional["subprocess.Popen[str]"] = None,
+        returncode: Optional[int] = None,
+        *,
+        timeout: Optional[float] = None,
+        max_buffered_lines: int = DEFAULT_MAX_BUFFERED_LINES,
+    ) -> None:
+        """Construct a CommandProcess.
+
+        args: The arguments passed to `xcrun simctl`.
+        output: The output of the command.
+        process: The running process, if there is one.
+        returncode: The return code, if the command has already finished.
+        timeout: The number of seconds the command may run for, or None for no limit.
+        max_buffered_lines: The most lines of output to buffer before pausing.
+        """
+        self.args = args
+        self.returncode = returncode
+        self.output_size = 0
+        self.start_time = time.time()
+        self.stop_signal = signal.SIGTERM
+        self.stopped = False
+        self.timed_out = False
+        self.on_exit = []
+        self._process = process
+        self._deadline = None if timeout is None else time.monotonic() + timeout
+        self._lines = queue.Queue(maxsize=max_buffered_lines)
+        self._eof = False
+        self._exited = False
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._reader = threading.Thread(target=self._read, args=(output,), daemon=True)
+        self._reader.start()
+
+    # pylint: enable=too-many-arguments
+
+    @property
+    def full_command(self) -> List[str]:
+        """Return the full command line."""
+        return ["xcrun", "simctl"] + self.args
+
+    def _read(self, output: IO[str]) -> None:
+        """Read the output into the line buffer (on the reader thread)."""
+        try:
+            for line in output:
+                self.output_size += len(line)
+                self._lines.put(line)
+                self._wake_waiters()
+        finally:
+            output.close()
+            self._lines.put(None)
+            self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        """Wake any async readers waiting for output (on the reader thread)."""
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_set_result, waiter)
+            except RuntimeError:
+                # The event loop has been closed
+                pass
+
+    def _remaining(self) -> Optional[float]:
+        """Return how long the command has left to run, killing it if it has run out."""
+        if self._deadline is None:
+            return None
+
+        remaining = self._deadline - time.monotonic()
+
+        if remaining <= 0:
+            self._timed_out()
+
+        return remaining
+
+    def _timed_out(self) -> NoReturn:
+        self.timed_out = True
+        self.kill()
+        self.close()
+        raise subprocess.TimeoutExpired(self.full_command, 0)
+
+    async def _timed_out_async(self) -> NoReturn:
+        self.timed_out = True
+        self.kill()
+        await self.close_async()
+        raise subprocess.TimeoutExpired(self.full_command, 0)
+
+    def readline(self) -> Optional[str]:
+        """Return the next line of output without its line ending, or None at the end.
+
+        Raises `subprocess.TimeoutExpired` if the command runs out of time.
+        """
+        if self._eof:
+            return None
+
+        try:
+            line = self._lines.get(timeout=self._remaining())
+        except queue.Empty:
+            self._timed_out()
+
+        if line is None:
+            self._eof = True
+            return None
+
+        return line.rstrip("\n")
+
+    def lines(self) -> Iterator[str]:
+        """Yield each line of output, without line endings, as it arrives.
+
+        Once the output ends, this waits for the command to exit and raises
+        `subprocess.CalledProcessError` if it failed.
+        """
+        while True:
+            line = self.readline()
+
+            if line is None:
+                break
+
+            yield line
+
+        self.check_returncode()
+
+    def __iter__(self) -> Iterator[str]:
+        return self.lines()
+
+    async def readline_async(self) -> Optional[str]:
+        """Async version of `readline`.
+
+        This waits on the event loop rather than a worker thread, so any
+        number of idle streams can be read at once, and cancelling the read
+        doesn't leave anything behind.
+        """
+        loop = asyncio.get_running_loop()
+
+        while not self._eof:
+            waiter = loop.create_future()
+
+            # Checking the buffer and registering are done together, so that
+            # output arriving in between always wakes the waiter
+            with self._lock:
+                try:
+                    line = self._lines.get_nowait()
+                except queue.Empty:
+                    self._waiters.append((loop, waiter))
+                else:
+                    waiter.cancel()
+
+                    if line is None:
+                        self._eof = True
+                        return None
+
+                    return line.rstrip("\n")
+
+            try:
+                await asyncio.wait_for(waiter, self._remaining())
+            except asyncio.TimeoutError:
+                await self._timed_out_async()
+
+        return None
+
+    async def lines_async(self) -> AsyncIterator[str]:
+        """Async version of `lines`."""
+        while True:
+            line = await self.readline_async()
+
+            if line is None:
+                break
+
+            yield line
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.check_returncode)
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self.lines_async()
+
+    def poll(self) -> Optional[int]:
+        """Return the return code if the command has exited, otherwise None."""
+        if self._process is not None and self.returncode is None:
+            self.returncode = self._process.poll()
+
+        if self.returncode is not None:
+            self._exit()
+
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        """Wait for the command to exit and return its return code.
+
+        Unconsumed output is left in the buffer, so a command with a lot of
+        output won't exit until it has been read.
+        """
+        if self._process is not None and self.returncode is None:
+            remaining = self._remaining()
+
+            if timeout is None or (remaining is not None and remaining < timeout):
+                timeout = remaining
+
+            try:
+                self.returncode = self._process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                if timeout is not None and timeout == remaining:
+                    self._timed_out()
+                raise
+
+        assert self.returncode is not None
+        self._exit()
+        return self.returncode
+
+    def check_returncode(self) -> None:
+        """Wait for the command and raise `subprocess.CalledProcessError` if it failed."""
+        returncode = self.wait()
+
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, self.full_command)
+
+    def send_signal(self, signal_number: int) -> None:
+        """Send a signal to the command, if it is still running."""
+        if self._process is not None and self._process.poll() is None:
+            self._process.send_signal(signal_number)
+
+    def terminate(self) -> None:
+        """Ask the command to stop, if it is still running."""
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+
+    def kill(self) -> None:
+        """Kill the command, if it is still running."""
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+
+    def close(self, grace_period: float = 5.0) -> None:
+        """Stop the command if it is still running and release its resources.
+
+        The command is sent `stop_signal` (SIGTERM unless changed) and given
+        time to exit cleanly.
+
+        grace_period: How long to wait after signalling the command before killing it.
+        """
+        if self._process is not None and self._process.poll() is None:
+            self.stopped = True
+            self._process.send_signal(self.stop_signal)
+
+            try:
+                self._process.wait(grace_period)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+        # Unblock the reader if it is waiting for room in the buffer
+        while self._reader.is_alive():
+            try:
+                self._lines.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+        # Put back the end of output marker, in case another thread is reading.
+        # If the buffer is full, the reader's own marker is still in it.
+        try:
+            self._lines.put_nowait(None)
+        except queue.Full:
+            pass
+        self._eof = True
+
+        if self._process is not None:
+            self.returncode = self._process.wait()
+
+        self._exit()
+
+    def _exit(self) -> None:
+        """Run the exit callbacks, once."""
+        with self._lock:
+            if self._exited:
+                return
+            self._exited = True
+
+        for callback in self.on_exit:
+            callback(self)
+
+    def __enter__(self) -> "CommandProcess":
+        return self
+
+    def __exit__(self, exc_type: object, exc_value: object, traceback: object) -> None:
+        self.close()
+
+    async def close_async(self, grace_period: float = 5.0) -> None:
+        """Async version of `close`."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.close, grace_period)
+
+    async def __aenter__(self) -> "CommandProcess":
+        return self
+
+    async def __aexit__(self, exc_type: object, exc_value: object, traceback: object) -> None:
+        await self.close_async()
+
+    @staticmethod
+    def finished(args: List[str], output: str, returncode: int = 0) -> "CommandProcess":
+        """Create a CommandProcess for a command which has already run."""
+        return CommandProcess(args, io.StringIO(output), returncode=returncode)
+
+
+class CommandExecutor:
+    """Runs `xcrun simctl` commands.
+
+    All commands run by isim go through the current executor (see
+    `set_executor`). Subclass this to change how they are run, e.g. to run
+    them on a remote Mac, or against a fake simctl for tests and benchmarks.
+    """
+
+    def run(self, args: List[str], timeout: Optional[float] = None) -> str:
+        """Run `xcrun simctl` with the arguments and return its standard output.
+
+        args: The arguments to pass to `xcrun simctl` (e.g. `["boot", udid]`).
+        timeout: The number of seconds the command may take, or None for no limit.
+
+        Raises `subprocess.CalledProcessError` if the command fails and
+        `subprocess.TimeoutExpired` if it runs out of time.
+        """
+        raise NotImplementedError()
+
+    async def run_async(self, args: List[str], timeout: Optional[float] = None) -> str:
+        """Async version of `run`.
+
+        By default this calls `run` on a worker thread. Executors which can do
+        better should override it.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.run, args, timeout)
+
+    def start(self, args: List[str], timeout: Optional[float] = None) -> CommandProcess:
+        """Start `xcrun simctl` with the arguments and return without waiting for it.
+
+        By default this runs the command to completion with `run` and returns
+        a process holding its output. Executors which can stream output
+        should override it.
+        """
+        try:
+            return CommandProcess.finished(args, self.run(args, timeout))
+        except subprocess.CalledProcessError as ex:
+            return CommandProcess.finished(args, ex.output or "", ex.returncode)
+
+
+class SubprocessExecutor(CommandExecutor):
+    """Runs commands by launching `xcrun simctl` directly, without a shell."""
+
+    def run(self, args: List[str], timeout: Optional[float] = None) -> str:
+        """Run `xcrun simctl` with the arguments and return its standard output."""
+        full_command = ["xcrun", "simctl"] + args
+
+        # Deliberately don't catch the exception - we want it to bubble up
+        return subprocess.run(
+            full_command,
+            universal_newlines=True,
+            check=True,
+            stdout=subprocess.PIPE,
+            timeout=timeout,
+        ).stdout
+
+    def start(self, args: List[str], timeout: Optional[float] = None) -> CommandProcess:
+        """Start `xcrun simctl` with the arguments, streaming its output."""
+        # pylint: disable=consider-using-with
+        process = subprocess.Popen(
+            ["xcrun", "simctl"] + args,
+            universal_newlines=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=1,
+        )
+        # pylint: enable=consider-using-with
+        assert process.stdout is not None
+        return CommandProcess(args, process.stdout, process, timeout=timeout)
+
+    async def run_async(self, args: List[str], timeout: Optional[float] = None) -> str:
+        """Run `xcrun simctl` with the arguments using an asyncio subprocess."""
+        full_command = ["xcrun", "simctl"] + args
+
+        process = await asyncio.create_subprocess_exec(
+            *full_command, stdout=asyncio.subprocess.PIPE
+        )
+
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError as ex:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(full_command, timeout or 0) from ex
+
+        output = stdout.decode("utf-8")
+        returncode = process.returncode
+
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, full_command, output=output)
+
+        return output
+
+
+class _CurrentExecutor:
+    """Holds the process wide executor."""
+
+    executor: CommandExecutor
+
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.executor = SubprocessExecutor()
+        self._lock = threading.Lock()
+
+    def swap(self, executor: CommandExecutor) -> CommandExecutor:
+        """Set a new executor, returning the previous one."""
+        with self._lock:
+            previous = self.executor
+            self.executor = executor
+            return previous
+
+
+_CURRENT_EXECUTOR = _CurrentExecutor()
+
+
+def get_executor() -> CommandExecutor:
+    """Return the executor used to run simctl commands."""
+    return _CURRENT_EXECUTOR.executor
+
+
+def set_executor(executor: CommandExecutor) -> CommandExecutor:
+    """Set the process wide executor used to run simctl commands.
+
+    Returns the previous executor so that it can be restored.
+    """
+    return _CURRENT_EXECUTOR.swap(executor)
+
+
+@contextlib.contextmanager
+def use_executor(executor: CommandExecutor) -> Iterator[CommandExecutor]:
+    """Use an executor for the duration of the context, then restore the previous one."""
+    previous = set_executor(executor)
+
+    try:
+        yield executor
+    finally:
+        set_executor(previous)
@@ -0,0 +1,723 @@
+"""An in-memory stand in for `xcrun simctl`.
+
+This lets isim be exercised, tested and benchmarked on machines without
+Xcode (e.g. Linux build boxes):
+
+    from isim.executor import use_executor
+    from isim.fake_simctl import FakeSimctl
+
+    fake = FakeSimctl.with_default_inventory()
+    with use_executor(fake):
+        iphone = DeviceType.from_name("iPhone 15")
+        device = Device.create("Test", iphone, Runtime.from_name("iOS 17.0"))
+        device.boot()
+
+Only the parts of simctl which isim uses are modelled. Errors are reported
+the same way as the real tool: a `subprocess.CalledProcessError` with the
+simctl return code.
+"""
+
+import copy
+import itertools
+import json
+import os
+import plistlib
+import shutil
+import subprocess
+import tarfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import uuid
+
+from isim.base_types import ErrorCodes
+from isim.device_set import DEVICE_STATES
+from isim.executor import CommandExecutor
+
+# Return codes used by the real simctl
+_USAGE_ERROR = 64
+_INVALID_DEVICE = 148
+_INVALID_STATE = 149
+_INVALID_DEVICE_TYPE = 161
+
+_DEVICES_ROOT = "/Users/isim/Library/Developer/CoreSimulator/Devices"
+_LOGS_ROOT = "/Users/isim/Library/Logs/CoreSimulator"
+
+# Which device families each platform can run on
+_PLATFORM_FAMILIES = {
+    "iOS": {"iPhone", "iPad"},
+    "watchOS": {"Apple Watch"},
+    "tvOS": {"Apple TV"},
+}
+
+# Which platform bundle each device family's device types live in
+_FAMILY_PLATFORM_BUNDLES = {
+    "iPhone": "iPhoneOS",
+    "iPad": "iPhoneOS",
+    "Apple Watch": "WatchOS",
+    "Apple TV": "AppleTVOS",
+}
+
+_PLATFORMS_ROOT = "/Applications/Xcode.app/Contents/Developer/Platforms"
+
+# The inventory used by `FakeSimctl.with_default_inventory`:
+# (platform, version, build version)
+_DEFAULT_RUNTIMES = [
+    ("iOS", "16.4", "20E247"),
+    ("iOS", "17.0", "21A328"),
+    ("watchOS", "10.0", "21R355"),
+    ("tvOS", "17.0", "21J351"),
+]
+
+# (name, product family)
+_DEFAULT_DEVICE_TYPES = [
+    ("iPhone 14", "iPhone"),
+    ("iPhone 15", "iPhone"),
+    ("iPhone 15 Pro", "iPhone"),
+    ("iPad Pro (12.9-inch) (6th generation)", "iPad"),
+    ("Apple Watch Series 9 (45mm)", "Apple Watch"),
+    ("Apple TV 4K (3rd generation)", "Apple TV"),
+]
+
+
+def _identifier_suffix(name: str) -> str:
+    """Convert a name into the form simctl uses in identifiers."""
+    for character in " ().":
+        name = name.replace(character, "-")
+
+    while "--" in name:
+        name = name.replace("--", "-")
+
+    return name.strip("-")
+
+
+# pylint: disable=too-many-instance-attributes
+class FakeSimctl(CommandExecutor):
+    """An executor which models simctl devices, runtimes, device types and pairs in memory."""
+
+    runtimes: List[Dict[str, Any]]
+    device_types: List[Dict[str, Any]]
+    devices: Dict[str, List[Dict[str, Any]]]
+    pairs: Dict[str, Dict[str, Any]]
+    apps: Dict[str, Dict[str, str]]
+    environment: Dict[str, Dict[str, str]]
+    commands: List[List[str]]
+
+    _lock: threading.RLock
+    _next_pid: int
+
+    def __init__(self) -> None:
+        """Construct an empty FakeSimctl. Use the `add_*` methods to populate it."""
+        self.runtimes = []
+        self.device_types = []
+        self.devices = {}
+        self.pairs = {}
+        self.apps = {}
+        self.environment = {}
+        self.commands = []
+        self._lock = threading.RLock()
+        self._next_pid = 1000
+
+    @staticmethod
+    def with_default_inventory(devices_per_pairing: int = 0) -> "FakeSimctl":
+        """Create a FakeSimctl with a typical set of runtimes and device types.
+
+        devices_per_pairing: How many devices to create for every compatible
+                             combination of runtime and device type.
+        """
+        fake = FakeSimctl()
+
+        for platform, version, build_version in _DEFAULT_RUNTIMES:
+            fake.add_runtime(platform, version, build_version)
+
+        for name, product_family in _DEFAULT_DEVICE_TYPES:
+            fake.add_device_type(name, product_family)
+
+        for runtime in fake.runtimes:
+            for device_type in fake.device_types:
+                if not FakeSimctl.is_compatible(runtime, device_type):
+                    continue
+
+                for index in range(devices_per_pairing):
+                    fake.add_device(
+                        f"{device_type['name']} ({index})",
+                        device_type["identifier"],
+                        runtime["identifier"],
+                    )
+
+        return fake
+
+    # Inventory
+
+    @staticmethod
+    def is_compatible(runtime: Dict[str, Any], device_type: Dict[str, Any]) -> bool:
+        """Return True if devices of the device type can run the runtime."""
+        return device_type["productFamily"] in _PLATFORM_FAMILIES.get(runtime["platform"], set())
+
+    def add_runtime(
+        self, platform: str, version: str, build_version: str = "1A1", is_available: bool = True
+    ) -> Dict[str, Any]:
+        """Add a runtime, returning its simctl info."""
+        name = f"{platform} {version}"
+        volume = f"/Library/Developer/CoreSimulator/Volumes/{platform}_{build_version}"
+        bundle_path = (
+            f"{volume}/Library/Developer/CoreSimulator/Profiles/Runtimes/{name}.simruntime"
+        )
+        identifier = f"com.apple.CoreSimulator.SimRuntime.{platform}-{version.replace('.', '-')}"
+        runtime: Dict[str, Any] = {
+            "bundlePath": bundle_path,
+            "buildversion": build_version,
+            "platform": platform,
+            "runtimeRoot": f"{bundle_path}/Contents/Resources/RuntimeRoot",
+            "identifier": identifier,
+            "version": version,
+            "isInternal": False,
+            "isAvailable": is_available,
+            "name": name,
+            "supportedDeviceTypes": [],
+        }
+
+        with self._lock:
+            self.runtimes.append(runtime)
+            self.devices.setdefault(runtime["identifier"], [])
+
+        return runtime
+
+    def add_device_type(self, name: str, product_family: str) -> Dict[str, Any]:
+        """Add a device type, returning its simctl info."""
+        platform = _FAMILY_PLATFORM_BUNDLES.get(product_family, "iPhoneOS")
+        profiles = f"{_PLATFORMS_ROOT}/{platform}.platform/Library/Developer/CoreSimulator/Profiles"
+
+        device_type = {
+            "productFamily": product_family,
+            "bundlePath": f"{profiles}/DeviceTypes/{name}.simdevicetype",
+            "identifier": f"com.apple.CoreSimulator.SimDeviceType.{_identifier_suffix(name)}",
+            "name": name,
+        }
+
+        with self._lock:
+            self.device_types.append(device_type)
+
+        return device_type
+
+    def add_device(
+        self,
+        name: str,
+        device_type_identifier: str,
+        runtime_identifier: str,
+        state: str = "Shutdown",
+        is_available: bool = True,
+    ) -> Dict[str, Any]:
+        """Add a device without any validation, returning its simctl info."""
+        udid = str(uuid.uuid4()).upper()
+        device: Dict[str, Any] = {
+            "dataPath": f"{_DEVICES_ROOT}/{udid}/data",
+            "dataPathSize": 0,
+            "logPath": f"{_LOGS_ROOT}/{udid}",
+            "udid": udid,
+            "isAvailable": is_available,
+            "deviceTypeIdentifier": device_type_identifier,
+            "state": state,
+            "name": name,
+        }
+
+        if not is_available:
+            device["availabilityError"] = "runtime profile not found"
+
+        with self._lock:
+            self.devices.setdefault(runtime_identifier, []).append(device)
+
+        return device
+
+    def list_output(self) -> Dict[str, Any]:
+        """Return a copy of what `xcrun simctl list --json` would output."""
+        with self._lock:
+            return copy.deepcopy(
+                {
+                    "devicetypes": self.device_types,
+                    "runtimes": self.runtimes,
+                    "devices": self.devices,
+                    "pairs": self.pairs,
+                }
+            )
+
+    def write_device_set(self, path: str) -> None:
+        """Write the devices out as a CoreSimulator device set, for `DeviceSetReader`.
+
+        Only the files the reader needs are written.
+        """
+        state_values = {state: value for value, state in DEVICE_STATES.items()}
+
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+
+            with open(os.path.join(path, "device_set.plist"), "wb") as device_set_file:
+                plistlib.dump({"Version": 0, "DefaultDevices": {}}, device_set_file)
+
+            for runtime_identifier, devices in self.devices.items():
+                for device in devices:
+                    device_path = os.path.join(path, device["udid"])
+                    os.makedirs(os.path.join(device_path, "data"), exist_ok=True)
+
+                    with open(os.path.join(device_path, "device.plist"), "wb") as device_file:
+                        plistlib.dump(
+                            {
+                                "UDID": device["udid"],
+                                "deviceType": device["deviceTypeIdentifier"],
+                                "isDeleted": False,
+                                "name": device["name"],
+                                "runtime": runtime_identifier,
+                                "state": state_values[device["state"]],
+                            },
+                            device_file,
+                        )
+
+    # Executor
+
+    def run(self, args: List[str], timeout: Optional[float] = None) -> str:
+        """Run the fake simctl command and return its output."""
+        with self._lock:
+            self.commands.append(list(args))
+
+            if not args:
+                raise self._error(args, _USAGE_ERROR, "No subcommand")
+
+            handler = self._handlers().get(args[0])
+
+            if handler is None:
+                raise self._error(args, _USAGE_ERROR, f"Unknown subcommand: {args[0]}")
+
+            return handler(args)
+
+    def _handlers(self) -> Dict[str, Callable[[List[str]], str]]:
+        return {
+            "list": self._list,
+            "create": self._create,
+            "clone": self._clone,
+            "delete": self._delete,
+            "rename": self._rename,
+            "upgrade": self._upgrade,
+            "boot": self._boot,
+            "bootstatus": self._bootstatus,
+            "shutdown": self._shutdown,
+            "erase": self._erase,
+            "pair": self._pair,
+            "unpair": self._unpair,
+            "pair_activate": self._pair_activate,
+            "install": self._install,
+            "uninstall": self._uninstall,
+            "launch": self._launch,
+            "terminate": self._requires_booted,
+            "openurl": self._requires_booted,
+            "addmedia": self._requires_booted,
+            "icloud_sync": self._requires_booted,
+            "logverbose": self._noop,
+            "get_app_container": self._get_app_container,
+            "getenv": self._getenv,
+            "spawn": self._spawn,
+            "io": self._io,
+            "diagnose": self._diagnose,
+        }
+
+    # Helpers
+
+    @staticmethod
+    def _error(args: List[str], returncode: int, message: str) -> subprocess.CalledProcessError:
+        return subprocess.CalledProcessError(
+            returncode, ["xcrun", "simctl"] + args, output="", stderr=message
+        )
+
+    @staticmethod
+    def _argument(args: List[str], position: int) -> str:
+        if len(args) <= position:
+            raise FakeSimctl._error(args, _USAGE_ERROR, "Missing argument")
+        return args[position]
+
+    def _find_device(self, args: List[str], position: int = 1) -> Tuple[str, Dict[str, Any]]:
+        """Find the device referred to by an argument, returning it with its runtime ID."""
+        reference = self._argument(args, position)
+
+        for runtime_id, devices in self.devices.items():
+            for device in devices:
+                if reference == device["udid"]:
+                    return runtime_id, device
+                if reference == "booted" and device["state"] == "Booted":
+                    return runtime_id, device
+
+        raise self._error(args, _INVALID_DEVICE, f"Invalid device: {reference}")
+
+    def _find_runtime(self, args: List[str], reference: str) -> Dict[str, Any]:
+        for runtime in self.runtimes:
+            if reference in (runtime["identifier"], runtime["name"]):
+                return runtime
+        raise self._error(args, _USAGE_ERROR, f"Invalid runtime: {reference}")
+
+    def _find_device_type(self, args: List[str], reference: str) -> Dict[str, Any]:
+        for device_type in self.device_types:
+            if reference in (device_type["identifier"], device_type["name"]):
+                return device_type
+        raise self._error(args, _INVALID_DEVICE_TYPE, f"Invalid device type: {reference}")
+
+    def _check_state(self, args: List[str], device: Dict[str, Any], state: str) -> None:
+        if device["state"] != state:
+            raise self._error(
+                args,
+                _INVALID_STATE,
+                f"Unable to {args[0]} device in current state: {device['state']}",
+            )
+
+    def _targets(self, args: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Return the devices targeted by a command which supports `all`."""
+        if self._argument(args, 1) == "all":
+            return [
+                (runtime_id, device)
+                for runtime_id, devices in self.devices.items()
+                for device in devices
+            ]
+        return [self._find_device(args)]
+
+    def _new_device(
+        self, args: List[str], name: str, device_type: Dict[str, Any], runtime: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        if not FakeSimctl.is_compatible(runtime, device_type):
+            raise self._error(
+                args,
+                ErrorCodes.INCOMPATIBLE_DEVICE.value,
+                f"Incompatible device: {device_type['name']} on {runtime['name']}",
+            )
+        return self.add_device(name, device_type["identifier"], runtime["identifier"])
+
+    # Commands
+
+    def _list(self, args: List[str]) -> str:
+        output = self.list_output()
+        keys = [arg for arg in args[1:] if not arg.startswith("-")]
+
+        if keys:
+            if keys[0] not in output:
+                raise self._error(args, _USAGE_ERROR, f"Invalid list type: {keys[0]}")
+            output = {keys[0]: output[keys[0]]}
+
+        return json.dumps(output, indent=2) + "\n"
+
+    def _create(self, args: List[str]) -> str:
+        name = self._argument(args, 1)
+        device_type = self._find_device_type(args, self._argument(args, 2))
+
+        if len(args) > 3:
+            runtime = self._find_runtime(args, args[3])
+        else:
+            # Like simctl, pick the newest compatible runtime
+            compatible = [
+                runtime
+                for runtime in self.runtimes
+                if FakeSimctl.is_compatible(runtime, device_type)
+            ]
+            if not compatible:
+                raise self._error(args, ErrorCodes.INCOMPATIBLE_DEVICE.value, "No runtime")
+            runtime = compatible[-1]
+
+        return self._new_device(args, name, device_type, runtime)["udid"] + "\n"
+
+    def _clone(self, args: List[str]) -> str:
+        runtime_id, source = self._find_device(args)
+        self._check_state(args, source, "Shutdown")
+        clone = self.add_device(self._argument(args, 2), source["deviceTypeIdentifier"], runtime_id)
+        self.apps[clone["udid"]] = dict(self.apps.get(source["udid"], {}))
+        return clone["udid"] + "\n"
+
+    def _delete(self, args: List[str]) -> str:
+        target = self._argument(args, 1)
+
+        if target == "unavailable":
+            doomed = [
+                device["udid"]
+                for devices in self.devices.values()
+                for device in devices
+                if not device["isAvailable"]
+            ]
+        else:
+            doomed = [device["udid"] for _, device in self._targets(args)]
+
+        for runtime_id, devices in self.devices.items():
+            self.devices[runtime_id] = [
+                device for device in devices if device["udid"] not in doomed
+            ]
+
+        for pair_id, pair in list(self.pairs.items()):
+            if pair["watch"]["udid"] in doomed or pair["phone"]["udid"] in doomed:
+                del self.pairs[pair_id]
+
+        for udid in doomed:
+            self.apps.pop(udid, None)
+            self.environment.pop(udid, None)
+
+        return ""
+
+    def _rename(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        device["name"] = self._argument(args, 2)
+        self._update_pairs(device)
+        return ""
+
+    def _upgrade(self, args: List[str]) -> str:
+        runtime_id, device = self._find_device(args)
+        self._check_state(args, device, "Shutdown")
+        runtime = self._find_runtime(args, self._argument(args, 2))
+        device_type = self._find_device_type(args, device["deviceTypeIdentifier"])
+
+        if not FakeSimctl.is_compatible(runtime, device_type):
+            raise self._error(args, ErrorCodes.INCOMPATIBLE_DEVICE.value, "Incompatible runtime")
+
+        self.devices[runtime_id].remove(device)
+        self.devices.setdefault(runtime["identifier"], []).append(device)
+        return ""
+
+    def _set_state(self, device: Dict[str, Any], state: str) -> None:
+        device["state"] = state
+        self._update_pairs(device)
+
+    def _update_pairs(self, device: Dict[str, Any]) -> None:
+        for pair in self.pairs.values():
+            for role in ["watch", "phone"]:
+                if pair[role]["udid"] == device["udid"]:
+                    pair[role]["name"] = device["name"]
+                    pair[role]["state"] = device["state"]
+
+            connected = pair["watch"]["state"] == "Booted" and pair["phone"]["state"] == "Booted"
+            active = "active" if pair["state"].startswith("(active") else "inactive"
+            pair["state"] = f"({active}, {'connected' if connected else 'disconnected'})"
+
+    def _boot(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Shutdown")
+        self._set_state(device, "Booted")
+        return ""
+
+    def _bootstatus(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+
+        if device["state"] != "Booted":
+            if "-b" not in args:
+                raise self._error(args, _INVALID_STATE, "Device is not booted")
+            self._set_state(device, "Booted")
+
+        return "\n".join(
+            [
+                f"Monitoring boot status for {device['name']} ({device['udid']}).",
+                "Waiting on System App",
+                "Finished Waiting on System App",
+                "Device booted in 0.01 seconds",
+                "",
+            ]
+        )
+
+    def _shutdown(self, args: List[str]) -> str:
+        targets = self._targets(args)
+
+        if len(targets) == 1 and args[1] != "all":
+            # simctl uses a different code for this one
+            if targets[0][1]["state"] != "Booted":
+                raise self._error(args, 164, "Unable to shutdown device in current state: Shutdown")
+
+        for _, device in targets:
+            if device["state"] == "Booted":
+                self._set_state(device, "Shutdown")
+                # launchd doesn't keep its environment over a reboot
+                self.environment.pop(device["udid"], None)
+
+        return ""
+
+    def _erase(self, args: List[str]) -> str:
+        targets = self._targets(args)
+
+        for _, device in targets:
+            self._check_state(args, device, "Shutdown")
+
+        for _, device in targets:
+            self.apps.pop(device["udid"], None)
+            self.environment.pop(device["udid"], None)
+
+        return ""
+
+    def _pair(self, args: List[str]) -> str:
+        watch_runtime, watch = self._find_device(args, 1)
+        phone_runtime, phone = self._find_device(args, 2)
+
+        if "watchOS" not in watch_runtime or "iOS" not in phone_runtime:
+            raise self._error(args, _USAGE_ERROR, "A pair needs a watch and a phone")
+
+        pair_id = str(uuid.uuid4()).upper()
+
+        # Pairing a new watch makes it the active one for the phone
+        for pair in self.pairs.values():
+            if pair["phone"]["udid"] == phone["udid"]:
+                pair["state"] = pair["state"].replace("(active", "(inactive")
+
+        self.pairs[pair_id] = {
+            "watch": {"name": watch["name"], "udid": watch["udid"], "state": watch["state"]},
+            "phone": {"name": phone["name"], "udid": phone["udid"], "state": phone["state"]},
+            "state": "(active, disconnected)",
+        }
+        self._update_pairs(watch)
+        return pair_id + "\n"
+
+    def _find_pair(self, args: List[str]) -> Dict[str, Any]:
+        pair_id = self._argument(args, 1)
+        if pair_id not in self.pairs:
+            raise self._error(args, _USAGE_ERROR, f"Invalid pair: {pair_id}")
+        return self.pairs[pair_id]
+
+    def _unpair(self, args: List[str]) -> str:
+        self._find_pair(args)
+        del self.pairs[args[1]]
+        return ""
+
+    def _pair_activate(self, args: List[str]) -> str:
+        activated = self._find_pair(args)
+
+        for pair in self.pairs.values():
+            if pair["phone"]["udid"] == activated["phone"]["udid"]:
+                pair["state"] = pair["state"].replace("(active", "(inactive")
+
+        activated["state"] = activated["state"].replace("(inactive", "(active")
+        return ""
+
+    def _requires_booted(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Booted")
+        return ""
+
+    @staticmethod
+    def _noop(_: List[str]) -> str:
+        return ""
+
+    def _install(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Booted")
+        path = self._argument(args, 2)
+        bundle_id = os.path.splitext(os.path.basename(path.rstrip("/")))[0]
+
+        info_plist_path = os.path.join(path, "Info.plist")
+        if os.path.isfile(info_plist_path):
+            with open(info_plist_path, "rb") as info_plist_file:
+                bundle_id = plistlib.load(info_plist_file).get("CFBundleIdentifier", bundle_id)
+
+        self.apps.setdefault(device["udid"], {})[bundle_id] = path
+        return ""
+
+    def _installed_app(self, args: List[str], device: Dict[str, Any]) -> str:
+        bundle_id = self._argument(args, 2)
+        if bundle_id not in self.apps.get(device["udid"], {}):
+            raise self._error(args, 2, f"No such file or directory: {bundle_id}")
+        return bundle_id
+
+    def _uninstall(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Booted")
+        bundle_id = self._installed_app(args, device)
+        del self.apps[device["udid"]][bundle_id]
+        return ""
+
+    def _launch(self, args: List[str]) -> str:
+        # Options (e.g. --console-pty) come before the device
+        args = [args[0]] + list(itertools.dropwhile(lambda arg: arg.startswith("-"), args[1:]))
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Booted")
+        bundle_id = self._installed_app(args, device)
+        self._next_pid += 1
+        return f"{bundle_id}: {self._next_pid}\n"
+
+    def _get_app_container(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Booted")
+        bundle_id = self._installed_app(args, device)
+        kind = args[3] if len(args) > 3 else "app"
+        container_id = uuid.uuid5(uuid.NAMESPACE_URL, f"{device['udid']}/{bundle_id}/{kind}")
+        data_path = device["dataPath"]
+
+        if kind == "app":
+            path = self.apps[device["udid"]][bundle_id]
+            name = os.path.basename(path.rstrip("/"))
+            return f"{data_path}/Containers/Bundle/Application/{str(container_id).upper()}/{name}\n"
+
+        if kind == "data":
+            return f"{data_path}/Containers/Data/Application/{str(container_id).upper()}\n"
+
+        return f"{data_path}/Containers/Shared/AppGroup/{str(container_id).upper()}\n"
+
+    def _getenv(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Booted")
+        variable = self._argument(args, 2)
+
+        if variable == "HOME":
+            return device["dataPath"] + "\n"
+
+        if variable == "SIMULATOR_UDID":
+            return device["udid"] + "\n"
+
+        if variable in self.environment.get(device["udid"], {}):
+            return self.environment[device["udid"]][variable] + "\n"
+
+        raise self._error(args, 1, f"No such variable: {variable}")
+
+    def _spawn(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Booted")
+        executable = self._argument(args, 2)
+
+        # Only enough to be useful in tests
+        if os.path.basename(executable) == "echo":
+            return " ".join(args[3:]) + "\n"
+
+        if os.path.basename(executable) == "launchctl" and args[3:4] == ["setenv"]:
+            variables = self.environment.setdefault(device["udid"], {})
+            variables[self._argument(args, 4)] = self._argument(args, 5)
+
+        return ""
+
+    def _diagnose(self, args: List[str]) -> str:
+        options = dict(arg[2:].split("=", 1) for arg in args[1:] if "=" in arg)
+        output_path = options.get("output")
+
+        if output_path is None:
+            raise self._error(args, _USAGE_ERROR, "Missing --output")
+
+        udids = [arg.split("=", 1)[1] for arg in args[1:] if arg.startswith("--udid=")]
+        lines = ["Collecting diagnostic information..."]
+        os.makedirs(output_path)
+
+        for udid in udids:
+            runtime_id, device = self._find_device([args[0], udid])
+            lines.append(f"Collecting logs for {device['name']} ({udid})")
+
+            with open(os.path.join(output_path, f"{udid}.txt"), "w", encoding="utf-8") as log:
+                log.write(f"{device['name']} {runtime_id} {device['state']}\n")
+
+        if "--no-archive" not in args:
+            lines.append("Archiving...")
+
+            with tarfile.open(output_path + ".tar.gz", "w:gz") as archive:
+                archive.add(output_path, arcname=os.path.basename(output_path))
+
+            shutil.rmtree(output_path)
+
+        lines.append("Done.")
+        return "\n".join(lines) + "\n"
+
+    def _io(self, args: List[str]) -> str:
+        _, device = self._find_device(args)
+        self._check_state(args, device, "Booted")
+
+        if self._argument(args, 2) == "recordVideo":
+            output_path = self._argument(args, len(args) - 1)
+
+            if os.path.exists(output_path) and "--force" not in args:
+                raise self._error(args, 1, f"File already exists: {output_path}")
+
+            with open(output_path, "wb"):
+                pass
+
+            return "Recording started\n"
+
+        return ""
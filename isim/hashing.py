@@ -0,0 +1,94 @@
+"""Content hashes and sizes of files and directory trees (such as app bundles)."""
+
+import concurrent.futures
+import hashlib
+import os
+import stat
+from typing import List, Optional, Tuple
+
+# How much of a file to read at a time
+_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """Return the SHA-256 of a file's contents, as a hex string."""
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def disk_usage(path: str) -> int:
+    """Return the size in bytes of a file, or of everything in a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    total = 0
+
+    for directory, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                total += os.lstat(os.path.join(directory, file_name)).st_size
+            except OSError:
+                pass
+
+    return total
+
+
+def _tree_entries(path: str) -> Tuple[List[str], List[Tuple[str, str, bool]]]:
+    """Return the descriptions of the directories and symlinks in a tree, and its files.
+
+    Files are returned as (relative path, full path, executable) so that they
+    can be hashed separately.
+    """
+    entries = []
+    files = []
+
+    for directory, directory_names, file_names in os.walk(path):
+        relative_directory = os.path.relpath(directory, path)
+
+        for name in directory_names + file_names:
+            full_path = os.path.join(directory, name)
+            relative_path = os.path.normpath(os.path.join(relative_directory, name))
+            mode = os.lstat(full_path).st_mode
+
+            if stat.S_ISLNK(mode):
+                entries.append(f"L {relative_path} {os.readlink(full_path)}")
+            elif stat.S_ISDIR(mode):
+                entries.append(f"D {relative_path}")
+            elif stat.S_ISREG(mode):
+                files.append((relative_path, full_path, bool(mode & stat.S_IXUSR)))
+
+    return entries, files
+
+
+def hash_tree(path: str, *, max_workers: Optional[int] = None) -> str:
+    """Return a SHA-256 of a directory tree, as a hex string.
+
+    The hash covers the contents, paths and executable bits of every file, the
+    targets of symlinks and the empty directories, but not timestamps or
+    ownership, so two copies of the same bundle hash the same. Files are
+    hashed in parallel. If `path` is a file, its contents are hashed instead.
+
+    max_workers: The most files to hash at once.
+    """
+    if not os.path.isdir(path):
+        return hash_file(path)
+
+    entries, files = _tree_entries(path)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        digests = executor.map(hash_file, [full_path for _, full_path, _ in files])
+
+        for (relative_path, _, executable), file_digest in zip(files, digests):
+            entries.append(f"F {relative_path} {'x' if executable else '-'} {file_digest}")
+
+    digest = hashlib.sha256()
+
+    for entry in sorted(entries):
+        digest.update(entry.encode("utf-8", "surrogateescape") + b"\n")
+
+    return digest.hexdigest()
@@ -0,0 +1,157 @@
+"""Searching the MobileInstallation logs of a simulator."""
+
+import os
+import re
+import threading
+from typing import BinaryIO, Dict, Optional, Tuple
+
+# Matches every app, so a single pass can pick up containers for any of them
+_CONTAINER_PATTERN = re.compile(r"Data container for (\S+) is now at (.*)")
+
+# How much of a log file is read at a time when scanning backwards
+_CHUNK_SIZE = 64 * 1024
+
+
+class InstallLogIndex:
+    """Finds the latest data container for apps in a single MobileInstallation log.
+
+    The log is scanned backwards from the end, a chunk at a time, stopping as
+    soon as the requested app is found. Every other container seen on the
+    way is remembered, along with how far back the scan got, so later lookups
+    for other apps either hit straight away or carry on from where the
+    previous scan stopped rather than re-reading the file.
+    """
+
+    path: str
+    mtime_ns: int
+    size: int
+    containers: Dict[str, str]
+
+    # Every line starting at or after this offset has been scanned
+    _position: int
+    _chunk_size: int
+
+    def __init__(self, path: str, chunk_size: int = _CHUNK_SIZE) -> None:
+        """Construct an index for a log file.
+
+        path: The path to the log file.
+        chunk_size: How many bytes to read at a time.
+        """
+        stat = os.stat(path)
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.containers = {}
+        self._position = stat.st_size
+        self._chunk_size = chunk_size
+
+    def is_current(self) -> bool:
+        """Return True if the log file hasn't changed since the index was created."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        return (stat.st_mtime_ns, stat.st_size) == (self.mtime_ns, self.size)
+
+    def find(self, app_identifier: str) -> Optional[str]:
+        """Return the latest data container logged for the app, if there is one."""
+        container = self.containers.get(app_identifier)
+
+        if container is not None or self._position == 0:
+            return container
+
+        with open(self.path, "rb") as log_file:
+            return self._scan(log_file, app_identifier)
+
+    def _scan(self, log_file: BinaryIO, app_identifier: str) -> Optional[str]:
+        """Scan backwards from the current position until the app is found."""
+        read_end = self._position
+
+        # The start of the earliest line in the previous chunk, which may be incomplete
+        carry = b""
+
+        while read_end > 0:
+            read_start = max(0, read_end - self._chunk_size)
+            log_file.seek(read_start)
+            lines = (log_file.read(read_end - read_start) + carry).split(b"\n")
+
+            if read_start > 0:
+                carry = lines.pop(0)
+                offset = read_start + len(carry) + 1
+            else:
+                carry = b""
+                offset = 0
+
+            line_starts = []
+            for line in lines:
+                line_starts.append(offset)
+                offset += len(line) + 1
+
+            for line, line_start in zip(reversed(lines), reversed(line_starts)):
+                match = _CONTAINER_PATTERN.search(line.decode("utf-8", errors="replace"))
+
+                if match is None:
+                    continue
+
+                found_identifier = match.group(1)
+                container = match.group(2).strip()
+
+                # We're going backwards, so the first one we see is the latest
+                self.containers.setdefault(found_identifier, container)
+
+                if found_identifier == app_identifier:
+                    self._position = line_start
+                    return container
+
+            read_end = read_start
+
+        self._position = 0
+        return None
+
+
+class _IndexCache:
+    """Keeps the index for each log file, replacing it when the file changes."""
+
+    _lock: threading.Lock
+    _indexes: Dict[str, Tuple[InstallLogIndex, threading.Lock]]
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._indexes = {}
+
+    def find(self, path: str, app_identifier: str) -> Optional[str]:
+        """Return the latest data container for the app from the log file."""
+        with self._lock:
+            entry = self._indexes.get(path)
+
+            if entry is None or not entry[0].is_current():
+                entry = (InstallLogIndex(path), threading.Lock())
+                self._indexes[path] = entry
+
+        index, index_lock = entry
+
+        with index_lock:
+            return index.find(app_identifier)
+
+    def clear(self) -> None:
+        """Drop all indexes."""
+        with self._lock:
+            self._indexes.clear()
+
+
+_INDEX_CACHE = _IndexCache()
+
+
+def find_data_container(log_path: str, app_identifier: str) -> Optional[str]:
+    """Return the latest data container for the app logged in a MobileInstallation log.
+
+    Results are cached per log file for as long as the file's modification
+    time and size stay the same.
+    """
+    return _INDEX_CACHE.find(log_path, app_identifier)
+
+
+def clear_cache() -> None:
+    """Forget everything learned from previously scanned log files."""
+    _INDEX_CACHE.clear()
@@ -0,0 +1,358 @@
+"""Timing, counters and tracing for the simctl commands isim runs.
+
+Every command run through `SimulatorControlBase.run_command` (and the async
+equivalent), along with every `list_type` lookup, produces a `CommandRecord`.
+Records are passed to each registered hook and added to the process wide
+statistics:
+
+    from isim import instrumentation
+
+    instrumentation.add_hook(instrumentation.LoggingHook())
+    ...
+    print(instrumentation.STATS.summary())
+"""
+
+import collections
+import logging
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+class CommandRecord:
+    """Describes a single simctl command (or list lookup)."""
+
+    args: List[str]
+    start_time: float
+    duration: float
+    exit_code: Optional[int]
+    output_size: int
+    error: Optional[BaseException]
+    cached: bool
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        args: List[str],
+        start_time: float,
+        duration: float,
+        output: Optional[str],
+        error: Optional[BaseException],
+        *,
+        cached: bool = False,
+        output_size: Optional[int] = None,
+    ) -> None:
+        """Construct a CommandRecord.
+
+        args: The arguments passed to `xcrun simctl`.
+        start_time: When the command started, as a `time.time()` timestamp.
+        duration: How long the command took in seconds.
+        output: The standard output of the command, if it succeeded.
+        error: The exception raised by the command, if it failed.
+        cached: True if this was a list lookup served from the list cache.
+        output_size: The size of the output, for commands whose output was
+                     streamed rather than kept. Defaults to the size of `output`.
+        """
+        self.args = args
+        self.start_time = start_time
+        self.duration = duration
+
+        if output_size is not None:
+            self.output_size = output_size
+        else:
+            self.output_size = len(output) if output is not None else 0
+        self.error = error
+        self.cached = cached
+
+        if error is None:
+            self.exit_code = 0
+        elif isinstance(error, subprocess.CalledProcessError):
+            self.exit_code = error.returncode
+        else:
+            # Timeouts and other failures don't have an exit code
+            self.exit_code = None
+
+    # pylint: enable=too-many-arguments
+
+    @property
+    def subcommand(self) -> str:
+        """Return the simctl subcommand, e.g. `boot`."""
+        return self.args[0] if self.args else ""
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        cached = " (cached)" if self.cached else ""
+        return (
+            f"simctl {' '.join(self.args)}{cached}: exit code {self.exit_code}, "
+            f"{self.duration * 1000:.1f} ms, {self.output_size} bytes"
+        )
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str(
+            {
+                "args": self.args,
+                "start_time": self.start_time,
+                "duration": self.duration,
+                "exit_code": self.exit_code,
+                "output_size": self.output_size,
+                "error": self.error,
+                "cached": self.cached,
+            }
+        )
+
+
+CommandHook = Callable[[CommandRecord], None]
+
+
+class CommandStats:
+    """Aggregate timings per simctl subcommand.
+
+    Instances can be registered as hooks. The most recent `max_samples`
+    durations are kept for each subcommand to calculate percentiles.
+    """
+
+    max_samples: int
+
+    _lock: threading.Lock
+    _counts: Dict[str, int]
+    _errors: Dict[str, int]
+    _durations: Dict[str, Deque[float]]
+
+    def __init__(self, max_samples: int = 10000) -> None:
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._errors = {}
+        self._durations = {}
+
+    def __call__(self, record: CommandRecord) -> None:
+        """Add a record to the statistics."""
+        # Cache hits would drag the list timings down, so leave them out
+        if record.cached:
+            return
+
+        with self._lock:
+            self._counts[record.subcommand] = self._counts.get(record.subcommand, 0) + 1
+
+            if record.error is not None:
+                self._errors[record.subcommand] = self._errors.get(record.subcommand, 0) + 1
+
+            durations = self._durations.get(record.subcommand)
+
+            if durations is None:
+                durations = collections.deque(maxlen=self.max_samples)
+                self._durations[record.subcommand] = durations
+
+            durations.append(record.duration)
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], percentile: float) -> float:
+        """Return the nearest rank percentile of some sorted values."""
+        rank = max(int(round(percentile / 100 * len(sorted_values))) - 1, 0)
+        return sorted_values[min(rank, len(sorted_values) - 1)]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Return the count, error count, total, p50, p95 and max time per subcommand."""
+        with self._lock:
+            snapshot = {
+                subcommand: (
+                    self._counts[subcommand],
+                    self._errors.get(subcommand, 0),
+                    list(values),
+                )
+                for subcommand, values in self._durations.items()
+            }
+
+        summary = {}
+
+        for subcommand, (count, errors, durations) in snapshot.items():
+            durations.sort()
+            summary[subcommand] = {
+                "count": count,
+                "errors": errors,
+                "total": sum(durations),
+                "p50": CommandStats._percentile(durations, 50),
+                "p95": CommandStats._percentile(durations, 95),
+                "max": durations[-1],
+            }
+
+        return summary
+
+    def reset(self) -> None:
+        """Clear all statistics."""
+        with self._lock:
+            self._counts.clear()
+            self._errors.clear()
+            self._durations.clear()
+
+
+class LoggingHook:
+    """A hook which logs every command."""
+
+    logger: logging.Logger
+    level: int
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG) -> None:
+        """Construct a LoggingHook.
+
+        logger: The logger to use. Defaults to the `isim` logger.
+        level: The level to log successful commands at. Failures are logged as warnings.
+        """
+        self.logger = logger if logger is not None else logging.getLogger("isim")
+        self.level = level
+
+    def __call__(self, record: CommandRecord) -> None:
+        """Log the record."""
+        level = self.level if record.error is None else logging.WARNING
+        self.logger.log(level, "%s", record)
+
+
+class SpanHook:
+    """A hook which reports every command as a span to an OpenTelemetry style tracer.
+
+    Any tracer with a `start_span(name, start_time=..., attributes=...)`
+    method returning a span with `end(end_time=...)` (and optionally
+    `record_exception`) works, such as `opentelemetry.trace.Tracer`.
+    Times are passed in nanoseconds since the epoch.
+    """
+
+    tracer: Any
+
+    def __init__(self, tracer: Any) -> None:
+        """Construct a SpanHook.
+
+        tracer: The tracer to start spans with.
+        """
+        self.tracer = tracer
+
+    def __call__(self, record: CommandRecord) -> None:
+        """Report the record as a span."""
+        start_time = int(record.start_time * 1e9)
+        span = self.tracer.start_span(
+            f"simctl {record.subcommand}",
+            start_time=start_time,
+            attributes={
+                "simctl.subcommand": record.subcommand,
+                "simctl.args": list(record.args),
+                "simctl.exit_code": -1 if record.exit_code is None else record.exit_code,
+                "simctl.output_size": record.output_size,
+                "simctl.cached": record.cached,
+            },
+        )
+
+        if record.error is not None and hasattr(span, "record_exception"):
+            span.record_exception(record.error)
+
+        span.end(end_time=start_time + int(record.duration * 1e9))
+
+
+class _Hooks:
+    """Holds the registered hooks."""
+
+    _lock: threading.Lock
+    _hooks: List[CommandHook]
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hooks = []
+
+    def add(self, hook: CommandHook) -> None:
+        """Register a hook."""
+        with self._lock:
+            self._hooks = self._hooks + [hook]
+
+    def remove(self, hook: CommandHook) -> None:
+        """Unregister a hook."""
+        with self._lock:
+            self._hooks = [existing for existing in self._hooks if existing is not hook]
+
+    def all(self) -> List[CommandHook]:
+        """Return the registered hooks."""
+        # The list is replaced rather than modified, so no lock is needed to read it
+        return self._hooks
+
+
+_HOOKS = _Hooks()
+
+# The process wide statistics for all commands
+STATS = CommandStats()
+
+
+def add_hook(hook: CommandHook) -> None:
+    """Register a hook to be called with a `CommandRecord` after every command.
+
+    Hooks are called on the thread which ran the command. Exceptions raised
+    by hooks are logged and otherwise ignored.
+    """
+    _HOOKS.add(hook)
+
+
+def remove_hook(hook: CommandHook) -> None:
+    """Unregister a hook added with `add_hook`."""
+    _HOOKS.remove(hook)
+
+
+# pylint: disable=too-many-arguments
+def record_command(
+    args: List[str],
+    start_time: float,
+    duration: float,
+    output: Optional[str],
+    error: Optional[BaseException],
+    *,
+    cached: bool = False,
+    output_size: Optional[int] = None,
+) -> None:
+    """Report a command to the statistics and every hook.
+
+    See `CommandRecord` for the arguments.
+    """
+    record = CommandRecord(
+        args, start_time, duration, output, error, cached=cached, output_size=output_size
+    )
+    STATS(record)
+
+    for hook in _HOOKS.all():
+        try:
+            hook(record)
+        except Exception:
+            logging.getLogger("isim").exception("Instrumentation hook failed")
+
+
+# pylint: enable=too-many-arguments
+
+
+class CommandTimer:
+    """Times a command and reports it with `record_command`.
+
+    with CommandTimer(args) as timer:
+        timer.output = run(args)
+    """
+
+    args: List[str]
+    output: Optional[str]
+
+    _start_time: float
+    _start: float
+
+    def __init__(self, args: List[str]) -> None:
+        self.args = args
+        self.output = None
+        self._start_time = 0.0
+        self._start = 0.0
+
+    def __enter__(self) -> "CommandTimer":
+        self._start_time = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        record_command(
+            self.args,
+            self._start_time,
+            time.perf_counter() - self._start,
+            self.output,
+            exc_value,
+        )
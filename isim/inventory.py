@@ -0,0 +1,84 @@
+"""Comparing two inventories of devices."""
+
+from typing import Dict, Iterable, List, Tuple, Union
+
+from isim.device import Device
+
+# Either the result of `Device.list_all()` or a plain collection of devices
+DeviceInventory = Union[Dict[str, List[Device]], Iterable[Device]]
+
+
+def _by_udid(inventory: DeviceInventory) -> Dict[str, Device]:
+    """Key every device in an inventory by UDID."""
+    if isinstance(inventory, dict):
+        return {device.udid: device for devices in inventory.values() for device in devices}
+
+    return {device.udid: device for device in inventory}
+
+
+class InventoryDiff:
+    """The differences between an old and a new inventory of devices."""
+
+    added: List[Device]
+    removed: List[Device]
+    changed: List[Tuple[Device, Device]]
+
+    def __init__(
+        self,
+        added: List[Device],
+        removed: List[Device],
+        changed: List[Tuple[Device, Device]],
+    ) -> None:
+        """Construct an InventoryDiff.
+
+        added: Devices which are only in the new inventory.
+        removed: Devices which are only in the old inventory.
+        changed: (old, new) pairs for devices in both whose content differs.
+        """
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    @property
+    def state_changed(self) -> List[Tuple[Device, Device]]:
+        """Return the (old, new) pairs for devices whose state (e.g. Booted) changed."""
+        return [(old, new) for old, new in self.changed if old.state != new.state]
+
+    @property
+    def renamed(self) -> List[Tuple[Device, Device]]:
+        """Return the (old, new) pairs for devices which were renamed."""
+        return [(old, new) for old, new in self.changed if old.name != new.name]
+
+    def __bool__(self) -> bool:
+        """Return True if anything differs."""
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        return f"{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str({"added": self.added, "removed": self.removed, "changed": self.changed})
+
+
+def diff_devices(old: DeviceInventory, new: DeviceInventory) -> InventoryDiff:
+    """Compare two inventories of devices, such as two results of `Device.list_all()`.
+
+    Devices are matched by UDID, so this takes linear time. Devices which are
+    in both are only compared in full if they aren't the exact same output.
+    """
+    old_devices = _by_udid(old)
+    new_devices = _by_udid(new)
+
+    added = [device for udid, device in new_devices.items() if udid not in old_devices]
+    removed = [device for udid, device in old_devices.items() if udid not in new_devices]
+    changed = []
+
+    for udid, new_device in new_devices.items():
+        old_device = old_devices.get(udid)
+
+        if old_device is not None and not old_device.same_content(new_device):
+            changed.append((old_device, new_device))
+
+    return InventoryDiff(added, removed, changed)
@@ -0,0 +1,487 @@
+"""A pool of warm, booted devices which can be leased out and returned.
+
+    from isim.pool import DevicePool
+
+    with DevicePool(warm_count=2, max_booted=6) as pool:
+        pool.prepare(device_type, runtime)
+
+        with pool.lease(device_type, runtime) as device:
+            device.install(app_path)
+            ...
+
+Devices are created and booted in the background so that a lease is
+normally served straight away. When a lease ends, the device is erased and
+rebooted (or deleted and replaced) in the background too. Everything the pool
+created is deleted when it is closed.
+
+`max_booted` limits how many devices are booted on the whole host, so booted
+devices the pool doesn't manage count towards it too.
+"""
+
+import collections
+import contextlib
+import enum
+import logging
+import subprocess
+import threading
+import time
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from isim.device import Device
+from isim.device_type import DeviceType
+from isim.runtime import Runtime
+
+# The pool keeps devices separately for each (device type, runtime) identifier pair
+_PoolKey = Tuple[str, str]
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no device could be leased in time."""
+
+
+class RecyclePolicy(enum.Enum):
+    """What happens to a device when its lease ends."""
+
+    # Shutdown, erase and reboot the device, then put it back in the pool
+    ERASE = "erase"
+
+    # Delete the device and create a new one in its place
+    REPLACE = "replace"
+
+
+# pylint: disable=too-many-instance-attributes
+class DevicePool:
+    """Keeps warm, booted devices for each (device type, runtime) pair."""
+
+    warm_count: int
+    max_booted: Optional[int]
+    poll_interval: float
+    recycle: RecyclePolicy
+    max_uses: Optional[int]
+    boot_timeout: Optional[float]
+    name_prefix: str
+    retry_delay: float
+
+    _condition: threading.Condition
+    _closed: bool
+    _workers: List[threading.Thread]
+    _configurations: Dict[_PoolKey, Tuple[DeviceType, Runtime]]
+    _warm: Dict[_PoolKey, Deque[Device]]
+    _provisioning: Dict[_PoolKey, int]
+    _waiting: Dict[_PoolKey, int]
+    _returned: Deque[Tuple[_PoolKey, Device, bool]]
+    _leased: Set[str]
+    _recycling: int
+    _uses: Dict[str, int]
+    _created: int
+    _managed: Set[str]
+    _other_booted: int
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        *,
+        warm_count: int = 1,
+        max_booted: Optional[int] = None,
+        poll_interval: float = 5.0,
+        workers: int = 2,
+        recycle: RecyclePolicy = RecyclePolicy.ERASE,
+        max_uses: Optional[int] = None,
+        boot_timeout: Optional[float] = None,
+        name_prefix: str = "isim pool",
+        retry_delay: float = 5.0,
+    ) -> None:
+        """Construct a DevicePool and start its background workers.
+
+        warm_count: How many idle, booted devices to keep for each (device
+                    type, runtime) pair.
+        max_booted: The most devices which may be booted on the host at
+                    once, including leased ones and those the pool doesn't
+                    manage. None for no limit.
+        poll_interval: How often idle workers check how many devices are
+                       booted on the host, when `max_booted` is set.
+        workers: How many devices can be created, booted or recycled at once.
+        recycle: What to do with a device when its lease ends.
+        max_uses: Replace devices after they have been leased this many times.
+        boot_timeout: The number of seconds a device may take to boot.
+        name_prefix: The start of the name of every device the pool creates.
+        retry_delay: How long a worker waits after failing to prepare a device.
+        """
+        if warm_count < 0:
+            raise ValueError("The warm count cannot be negative")
+
+        if max_booted is not None and max_booted < 1:
+            raise ValueError("The maximum number of booted devices must be at least 1")
+
+        if workers < 1:
+            raise ValueError("There must be at least 1 worker")
+
+        self.warm_count = warm_count
+        self.max_booted = max_booted
+        self.poll_interval = poll_interval
+        self.recycle = recycle
+        self.max_uses = max_uses
+        self.boot_timeout = boot_timeout
+        self.name_prefix = name_prefix
+        self.retry_delay = retry_delay
+
+        self._condition = threading.Condition()
+        self._closed = False
+        self._configurations = {}
+        self._warm = {}
+        self._provisioning = {}
+        self._waiting = {}
+        self._returned = collections.deque()
+        self._leased = set()
+        self._recycling = 0
+        self._uses = {}
+        self._created = 0
+        self._managed = set()
+        self._other_booted = 0
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"isim-pool-{index}", daemon=True)
+            for index in range(workers)
+        ]
+
+        for worker in self._workers:
+            worker.start()
+
+    # pylint: enable=too-many-arguments
+
+    @property
+    def booted_count(self) -> int:
+        """Return how many devices the pool has booted (or is booting) right now."""
+        with self._condition:
+            return self._pool_booted_count()
+
+    def _booted_count(self) -> int:
+        """Return how many devices count towards `max_booted` (the lock must be held)."""
+        return self._pool_booted_count() + self._other_booted
+
+    def _pool_booted_count(self) -> int:
+        return (
+            sum(len(devices) for devices in self._warm.values())
+            + sum(self._provisioning.values())
+            + len(self._leased)
+            + self._recycling
+            + len(self._returned)
+        )
+
+    def _register(self, device_type: DeviceType, runtime: Runtime) -> _PoolKey:
+        """Start keeping devices for the pair (the lock must be held)."""
+        if self._closed:
+            raise ValueError("The pool has been closed")
+
+        key = (device_type.identifier, runtime.identifier)
+
+        if key not in self._configurations:
+            self._configurations[key] = (device_type, runtime)
+            self._warm[key] = collections.deque()
+            self._provisioning[key] = 0
+            self._waiting[key] = 0
+            self._condition.notify_all()
+
+        return key
+
+    def prepare(self, device_type: DeviceType, runtime: Runtime) -> None:
+        """Start keeping warm devices for the pair before anything leases one."""
+        with self._condition:
+            self._register(device_type, runtime)
+
+    def wait_until_warm(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every pair has its warm devices (or `max_booted` is hit).
+
+        Returned devices are waited on too, so the pool is idle afterwards.
+
+        Returns False if the timeout expired first.
+        """
+
+        def warm() -> bool:
+            if self._returned or self._recycling or any(self._provisioning.values()):
+                return False
+
+            if self.max_booted is not None and self._booted_count() >= self.max_booted:
+                return True
+
+            return all(len(devices) >= self.warm_count for devices in self._warm.values())
+
+        with self._condition:
+            return self._condition.wait_for(warm, timeout)
+
+    @contextlib.contextmanager
+    def lease(
+        self, device_type: DeviceType, runtime: Runtime, timeout: Optional[float] = None
+    ) -> Iterator[Device]:
+        """Lease a booted device for the duration of the context.
+
+        If the body raises, the device is replaced rather than recycled, as it
+        may have been left in a bad state.
+
+        timeout: How long to wait for a device, or None to wait as long as it takes.
+
+        Raises `PoolExhaustedError` if no device became available in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            key = self._register(device_type, runtime)
+            self._waiting[key] += 1
+            self._condition.notify_all()
+
+            try:
+                while not self._warm[key]:
+                    if self._closed:
+                        raise ValueError("The pool has been closed")
+
+                    remaining = None if deadline is None else deadline - time.monotonic()
+
+                    if remaining is not None and remaining <= 0:
+                        raise PoolExhaustedError(
+                            f"No {device_type.name} ({runtime.name}) device became available"
+                        )
+
+                    self._condition.wait(remaining)
+
+                device = self._warm[key].popleft()
+                self._leased.add(device.udid)
+                self._uses[device.udid] = self._uses.get(device.udid, 0) + 1
+            finally:
+                self._waiting[key] -= 1
+
+            # Taking a device may have left the pair short, so wake the workers
+            self._condition.notify_all()
+
+        failed = False
+
+        try:
+            yield device
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._release(key, device, failed)
+
+    def _release(self, key: _PoolKey, device: Device, failed: bool) -> None:
+        """Hand a leased device back to be recycled."""
+        with self._condition:
+            self._leased.discard(device.udid)
+
+            if not self._closed:
+                self._returned.append((key, device, failed))
+                self._condition.notify_all()
+                return
+
+        # The workers have gone, so clean up here
+        self._destroy(device)
+
+    def _needs_device(self, key: _PoolKey) -> bool:
+        """Return True if the pair needs another device (the lock must be held)."""
+        wanted = self.warm_count + self._waiting[key]
+        return len(self._warm[key]) + self._provisioning[key] < wanted
+
+    def _next_task(self) -> Optional[Callable[[], None]]:
+        """Pick the next thing for a worker to do (the lock must be held)."""
+        if self._closed:
+            return None
+
+        if self._returned:
+            key, device, failed = self._returned.popleft()
+            self._recycling += 1
+            return lambda: self._recycle(key, device, failed)
+
+        if self.max_booted is not None and self._booted_count() >= self.max_booted:
+            return self._evict_idle()
+
+        # Serve pairs which have callers waiting first
+        for key in sorted(self._configurations, key=lambda key: -self._waiting[key]):
+            if self._needs_device(key):
+                self._provisioning[key] += 1
+                return lambda: self._provision(key)
+
+        return None
+
+    def _evict_idle(self) -> Optional[Callable[[], None]]:
+        """Make room for a waiting caller by deleting an idle device (the lock must be held)."""
+        if not any(waiting and self._needs_device(key) for key, waiting in self._waiting.items()):
+            return None
+
+        for key, devices in self._warm.items():
+            if devices and not self._waiting[key]:
+                device = devices.popleft()
+                self._recycling += 1
+                return lambda: self._recycle(key, device, True)
+
+        return None
+
+    def _count_other_booted(self) -> None:
+        """Count the devices booted on the host which the pool doesn't manage."""
+        devices = [device for devices in Device.list_all().values() for device in devices]
+
+        with self._condition:
+            other_booted = len(
+                [
+                    device
+                    for device in devices
+                    if device.state in ("Booted", "Booting") and device.udid not in self._managed
+                ]
+            )
+
+            if other_booted != self._other_booted:
+                self._other_booted = other_booted
+                self._condition.notify_all()
+
+    def _work(self) -> None:
+        """Run tasks until the pool is closed (on a worker thread)."""
+        while True:
+            try:
+                if self.max_booted is not None and not self._closed:
+                    self._count_other_booted()
+
+                with self._condition:
+                    task = self._next_task()
+
+                    if task is None:
+                        if self._closed:
+                            return
+
+                        # Devices booted outside the pool don't wake the workers
+                        self._condition.wait(
+                            self.poll_interval if self.max_booted is not None else None
+                        )
+                        continue
+
+                task()
+            except Exception:
+                logging.getLogger("isim").exception("Device pool task failed")
+                time.sleep(self.retry_delay)
+
+    def _provision(self, key: _PoolKey) -> None:
+        """Create and boot a new device for the pair."""
+        device_type, runtime = self._configurations[key]
+        device = None
+
+        try:
+            with self._condition:
+                self._created += 1
+                name = f"{self.name_prefix} {device_type.name} {runtime.name} {self._created}"
+
+            device = Device.create(name, device_type, runtime)
+
+            with self._condition:
+                self._managed.add(device.udid)
+
+            device.boot(wait=True, timeout=self.boot_timeout)
+            device.refresh_state()
+        except BaseException:
+            if device is not None:
+                self._destroy(device)
+
+            with self._condition:
+                self._provisioning[key] -= 1
+                self._condition.notify_all()
+
+            raise
+
+        self._add_warm(key, device, provisioned=True)
+
+    def _recycle(self, key: _PoolKey, device: Device, failed: bool) -> None:
+        """Get a returned device ready for its next lease, or replace it."""
+        worn_out = self.max_uses is not None and self._uses.get(device.udid, 0) >= self.max_uses
+        replace = failed or worn_out or self.recycle == RecyclePolicy.REPLACE
+
+        try:
+            if not replace:
+                try:
+                    DevicePool._shutdown(device)
+                    device.erase()
+                    device.boot(wait=True, timeout=self.boot_timeout)
+                    device.refresh_state()
+                except BaseException:
+                    replace = True
+                    raise
+        finally:
+            if replace:
+                try:
+                    self._destroy(device)
+                finally:
+                    with self._condition:
+                        self._recycling -= 1
+                        self._condition.notify_all()
+
+        if not replace:
+            self._add_warm(key, device, recycled=True)
+
+    @staticmethod
+    def _shutdown(device: Device) -> None:
+        """Shutdown a device if it is booted."""
+        try:
+            device.shutdown()
+        except subprocess.CalledProcessError:
+            # It may not have been booted
+            pass
+
+    def _destroy(self, device: Device) -> None:
+        """Shutdown and delete a device."""
+        with self._condition:
+            self._uses.pop(device.udid, None)
+
+        DevicePool._shutdown(device)
+        device.delete()
+
+        with self._condition:
+            self._managed.discard(device.udid)
+
+    def _add_warm(
+        self, key: _PoolKey, device: Device, provisioned: bool = False, recycled: bool = False
+    ) -> None:
+        """Put a ready device in the pool."""
+        with self._condition:
+            if provisioned:
+                self._provisioning[key] -= 1
+
+            if recycled:
+                self._recycling -= 1
+
+            closed = self._closed
+
+            if not closed:
+                self._warm[key].append(device)
+
+            self._condition.notify_all()
+
+        if closed:
+            self._destroy(device)
+
+    def close(self) -> None:
+        """Stop the workers and delete every device the pool holds.
+
+        Devices which are still leased are deleted when their lease ends.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        for worker in self._workers:
+            worker.join()
+
+        with self._condition:
+            devices = [device for devices in self._warm.values() for device in devices]
+            devices.extend(device for _, device, _ in self._returned)
+
+            for warm in self._warm.values():
+                warm.clear()
+
+            self._returned.clear()
+
+        for device in devices:
+            try:
+                self._destroy(device)
+            except subprocess.CalledProcessError:
+                logging.getLogger("isim").exception("Unable to delete pool device %s", device)
+
+    def __enter__(self) -> "DevicePool":
+        return self
+
+    def __exit__(self, exc_type: object, exc_value: object, traceback: object) -> None:
+        self.close()
@@ -0,0 +1,322 @@
+"""Provisioning devices by cloning a prepared "golden" device.
+
+Building a device from scratch (create, boot, install apps, add media...)
+is slow. Instead, a golden device is built once from a `ProvisioningSpec`
+and then cloned, which only copies its data:
+
+    spec = ProvisioningSpec("UI Tests", "iPhone 15", "iOS 17.0", apps=["/path/to/App.app"])
+    golden = GoldenImage(spec)
+    devices = golden.clone(8, boot=True)
+
+The golden device is named after a fingerprint of the spec, so it is only
+rebuilt when the spec (or the files it refers to) changes. Changing only the
+environment doesn't rebuild it.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from isim.base_types import command_timeout
+from isim.device import Device
+from isim.device_type import DeviceType
+from isim.runtime import Runtime
+from isim.snapshot import SimctlSnapshot
+
+
+def _path_fingerprint(path: str) -> List[Any]:
+    """Describe the files at a path cheaply (by size and modification time)."""
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    files = []
+
+    for directory, directory_names, file_names in os.walk(path):
+        directory_names.sort()
+
+        for file_name in sorted(file_names):
+            file_path = os.path.join(directory, file_name)
+            stat = os.stat(file_path)
+            files.append([os.path.relpath(file_path, path), stat.st_size, stat.st_mtime_ns])
+
+    return files
+
+
+# pylint: disable=too-many-instance-attributes
+class ProvisioningSpec:
+    """Describes how a golden device should be set up."""
+
+    name: str
+    device_type: str
+    runtime: str
+    apps: List[str]
+    media: List[str]
+    urls: List[str]
+    env: Dict[str, str]
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        name: str,
+        device_type: str,
+        runtime: str,
+        *,
+        apps: Optional[List[str]] = None,
+        media: Optional[List[str]] = None,
+        urls: Optional[List[str]] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Construct a ProvisioningSpec.
+
+        name: The name of the spec, used to name the golden device.
+        device_type: The name or identifier of the device type.
+        runtime: The name or identifier of the runtime.
+        apps: Paths of apps to install.
+        media: Paths of photos and videos to add.
+        urls: URLs to open, in order.
+        env: Environment variables to set with `launchctl setenv`. These don't
+             survive a reboot, so they are set on each clone as it boots.
+        """
+        self.name = name
+        self.device_type = device_type
+        self.runtime = runtime
+        self.apps = list(apps or [])
+        self.media = list(media or [])
+        self.urls = list(urls or [])
+        self.env = dict(env or {})
+
+    # pylint: enable=too-many-arguments
+
+    @staticmethod
+    def from_dict(info: Dict[str, Any]) -> "ProvisioningSpec":
+        """Create a spec from a dictionary, e.g. loaded from JSON."""
+        return ProvisioningSpec(
+            info["name"],
+            info["device_type"],
+            info["runtime"],
+            apps=info.get("apps"),
+            media=info.get("media"),
+            urls=info.get("urls"),
+            env=info.get("env"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the spec as a dictionary."""
+        return {
+            "name": self.name,
+            "device_type": self.device_type,
+            "runtime": self.runtime,
+            "apps": self.apps,
+            "media": self.media,
+            "urls": self.urls,
+            "env": self.env,
+        }
+
+    def fingerprint(self) -> str:
+        """Return a hash of the spec and the files it refers to.
+
+        Files are described by their sizes and modification times rather than
+        their contents, so this is cheap even for large apps. The environment
+        is left out, since it is only set on the clones rather than the golden
+        device.
+        """
+        description = self.to_dict()
+        del description["env"]
+        description["files"] = {path: _path_fingerprint(path) for path in self.apps + self.media}
+        encoded = json.dumps(description, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def resolve_device_type(self, snapshot: Optional[SimctlSnapshot] = None) -> DeviceType:
+        """Return the device type the spec refers to."""
+        return DeviceType.from_name_or_id(self.device_type, snapshot)
+
+    def resolve_runtime(self, snapshot: Optional[SimctlSnapshot] = None) -> Runtime:
+        """Return the runtime the spec refers to."""
+        return Runtime.from_name_or_id(self.runtime, snapshot)
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        return f"{self.name}: {self.device_type} ({self.runtime})"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str(self.to_dict())
+
+
+class GoldenImage:
+    """A golden device built from a spec, which is cloned to provision new devices."""
+
+    spec: ProvisioningSpec
+
+    _lock: threading.Lock
+
+    def __init__(self, spec: ProvisioningSpec) -> None:
+        """Construct a GoldenImage.
+
+        spec: How the golden device should be set up.
+        """
+        self.spec = spec
+        self._lock = threading.Lock()
+
+    @property
+    def name_prefix(self) -> str:
+        """Return the start of the name of every golden device for the spec."""
+        return f"{self.spec.name} (golden "
+
+    def device_name(self, fingerprint: Optional[str] = None) -> str:
+        """Return the name of the golden device for the current spec."""
+        if fingerprint is None:
+            fingerprint = self.spec.fingerprint()
+        return f"{self.name_prefix}{fingerprint[:16]})"
+
+    def device(self, snapshot: Optional[SimctlSnapshot] = None) -> Optional[Device]:
+        """Return the golden device for the current spec, if it has been built."""
+        if snapshot is None:
+            snapshot = SimctlSnapshot()
+
+        name = self.device_name()
+
+        for devices in snapshot.devices().values():
+            for device in devices:
+                if device.name == name:
+                    return device
+
+        return None
+
+    def ensure(self) -> Device:
+        """Return the golden device, building it if the spec has changed."""
+        with self._lock:
+            snapshot = SimctlSnapshot()
+            name = self.device_name()
+            stale = []
+            current = None
+
+            for devices in snapshot.devices().values():
+                for device in devices:
+                    if device.name == name and current is None:
+                        current = device
+                    elif device.name.startswith(self.name_prefix):
+                        stale.append(device)
+
+            # Only remove the old ones once we know the new one can be built
+            if current is None:
+                current = self._build(name, snapshot)
+
+            for device in stale:
+                device.delete()
+
+            return current
+
+    def _build(self, name: str, snapshot: SimctlSnapshot) -> Device:
+        """Create and set up a new golden device."""
+        device_type = self.spec.resolve_device_type(snapshot)
+        runtime = self.spec.resolve_runtime(snapshot)
+        device = Device.create(name + " (building)", device_type, runtime)
+
+        try:
+            device.boot(wait=True)
+
+            for app in self.spec.apps:
+                device.install(app)
+
+            if self.spec.media:
+                device.addmedia(self.spec.media)
+
+            for url in self.spec.urls:
+                device.openurl(url)
+
+            device.shutdown()
+
+            # Only give it its real name once it is complete, so that a failed
+            # build is never mistaken for a golden device
+            device.rename(name)
+            device.name = name
+        except BaseException:
+            device.delete()
+            raise
+
+        return device
+
+    def apply_environment(self, device: Device) -> None:
+        """Set the spec's environment variables on a booted device."""
+        for variable, value in self.spec.env.items():
+            device.spawn(["launchctl", "setenv", variable, value])
+
+    def _clone_one(self, golden: Device, name: str, boot: bool) -> str:
+        """Clone the golden device, booting the clone if requested."""
+        udid = golden.clone(name)
+
+        if not boot:
+            return udid
+
+        clone = Device.from_identifier(udid)
+
+        try:
+            clone.boot(wait=True)
+            self.apply_environment(clone)
+        except BaseException:
+            clone.delete()
+            raise
+
+        return udid
+
+    # pylint: disable=too-many-locals
+    def clone(
+        self,
+        count: int,
+        name: Optional[str] = None,
+        *,
+        boot: bool = False,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> List[Device]:
+        """Stamp out new devices from the golden device, in parallel.
+
+        The golden device is built first if needed.
+
+        count: How many devices to create.
+        name: The start of each device's name. Defaults to the spec name.
+        boot: If True, boot each device, wait until it is usable and set the
+              spec's environment variables on it.
+        max_workers: The most devices to clone at once.
+        timeout: The number of seconds each device may take in total.
+
+        If any clone fails, the ones which succeeded are deleted and the first
+        error is raised.
+        """
+        golden = self.ensure()
+        prefix = self.spec.name if name is None else name
+
+        def clone_one(index: int) -> str:
+            with command_timeout(timeout):
+                return self._clone_one(golden, f"{prefix} {index + 1}", boot)
+
+        udids: List[str] = []
+        errors: List[BaseException] = []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(clone_one, index) for index in range(count)]
+
+            for future in futures:
+                error = future.exception()
+
+                if error is None:
+                    udids.append(future.result())
+                else:
+                    errors.append(error)
+
+        snapshot = SimctlSnapshot()
+        devices = [Device.from_identifier(udid, snapshot) for udid in udids]
+
+        if errors:
+            for device in devices:
+                device.delete()
+            raise errors[0]
+
+        return devices
+
+    # pylint: enable=too-many-locals
@@ -0,0 +1,707 @@
+"""Reconcile the simulators on a machine with a desired inventory.
+
+A `FleetSpec` lists the devices (and watch pairs) which should exist. It is
+compared with a single `SimctlSnapshot` to build a `ReconcilePlan` of the
+fewest changes needed, which can be printed (a dry run) or executed. Actions
+which don't depend on each other run in parallel, and each one waits for
+those it needs (e.g. a pair waits until both devices exist):
+
+    spec = FleetSpec.load("simulators.json")
+    plan = plan_reconcile(spec)
+    print(plan)
+    plan.execute(max_workers=4)
+
+A spec looks like this (as JSON, YAML or a dictionary):
+
+    {
+        "devices": [
+            {"name": "CI iPhone", "device_type": "iPhone 15", "runtime": "iOS 17.0"},
+            {"name": "CI Watch", "device_type": "Apple Watch Series 9 (45mm)", "runtime": "watchOS 10.0"}
+        ],
+        "pairs": [{"watch": "CI Watch", "phone": "CI iPhone"}],
+        "prune": true
+    }
+
+Devices are matched to existing ones by UDID (if given) and then by name.
+Only the devices and pairs in the spec are touched unless `prune` is set,
+in which case every other device and pair is removed. The one exception is
+that a watch in the spec which is paired with some other phone is unpaired
+first, since a watch can only be in one pair.
+"""
+
+import concurrent.futures
+import enum
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from isim.base_types import SimulatorControlBase, command_timeout, submit_in_context
+from isim.device import Device
+from isim.device_pair import DevicePair
+from isim.device_type import DeviceType
+from isim.runtime import Runtime
+from isim.snapshot import SimctlSnapshot
+
+
+class FleetSpecError(Exception):
+    """Raised when a fleet spec is invalid."""
+
+
+class DeviceSpec:
+    """Describes a device which should exist."""
+
+    name: str
+    device_type: str
+    runtime: str
+    udid: Optional[str]
+
+    def __init__(
+        self, name: str, device_type: str, runtime: str, *, udid: Optional[str] = None
+    ) -> None:
+        """Construct a DeviceSpec.
+
+        name: The name of the device. This must be unique within the spec.
+        device_type: The name or identifier of the device type.
+        runtime: The name or identifier of the runtime.
+        udid: If set, the existing device this refers to. It is renamed (or
+              upgraded) rather than replaced if it doesn't match. Planning
+              fails with `FleetSpecError` if it would need replacing (i.e.
+              it has a different device type, or a runtime it can't be
+              upgraded to).
+        """
+        self.name = name
+        self.device_type = device_type
+        self.runtime = runtime
+        self.udid = udid
+
+    @staticmethod
+    def from_dict(info: Dict[str, Any]) -> "DeviceSpec":
+        """Create a spec from a dictionary, e.g. loaded from JSON."""
+        return DeviceSpec(info["name"], info["device_type"], info["runtime"], udid=info.get("udid"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the spec as a dictionary."""
+        info = {"name": self.name, "device_type": self.device_type, "runtime": self.runtime}
+
+        if self.udid is not None:
+            info["udid"] = self.udid
+
+        return info
+
+    def resolve_device_type(self, snapshot: Optional[SimctlSnapshot] = None) -> DeviceType:
+        """Return the device type the spec refers to."""
+        return DeviceType.from_name_or_id(self.device_type, snapshot)
+
+    def resolve_runtime(self, snapshot: Optional[SimctlSnapshot] = None) -> Runtime:
+        """Return the runtime the spec refers to."""
+        return Runtime.from_name_or_id(self.runtime, snapshot)
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        return f"{self.name}: {self.device_type} ({self.runtime})"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str(self.to_dict())
+
+
+class FleetSpec:
+    """The devices and watch pairs which should exist on a machine."""
+
+    devices: List[DeviceSpec]
+    pairs: List[Tuple[str, str]]
+    prune: bool
+
+    def __init__(
+        self,
+        devices: List[DeviceSpec],
+        pairs: Optional[List[Tuple[str, str]]] = None,
+        *,
+        prune: bool = False,
+    ) -> None:
+        """Construct a FleetSpec.
+
+        devices: The devices which should exist.
+        pairs: (watch name, phone name) for each pair which should exist.
+        prune: If True, every device and pair not in the spec is removed.
+        """
+        self.devices = list(devices)
+        self.pairs = list(pairs or [])
+        self.prune = prune
+
+        names = [device.name for device in self.devices]
+
+        for name in names:
+            if names.count(name) > 1:
+                raise FleetSpecError("Device names must be unique: " + name)
+
+        for watch, phone in self.pairs:
+            for name in [watch, phone]:
+                if name not in names:
+                    raise FleetSpecError("Pair refers to a device not in the spec: " + name)
+
+    @staticmethod
+    def from_dict(info: Dict[str, Any]) -> "FleetSpec":
+        """Create a spec from a dictionary, e.g. loaded from JSON."""
+        return FleetSpec(
+            [DeviceSpec.from_dict(device) for device in info.get("devices", [])],
+            [(pair["watch"], pair["phone"]) for pair in info.get("pairs", [])],
+            prune=info.get("prune", False),
+        )
+
+    @staticmethod
+    def load(path: str) -> "FleetSpec":
+        """Load a spec from a JSON or YAML file.
+
+        YAML (a path ending in .yaml or .yml) needs PyYAML to be installed.
+        """
+        with open(path, "r", encoding="utf-8") as spec_file:
+            if os.path.splitext(path)[1].lower() not in (".yaml", ".yml"):
+                return FleetSpec.from_dict(json.load(spec_file))
+
+            try:
+                import yaml  # pylint: disable=import-outside-toplevel
+            except ImportError as ex:
+                raise FleetSpecError("PyYAML is needed to load YAML specs") from ex
+
+            return FleetSpec.from_dict(yaml.safe_load(spec_file))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the spec as a dictionary."""
+        return {
+            "devices": [device.to_dict() for device in self.devices],
+            "pairs": [{"watch": watch, "phone": phone} for watch, phone in self.pairs],
+            "prune": self.prune,
+        }
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str(self.to_dict())
+
+
+class ActionKind(enum.Enum):
+    """What a reconcile action does."""
+
+    CREATE = "create"
+    DELETE = "delete"
+    RENAME = "rename"
+    UPGRADE = "upgrade"
+    PAIR = "pair"
+    UNPAIR = "unpair"
+
+
+class ActionStatus(enum.Enum):
+    """Where an action is in the execution of a plan."""
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+    # An action it depends on failed, so it wasn't run
+    SKIPPED = "skipped"
+
+
+class ReconcileAction:
+    """A single change in a reconcile plan."""
+
+    kind: ActionKind
+    description: str
+    dependencies: List["ReconcileAction"]
+    status: ActionStatus
+    error: Optional[BaseException]
+
+    _operation: Callable[[], None]
+
+    def __init__(
+        self,
+        kind: ActionKind,
+        description: str,
+        operation: Callable[[], None],
+        dependencies: Optional[List["ReconcileAction"]] = None,
+    ) -> None:
+        """Construct a ReconcileAction.
+
+        kind: What the action does.
+        description: A readable description of the action.
+        operation: Called to carry out the action.
+        dependencies: Actions which must have succeeded before this one runs.
+        """
+        self.kind = kind
+        self.description = description
+        self.dependencies = list(dependencies or [])
+        self.status = ActionStatus.PENDING
+        self.error = None
+        self._operation = operation
+
+    def run(self) -> None:
+        """Carry out the action."""
+        self._operation()
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        return f"{self.kind.value} {self.description}"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str({"kind": self.kind, "description": self.description, "status": self.status})
+
+
+ActionProgressCallback = Callable[[ReconcileAction], None]
+
+
+class ReconcilePlan:
+    """The actions needed to bring the devices on a machine in line with a spec.
+
+    Actions are listed so that each comes after everything it depends on.
+    """
+
+    actions: List[ReconcileAction]
+
+    # The UDID of each device in the spec, keyed by name. Devices which are
+    # created are added as the plan is executed.
+    udids: Dict[str, str]
+
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """Construct an empty ReconcilePlan."""
+        self.actions = []
+        self.udids = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        kind: ActionKind,
+        description: str,
+        operation: Callable[[], None],
+        dependencies: Optional[List[Optional[ReconcileAction]]] = None,
+    ) -> ReconcileAction:
+        """Add an action to the end of the plan and return it.
+
+        Any None dependencies are ignored, which makes optional ones easier to pass.
+        """
+        action = ReconcileAction(
+            kind,
+            description,
+            operation,
+            [dependency for dependency in dependencies or [] if dependency is not None],
+        )
+        self.actions.append(action)
+        return action
+
+    def udid(self, name: str) -> str:
+        """Return the UDID of a device in the spec."""
+        with self._lock:
+            return self.udids[name]
+
+    def set_udid(self, name: str, udid: str) -> None:
+        """Record the UDID of a device in the spec."""
+        with self._lock:
+            self.udids[name] = udid
+
+    @property
+    def failed(self) -> List[ReconcileAction]:
+        """Return the actions which failed or were skipped."""
+        return [
+            action
+            for action in self.actions
+            if action.status in (ActionStatus.FAILED, ActionStatus.SKIPPED)
+        ]
+
+    def describe(self) -> List[str]:
+        """Return a line describing each action, with the ones it waits for."""
+        lines = []
+
+        for index, action in enumerate(self.actions):
+            line = f"{index + 1}. {action}"
+
+            if action.dependencies:
+                after = sorted(
+                    self.actions.index(dependency) + 1 for dependency in action.dependencies
+                )
+                line += " (after " + ", ".join(str(number) for number in after) + ")"
+
+            lines.append(line)
+
+        return lines
+
+    def execute(
+        self,
+        *,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        progress: Optional[ActionProgressCallback] = None,
+    ) -> bool:
+        """Carry out the plan, running independent actions in parallel.
+
+        max_workers: The most actions to run at once.
+        timeout: The number of seconds the simctl commands for a single action
+                 may take in total.
+        progress: Called with each action once it has finished (or been skipped).
+
+        Returns True if every action succeeded. Failures are recorded on the
+        actions rather than raised, and anything depending on a failed action
+        is skipped.
+        """
+
+        def run_one(action: ReconcileAction) -> None:
+            with command_timeout(timeout):
+                action.run()
+
+        def finish(action: ReconcileAction, status: ActionStatus) -> None:
+            action.status = status
+
+            if progress is not None:
+                progress(action)
+
+        pending = [action for action in self.actions if action.status == ActionStatus.PENDING]
+        running: Dict["concurrent.futures.Future[None]", ReconcileAction] = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                # Dependencies come first in the plan, so one pass is enough
+                # for a skip to reach everything after it
+                for action in list(pending):
+                    statuses = [dependency.status for dependency in action.dependencies]
+
+                    if ActionStatus.FAILED in statuses or ActionStatus.SKIPPED in statuses:
+                        pending.remove(action)
+                        finish(action, ActionStatus.SKIPPED)
+                    elif all(status == ActionStatus.DONE for status in statuses):
+                        pending.remove(action)
+                        future = submit_in_context(executor, run_one, action)
+                        running[future] = action
+
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+
+                for future in done:
+                    action = running.pop(future)
+                    action.error = future.exception()
+                    finish(
+                        action, ActionStatus.DONE if action.error is None else ActionStatus.FAILED
+                    )
+
+        return not self.failed
+
+    def __bool__(self) -> bool:
+        """Return True if there is anything to do."""
+        return bool(self.actions)
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        if not self.actions:
+            return "Nothing to do"
+        return "\n".join(self.describe())
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str(self.actions)
+
+
+def _runtime_version(runtime_id: str) -> Tuple[str, Tuple[int, ...]]:
+    """Split a runtime identifier into its platform and version.
+
+    e.g. com.apple.CoreSimulator.SimRuntime.iOS-17-0 -> ("iOS", (17, 0))
+    """
+    platform, _, version = runtime_id.rsplit(".", 1)[-1].partition("-")
+
+    try:
+        return platform, tuple(int(part) for part in version.split("-"))
+    except ValueError:
+        return platform, ()
+
+
+def can_upgrade(runtime_id: str, new_runtime_id: str) -> bool:
+    """Return True if a device can be upgraded from one runtime to another.
+
+    `xcrun simctl upgrade` only moves a device to a newer version of the same
+    platform. Anything else needs a new device.
+    """
+    platform, version = _runtime_version(runtime_id)
+    new_platform, new_version = _runtime_version(new_runtime_id)
+    return platform == new_platform and bool(version) and new_version > version
+
+
+class _Planner:
+    """Builds a `ReconcilePlan` for a spec against a snapshot."""
+
+    spec: FleetSpec
+    snapshot: SimctlSnapshot
+    plan: ReconcilePlan
+
+    existing: List[Device]
+
+    # The existing device matched with each device in the spec, keyed by name
+    matches: Dict[str, Device]
+
+    # The action which makes each device in the spec exist with the right
+    # runtime (a create, upgrade or rename), keyed by name
+    ready: Dict[str, ReconcileAction]
+
+    # The UDIDs of devices which are being deleted
+    deleted: Set[str]
+
+    def __init__(self, spec: FleetSpec, snapshot: SimctlSnapshot) -> None:
+        self.spec = spec
+        self.snapshot = snapshot
+        self.plan = ReconcilePlan()
+        self.existing = [device for devices in snapshot.devices().values() for device in devices]
+        self.matches = {}
+        self.ready = {}
+        self.deleted = set()
+
+    def match_devices(self) -> None:
+        """Match each device in the spec with an existing device, where there is one."""
+        by_udid = {device.udid: device for device in self.existing}
+        claimed: Set[str] = set()
+
+        for desired in self.spec.devices:
+            device = by_udid.get(desired.udid or "")
+
+            if device is not None:
+                self.matches[desired.name] = device
+                claimed.add(device.udid)
+
+        targets = {
+            desired.name: (
+                desired.resolve_device_type(self.snapshot).identifier,
+                desired.resolve_runtime(self.snapshot).identifier,
+            )
+            for desired in self.spec.devices
+        }
+
+        for desired in self.spec.devices:
+            if desired.name in self.matches:
+                continue
+
+            candidates = [
+                device
+                for device in self.existing
+                if device.name == desired.name and device.udid not in claimed
+            ]
+
+            if not candidates:
+                continue
+
+            # Prefer a device which needs the fewest changes
+            target = targets[desired.name]
+            scores = [
+                (device.device_type_id == target[0], device.runtime_id == target[1])
+                for device in candidates
+            ]
+            device = candidates[scores.index(max(scores))]
+            self.matches[desired.name] = device
+            claimed.add(device.udid)
+
+        if not self.spec.prune:
+            return
+
+        # Anything left over would be deleted, so rename a device which is
+        # already right rather than deleting one and creating another
+        for desired in self.spec.devices:
+            if desired.name in self.matches:
+                continue
+
+            for device in self.existing:
+                if device.udid not in claimed and (
+                    (device.device_type_id, device.runtime_id) == targets[desired.name]
+                ):
+                    self.matches[desired.name] = device
+                    claimed.add(device.udid)
+                    break
+
+    def delete(self, device: Device) -> ReconcileAction:
+        """Add an action to delete a device."""
+        self.deleted.add(device.udid)
+        return self.plan.add(ActionKind.DELETE, f"{device.name} ({device.udid})", device.delete)
+
+    def create(
+        self,
+        desired: DeviceSpec,
+        device_type: DeviceType,
+        runtime: Runtime,
+        replaces: Optional[ReconcileAction] = None,
+    ) -> ReconcileAction:
+        """Add an action to create a device."""
+
+        def create() -> None:
+            udid = Device.create_udid(desired.name, device_type, runtime)
+            self.plan.set_udid(desired.name, udid)
+
+        # Replacing a device waits for the old one to go, so that there is
+        # never more than one device with the name
+        return self.plan.add(
+            ActionKind.CREATE,
+            f"{desired.name} ({device_type.name}, {runtime.name})",
+            create,
+            [replaces],
+        )
+
+    def plan_device(self, desired: DeviceSpec) -> None:
+        """Add the actions to make a single device match the spec."""
+        device_type = desired.resolve_device_type(self.snapshot)
+        runtime = desired.resolve_runtime(self.snapshot)
+        device = self.matches.get(desired.name)
+
+        if device is None:
+            self.ready[desired.name] = self.create(desired, device_type, runtime)
+            return
+
+        if device.device_type_id != device_type.identifier or (
+            device.runtime_id != runtime.identifier
+            and not can_upgrade(device.runtime_id, runtime.identifier)
+        ):
+            # A device asked for by UDID is never replaced
+            if desired.udid == device.udid:
+                raise FleetSpecError(
+                    f"{desired.name} ({device.udid}) can't be changed to {device_type.name} "
+                    + f"({runtime.name}) without replacing it"
+                )
+
+            self.ready[desired.name] = self.create(
+                desired, device_type, runtime, self.delete(device)
+            )
+            return
+
+        self.plan.set_udid(desired.name, device.udid)
+
+        if device.name != desired.name:
+            self.ready[desired.name] = self.plan.add(
+                ActionKind.RENAME,
+                f"{device.name} ({device.udid}) to {desired.name}",
+                lambda: device.rename(desired.name),
+            )
+
+        if device.runtime_id != runtime.identifier:
+
+            def upgrade() -> None:
+                # Devices have to be shut down to be upgraded
+                if device.state != "Shutdown":
+                    device.shutdown()
+                device.upgrade(runtime)
+
+            # Renaming and upgrading the same device at once isn't safe
+            self.ready[desired.name] = self.plan.add(
+                ActionKind.UPGRADE,
+                f"{desired.name} ({device.udid}) to {runtime.name}",
+                upgrade,
+                [self.ready.get(desired.name)],
+            )
+
+    def plan_pairs(self) -> None:
+        """Add the actions to unpair and pair devices to match the spec."""
+        names = {
+            device.udid: name
+            for name, device in self.matches.items()
+            if device.udid not in self.deleted
+        }
+        wanted: Set[Tuple[Optional[str], Optional[str]]] = set(self.spec.pairs)
+        unwanted: List[Tuple[DevicePair, Optional[str]]] = []
+
+        for device_pair in self.snapshot.device_pairs():
+            # Pairs go with their devices, so there's nothing to do for deleted ones
+            if device_pair.watch_udid in self.deleted or device_pair.phone_udid in self.deleted:
+                continue
+
+            key = (names.get(device_pair.watch_udid), names.get(device_pair.phone_udid))
+
+            if key in wanted:
+                wanted.discard(key)
+            else:
+                unwanted.append((device_pair, key[0]))
+
+        # A watch can only be in one pair (although a phone can have several
+        # watches), so a watch which is paired elsewhere has to be unpaired
+        # first. Without prune, that is the only reason to unpair anything.
+        moving = {watch for watch, _ in wanted}
+        unpairs: Dict[str, ReconcileAction] = {}
+
+        for device_pair, watch_name in unwanted:
+            if not self.spec.prune and watch_name not in moving:
+                continue
+
+            unpairs[device_pair.watch_udid] = self.plan.add(
+                ActionKind.UNPAIR,
+                f"{device_pair.raw_info['watch']['name']} and "
+                + f"{device_pair.raw_info['phone']['name']} ({device_pair.identifier})",
+                device_pair.unpair,
+            )
+
+        for watch, phone in self.spec.pairs:
+            if (watch, phone) not in wanted:
+                continue
+
+            dependencies = [self.ready.get(watch), self.ready.get(phone)]
+            watch_udid = self.plan.udids.get(watch)
+
+            if watch_udid is not None and watch_udid in unpairs:
+                dependencies.append(unpairs[watch_udid])
+
+            def pair(watch: str = watch, phone: str = phone) -> None:
+                SimulatorControlBase.run_command(
+                    ["pair", self.plan.udid(watch), self.plan.udid(phone)]
+                )
+
+            self.plan.add(ActionKind.PAIR, f"{watch} and {phone}", pair, dependencies)
+
+    def build(self) -> ReconcilePlan:
+        """Build the plan."""
+        self.match_devices()
+
+        if self.spec.prune:
+            matched = {device.udid for device in self.matches.values()}
+
+            for device in self.existing:
+                if device.udid not in matched:
+                    self.delete(device)
+
+        for desired in self.spec.devices:
+            self.plan_device(desired)
+
+        self.plan_pairs()
+        return self.plan
+
+
+def plan_reconcile(spec: FleetSpec, snapshot: Optional[SimctlSnapshot] = None) -> ReconcilePlan:
+    """Work out the fewest changes needed to make the devices on the machine match a spec.
+
+    snapshot: If set, the current devices are taken from it rather than running simctl.
+    """
+    if snapshot is None:
+        snapshot = SimctlSnapshot()
+
+    return _Planner(spec, snapshot).build()
+
+
+def reconcile(
+    spec: FleetSpec,
+    *,
+    dry_run: bool = False,
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    progress: Optional[ActionProgressCallback] = None,
+) -> ReconcilePlan:
+    """Make the devices on the machine match a spec.
+
+    dry_run: If True, print the plan rather than executing it.
+    max_workers: The most actions to run at once.
+    timeout: The number of seconds the simctl commands for a single action may
+             take in total.
+    progress: Called with each action once it has finished (or been skipped).
+
+    Returns the plan, with the status of each action.
+    """
+    plan = plan_reconcile(spec)
+
+    if dry_run:
+        print(plan)
+        return plan
+
+    plan.execute(max_workers=max_workers, timeout=timeout, progress=progress)
+    return plan
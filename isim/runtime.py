@@ -1,8 +1,12 @@
 """Handles the runtimes for simctl."""
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 
-from isim.base_types import SimulatorControlBase, SimulatorControlType
+from isim.base_types import SimulatorControlBase, SimulatorControlType, get_index
+
+
+if TYPE_CHECKING:
+    from isim.snapshot import SimctlSnapshot
 
 
 class RuntimeNotFoundError(Exception):
@@ -13,6 +17,16 @@ class RuntimeNotFoundError(Exception):
 class Runtime(SimulatorControlBase):
     """Represents a runtime for the iOS simulator."""
 
+    __slots__ = (
+        "availability",
+        "build_version",
+        "bundle_path",
+        "identifier",
+        "is_available",
+        "name",
+        "version",
+    )
+
     raw_info: Dict[str, Any]
     availability: Optional[str]
     build_version: str
@@ -38,6 +52,11 @@ class Runtime(SimulatorControlBase):
         self.name = runtime_info["name"]
         self.version = runtime_info["version"]
 
+    @property
+    def identity(self) -> str:
+        """Return the identifier of the runtime."""
+        return self.identifier
+
     def __str__(self) -> str:
         """Return a string representation of the runtime."""
         return f"{self.name}: {self.identifier}"
@@ -55,26 +74,94 @@ class Runtime(SimulatorControlBase):
         return runtimes
 
     @staticmethod
-    def from_id(identifier: str) -> "Runtime":
-        """Create a runtime by looking up the existing ones matching the supplied identifier."""
-        # Get all runtimes
-        for runtime in Runtime.list_all():
-            if runtime.identifier == identifier:
-                return runtime
+    def index(snapshot: Optional["SimctlSnapshot"] = None) -> "RuntimeIndex":
+        """Return the lookup index over all runtimes.
+
+        snapshot: If set, the index is built from it rather than running simctl.
+        """
+        if snapshot is not None:
+            runtime_info = snapshot.list_type(SimulatorControlType.RUNTIME)
+        else:
+            runtime_info = SimulatorControlBase.list_type(SimulatorControlType.RUNTIME)
+
+        return get_index(SimulatorControlType.RUNTIME, runtime_info, RuntimeIndex, snapshot)
+
+    @staticmethod
+    def from_id(identifier: str, snapshot: Optional["SimctlSnapshot"] = None) -> "Runtime":
+        """Create a runtime by looking up the existing ones matching the supplied identifier.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
+        runtime = Runtime.index(snapshot).by_identifier.get(identifier)
+
+        if runtime is not None:
+            return runtime
 
         raise RuntimeNotFoundError(f"Runtime not found for identifier: {identifier}")
 
     @staticmethod
-    def from_name(name: str) -> "Runtime":
-        """Create a runtime by looking up the existing ones matching the supplied name."""
-        for runtime in Runtime.list_all():
-            if runtime.name == name:
-                return runtime
+    def from_name(name: str, snapshot: Optional["SimctlSnapshot"] = None) -> "Runtime":
+        """Create a runtime by looking up the existing ones matching the supplied name.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
+        runtime = Runtime.index(snapshot).by_name.get(name)
+
+        if runtime is not None:
+            return runtime
 
         raise RuntimeNotFoundError(f"Runtime not found for name: {name}")
 
     @staticmethod
-    def list_all() -> List["Runtime"]:
-        """Return all available runtimes."""
+    def from_name_or_id(
+        name_or_identifier: str, snapshot: Optional["SimctlSnapshot"] = None
+    ) -> "Runtime":
+        """Get a runtime from either its identifier or its name.
+
+        snapshot: If set, the lookup is done against it rather than running simctl.
+        """
+        index = Runtime.index(snapshot)
+        runtime = index.by_identifier.get(name_or_identifier) or index.by_name.get(
+            name_or_identifier
+        )
+
+        if runtime is not None:
+            return runtime
+
+        raise RuntimeNotFoundError(f"Runtime not found for: {name_or_identifier}")
+
+    @staticmethod
+    def list_all(snapshot: Optional["SimctlSnapshot"] = None) -> List["Runtime"]:
+        """Return all available runtimes.
+
+        snapshot: If set, the runtimes are taken from it rather than running simctl.
+        """
+        if snapshot is not None:
+            return snapshot.runtimes()
+
         runtime_info = SimulatorControlBase.list_type(SimulatorControlType.RUNTIME)
         return Runtime.from_simctl_info(runtime_info)
+
+
+class RuntimeIndex:
+    """Hash indexes over a list of runtimes.
+
+    Where several runtimes share a key, the first one listed by simctl wins.
+    """
+
+    runtimes: List[Runtime]
+    by_identifier: Dict[str, Runtime]
+    by_name: Dict[str, Runtime]
+
+    def __init__(self, runtime_info: List[Dict[str, Any]]) -> None:
+        """Construct the index from simctl output.
+
+        runtime_info: The simctl output for the runtimes.
+        """
+        self.runtimes = Runtime.from_simctl_info(runtime_info)
+        self.by_identifier = {}
+        self.by_name = {}
+
+        for runtime in self.runtimes:
+            self.by_identifier.setdefault(runtime.identifier, runtime)
+            self.by_name.setdefault(runtime.name, runtime)
@@ -0,0 +1,75 @@
+"""A single `xcrun simctl list --json` call shared between all simctl types."""
+
+from typing import Any, Callable, Dict, List, Optional
+
+from isim.base_types import IndexT, SimulatorControlBase, SimulatorControlType
+from isim.device import Device
+from isim.device_pair import DevicePair
+from isim.device_type import DeviceType
+from isim.runtime import Runtime
+
+
+class SimctlSnapshot:
+    """Represents the output of a single `xcrun simctl list --json` call.
+
+    Devices, runtimes, device types and device pairs are all built from the one
+    parse, so resolving a device along with its runtime and device type only
+    costs a single subprocess launch. The lookup indexes are built on first
+    access and then reused.
+    """
+
+    raw_info: Dict[str, Any]
+
+    _indexes: Dict[SimulatorControlType, Any]
+
+    def __init__(self, raw_info: Optional[Dict[str, Any]] = None) -> None:
+        """Construct a snapshot.
+
+        raw_info: The parsed output of `xcrun simctl list --json`. If not set,
+                  simctl is run to get it.
+        """
+        if raw_info is None:
+            raw_info = SimulatorControlBase.list_all_types()
+
+        self.raw_info = raw_info
+        self._indexes = {}
+
+    def list_type(self, item: SimulatorControlType) -> Any:
+        """Return the raw simctl info for the list type from the snapshot."""
+        return SimulatorControlBase.extract_list_type(self.raw_info, item)
+
+    def index(
+        self, item: SimulatorControlType, raw_info: Any, builder: Callable[[Any], IndexT]
+    ) -> IndexT:
+        """Return the lookup index for a list type, building it on first use.
+
+        raw_info: The output for the list type, from `list_type`.
+        builder: Called with `raw_info` to build the index if needed.
+        """
+        index = self._indexes.get(item)
+
+        if index is None:
+            index = builder(raw_info)
+            self._indexes[item] = index
+
+        return index
+
+    def devices(self) -> Dict[str, List[Device]]:
+        """Return all available devices in the snapshot, keyed by runtime ID."""
+        return Device.index(self).devices()
+
+    def runtimes(self) -> List[Runtime]:
+        """Return all runtimes in the snapshot."""
+        return list(Runtime.index(self).runtimes)
+
+    def device_types(self) -> List[DeviceType]:
+        """Return all device types in the snapshot."""
+        return list(DeviceType.index(self).device_types)
+
+    def device_pairs(self) -> List[DevicePair]:
+        """Return all device pairs in the snapshot.
+
+        Each call returns new objects, since resolving the devices in a pair
+        stores them on it.
+        """
+        return DevicePair.from_simctl_info(self.list_type(SimulatorControlType.DEVICE_PAIR))
@@ -0,0 +1,412 @@
+"""Install the same app bundle on many devices from a content-addressed cache.
+
+Each bundle is hashed (in parallel, see `isim.hashing`) and copied once
+into a cache directory named after its hash. Every device then installs
+from that copy. The hashes are remembered between runs, keyed by the
+bundle's file sizes and modification times, so an unchanged bundle isn't
+read again:
+
+    pipeline = InstallPipeline()
+    pipeline.install(devices, "build/MyApp.app")
+    print(pipeline.statuses())
+
+Devices which already have the same build installed are skipped (see
+`batching.install`).
+
+Every new build adds another copy to the cache, so it grows until pruned.
+Give the cache a `max_size` and/or `max_age` to prune it automatically as
+bundles are staged, or call `BundleCache.prune` yourself.
+"""
+
+import concurrent.futures
+import enum
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from isim import batching
+from isim.base_types import command_timeout
+from isim.device import Device
+from isim.disk_cache import default_cache_path
+from isim.hashing import disk_usage, hash_tree
+
+_HASHES_FILE_NAME = "hashes.json"
+
+
+def default_staging_path() -> str:
+    """Return where bundles are staged by default, in the user's cache directory."""
+    return os.path.join(os.path.dirname(default_cache_path()), "bundles")
+
+
+def tree_signature(path: str) -> str:
+    """Return a hash of the sizes, modification times and modes of everything in a tree.
+
+    This only needs `stat` calls, so it is a cheap way to tell whether a
+    bundle might have changed since it was last hashed. A single file is
+    described by its own details.
+    """
+    digest = hashlib.sha256()
+
+    if not os.path.isdir(path):
+        info = os.stat(path)
+        entry = f". {info.st_size} {info.st_mtime_ns} {info.st_mode}\n"
+        digest.update(entry.encode("utf-8"))
+        return digest.hexdigest()
+
+    for directory, directory_names, file_names in os.walk(path):
+        directory_names.sort()
+
+        for name in [""] + sorted(file_names):
+            full_path = os.path.join(directory, name) if name else directory
+            info = os.lstat(full_path)
+            relative_path = os.path.relpath(full_path, path)
+            entry = f"{relative_path} {info.st_size} {info.st_mtime_ns} {info.st_mode}\n"
+            digest.update(entry.encode("utf-8", "surrogateescape"))
+
+    return digest.hexdigest()
+
+
+class InstallStatus(enum.Enum):
+    """Where a device is in the install pipeline."""
+
+    PENDING = "pending"
+    INSTALLING = "installing"
+    INSTALLED = "installed"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+
+InstallProgressCallback = Callable[[str, InstallStatus], None]
+
+
+class DeviceInstall:
+    """The install status of a single device."""
+
+    udid: str
+    status: InstallStatus
+    error: Optional[BaseException]
+
+    def __init__(
+        self, udid: str, status: InstallStatus, error: Optional[BaseException] = None
+    ) -> None:
+        """Construct a DeviceInstall.
+
+        udid: The UDID of the device.
+        status: Where the device is in the pipeline.
+        error: The exception raised, if the install failed.
+        """
+        self.udid = udid
+        self.status = status
+        self.error = error
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        if self.error is not None:
+            return f"{self.udid}: {self.status.value} ({self.error!r})"
+        return f"{self.udid}: {self.status.value}"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str({"udid": self.udid, "status": self.status, "error": self.error})
+
+
+class BundleCache:
+    """A directory of app bundles, each stored once under its content hash."""
+
+    path: str
+    max_size: Optional[int]
+    max_age: Optional[float]
+
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        *,
+        max_size: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        """Construct a BundleCache.
+
+        path: The cache directory. Defaults to `default_staging_path()`.
+        max_size: If set, the least recently used bundles are removed after
+                  staging a new one, until the cache is no larger than this
+                  many bytes.
+        max_age: If set, bundles which haven't been used for this many seconds
+                 are removed after staging a new one.
+        """
+        self.path = path if path is not None else default_staging_path()
+        self.max_size = max_size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def _load_hashes(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(
+                os.path.join(self.path, _HASHES_FILE_NAME), "r", encoding="utf-8"
+            ) as hashes_file:
+                hashes = json.load(hashes_file)
+        except (OSError, ValueError):
+            return {}
+
+        return hashes if isinstance(hashes, dict) else {}
+
+    def _save_hashes(self, hashes: Dict[str, Dict[str, str]]) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as temp_file:
+                json.dump(hashes, temp_file)
+            os.replace(temp_path, os.path.join(self.path, _HASHES_FILE_NAME))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def digest(self, bundle_path: str, *, max_workers: Optional[int] = None) -> str:
+        """Return the `hash_tree` of a bundle, reusing the last one if it is unchanged.
+
+        max_workers: The most files to hash at once.
+        """
+        bundle_path = os.path.realpath(bundle_path)
+        signature = tree_signature(bundle_path)
+
+        with self._lock:
+            known = self._load_hashes().get(bundle_path)
+
+        if known is not None and known.get("signature") == signature:
+            return known["digest"]
+
+        digest = hash_tree(bundle_path, max_workers=max_workers)
+
+        with self._lock:
+            hashes = self._load_hashes()
+            hashes[bundle_path] = {"signature": signature, "digest": digest}
+
+            try:
+                self._save_hashes(hashes)
+            except OSError:
+                pass
+
+        return digest
+
+    def staged_path(self, bundle_path: str, digest: str) -> str:
+        """Return where a bundle with the digest is (or would be) staged."""
+        return os.path.join(self.path, digest, os.path.basename(bundle_path.rstrip("/")))
+
+    def stage(
+        self,
+        bundle_path: str,
+        *,
+        digest: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ) -> str:
+        """Copy a bundle into the cache, unless it is already there, and return the copy.
+
+        digest: The digest of the bundle, if already known.
+        max_workers: The most files to hash at once.
+        """
+        if digest is None:
+            digest = self.digest(bundle_path, max_workers=max_workers)
+
+        staged_path = self.staged_path(bundle_path, digest)
+
+        if os.path.exists(staged_path):
+            # Mark it as recently used, so that it is pruned last
+            try:
+                os.utime(os.path.dirname(staged_path))
+            except OSError:
+                pass
+
+            return staged_path
+
+        os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+
+        # Copy to a temporary directory and move it into place, so that a
+        # partial copy is never used
+        temp_dir = tempfile.mkdtemp(dir=self.path, prefix=".staging-")
+
+        try:
+            copy_path = os.path.join(temp_dir, os.path.basename(staged_path))
+
+            if os.path.isdir(bundle_path):
+                shutil.copytree(bundle_path, copy_path, symlinks=True)
+            else:
+                shutil.copy2(bundle_path, copy_path)
+
+            try:
+                os.rename(copy_path, staged_path)
+            except OSError:
+                # Someone else staged it first
+                if not os.path.exists(staged_path):
+                    raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        if self.max_size is not None or self.max_age is not None:
+            self.prune(max_size=self.max_size, max_age=self.max_age, keep=[digest])
+
+        return staged_path
+
+    def _staged_digests(self) -> List[Tuple[float, str]]:
+        """Return (last used time, digest) for each staged bundle, least recently used first."""
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+
+        staged = []
+
+        for name in names:
+            # Skips the remembered hashes and any copies in progress
+            if name == _HASHES_FILE_NAME or name.startswith("."):
+                continue
+
+            try:
+                staged.append((os.stat(os.path.join(self.path, name)).st_mtime, name))
+            except OSError:
+                pass
+
+        return sorted(staged)
+
+    def prune(
+        self,
+        *,
+        max_size: Optional[int] = None,
+        max_age: Optional[float] = None,
+        keep: Iterable[str] = (),
+    ) -> List[str]:
+        """Remove the least recently used bundles from the cache.
+
+        max_size: Remove bundles until the cache is no larger than this many bytes.
+        max_age: Remove bundles which haven't been staged or used for this many seconds.
+        keep: Digests of bundles which mustn't be removed (e.g. one being installed).
+
+        Returns the digests of the bundles removed.
+        """
+        keep = set(keep)
+        staged = [entry for entry in self._staged_digests() if entry[1] not in keep]
+        removed = []
+
+        if max_age is not None:
+            cutoff = time.time() - max_age
+            removed += [digest for last_used, digest in staged if last_used < cutoff]
+
+        if max_size is not None:
+            sizes = {
+                digest: disk_usage(os.path.join(self.path, digest))
+                for _, digest in self._staged_digests()
+            }
+            total = sum(size for digest, size in sizes.items() if digest not in removed)
+
+            for _, digest in staged:
+                if total <= max_size:
+                    break
+
+                if digest not in removed:
+                    removed.append(digest)
+                    total -= sizes[digest]
+
+        for digest in removed:
+            shutil.rmtree(os.path.join(self.path, digest), ignore_errors=True)
+
+        return removed
+
+    def clear(self) -> None:
+        """Delete every staged bundle and remembered hash."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class InstallPipeline:
+    """Installs bundles on many devices, staging each bundle once."""
+
+    cache: BundleCache
+    max_workers: Optional[int]
+
+    _statuses: Dict[str, DeviceInstall]
+    _lock: threading.Lock
+
+    def __init__(
+        self, cache: Optional[BundleCache] = None, max_workers: Optional[int] = None
+    ) -> None:
+        """Construct an InstallPipeline.
+
+        cache: Where to stage bundles. Defaults to a `BundleCache` in the
+               default location.
+        max_workers: The most devices to install on (and files to hash) at once.
+        """
+        self.cache = cache if cache is not None else BundleCache()
+        self.max_workers = max_workers
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def statuses(self) -> Dict[str, DeviceInstall]:
+        """Return the install status of each device, keyed by UDID.
+
+        This can be called from another thread while an install is running.
+        """
+        with self._lock:
+            return {
+                udid: DeviceInstall(udid, install.status, install.error)
+                for udid, install in self._statuses.items()
+            }
+
+    def _set_status(
+        self,
+        udid: str,
+        status: InstallStatus,
+        error: Optional[BaseException],
+        progress: Optional[InstallProgressCallback],
+    ) -> None:
+        with self._lock:
+            self._statuses[udid] = DeviceInstall(udid, status, error)
+
+        if progress is not None:
+            progress(udid, status)
+
+    def install(
+        self,
+        devices: List[Device],
+        bundle_path: str,
+        *,
+        timeout: Optional[float] = None,
+        progress: Optional[InstallProgressCallback] = None,
+    ) -> Dict[str, DeviceInstall]:
+        """Stage a bundle and install it on each device.
+
+        timeout: The number of seconds each device's install may take.
+        progress: Called with each device's UDID and status as it changes,
+                  from the worker threads.
+
+        Returns the status of each device, keyed by UDID. Failures are
+        recorded in the statuses rather than raised.
+        """
+        digest = self.cache.digest(bundle_path, max_workers=self.max_workers)
+        staged_path = self.cache.stage(bundle_path, digest=digest)
+
+        for device in devices:
+            self._set_status(device.udid, InstallStatus.PENDING, None, progress)
+
+        def install_one(device: Device) -> None:
+            self._set_status(device.udid, InstallStatus.INSTALLING, None, progress)
+
+            try:
+                with command_timeout(timeout):
+                    installed = batching.install(device, staged_path, digest=digest)
+            except Exception as ex:  # pylint: disable=broad-except
+                self._set_status(device.udid, InstallStatus.FAILED, ex, progress)
+                return
+
+            status = InstallStatus.INSTALLED if installed else InstallStatus.SKIPPED
+            self._set_status(device.udid, status, None, progress)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(install_one, devices))
+
+        statuses = self.statuses()
+        return {device.udid: statuses[device.udid] for device in devices}
@@ -0,0 +1,257 @@
+"""Watching for changes to the devices.
+
+simctl has no way to subscribe to changes, so the watcher polls
+`xcrun simctl list --json`, backing off while nothing changes. Commands run
+through isim which change the devices wake it up straight away. Only the
+differences from the previous poll are reported:
+
+    def on_change(event):
+        print(event)
+
+    with DeviceWatcher(on_change):
+        ...
+"""
+
+import enum
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from isim.base_types import SimulatorControlType, changes_list
+from isim.device import Device
+from isim.instrumentation import CommandRecord, add_hook, remove_hook
+from isim.snapshot import SimctlSnapshot
+
+
+class ChangeKind(enum.Enum):
+    """The kinds of change the watcher reports."""
+
+    ADDED = "added"
+    REMOVED = "removed"
+    STATE_CHANGED = "state_changed"
+    RENAMED = "renamed"
+
+
+class DeviceEvent:
+    """A change to a single device."""
+
+    kind: ChangeKind
+    device: Device
+    previous: Optional[Device]
+
+    def __init__(self, kind: ChangeKind, device: Device, previous: Optional[Device] = None) -> None:
+        """Construct a DeviceEvent.
+
+        kind: What changed.
+        device: The device as it is now (or was, if it was removed).
+        previous: The device as it was before, for state changes and renames.
+        """
+        self.kind = kind
+        self.device = device
+        self.previous = previous
+
+    def __str__(self) -> str:
+        """Return the string representation of the object."""
+        if self.kind == ChangeKind.STATE_CHANGED and self.previous is not None:
+            return f"{self.device}: {self.previous.state} -> {self.device.state}"
+
+        if self.kind == ChangeKind.RENAMED and self.previous is not None:
+            return f"{self.device}: renamed from {self.previous.name}"
+
+        return f"{self.device}: {self.kind.value}"
+
+    def __repr__(self) -> str:
+        """Return the string programmatic representation of the object."""
+        return str({"kind": self.kind, "device": self.device, "previous": self.previous})
+
+
+DeviceEventCallback = Callable[[DeviceEvent], None]
+
+# Each device's raw simctl output and runtime, keyed by UDID
+_RawDevices = Dict[str, Tuple[Dict[str, Any], str]]
+
+
+# pylint: disable=too-many-instance-attributes
+class DeviceWatcher:
+    """Polls for changes to the devices, reporting each one."""
+
+    callback: Optional[DeviceEventCallback]
+    min_interval: float
+    max_interval: float
+    backoff: float
+    interval: float
+
+    _previous: Optional[_RawDevices]
+    _poll_lock: threading.Lock
+    _wake: threading.Event
+    _stopped: threading.Event
+    _thread: Optional[threading.Thread]
+
+    def __init__(
+        self,
+        callback: Optional[DeviceEventCallback] = None,
+        *,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        backoff: float = 2.0,
+    ) -> None:
+        """Construct a DeviceWatcher.
+
+        callback: Called with each event when running in the background (see `start`).
+        min_interval: The shortest time between polls, used just after a change.
+        max_interval: The longest time between polls, reached while nothing changes.
+        backoff: How much the interval grows by after each poll without changes.
+        """
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("The intervals must be positive, and the maximum at least the minimum")
+
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self._previous = None
+        self._poll_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _raw_devices(snapshot: SimctlSnapshot) -> _RawDevices:
+        """Key the raw output of every device by UDID."""
+        device_info = snapshot.list_type(SimulatorControlType.DEVICE)
+        return {
+            info["udid"]: (info, runtime_id)
+            for runtime_id, devices in device_info.items()
+            for info in devices
+        }
+
+    @staticmethod
+    def _diff(previous: _RawDevices, current: _RawDevices) -> List[DeviceEvent]:
+        """Work out the events between two polls.
+
+        Device objects are only created for devices which have changed.
+        """
+        events = []
+
+        for udid, (info, runtime_id) in current.items():
+            old = previous.get(udid)
+
+            if old is None:
+                events.append(DeviceEvent(ChangeKind.ADDED, Device(info, runtime_id)))
+                continue
+
+            old_info, old_runtime_id = old
+
+            if old_info == info:
+                continue
+
+            device = Device(info, runtime_id)
+            old_device = Device(old_info, old_runtime_id)
+
+            if old_device.state != device.state:
+                events.append(DeviceEvent(ChangeKind.STATE_CHANGED, device, old_device))
+
+            if old_device.name != device.name:
+                events.append(DeviceEvent(ChangeKind.RENAMED, device, old_device))
+
+        for udid, (info, runtime_id) in previous.items():
+            if udid not in current:
+                events.append(DeviceEvent(ChangeKind.REMOVED, Device(info, runtime_id)))
+
+        return events
+
+    def poll(self, snapshot: Optional[SimctlSnapshot] = None) -> List[DeviceEvent]:
+        """Check for changes since the previous poll, and adjust the interval.
+
+        The first poll reports every device as added.
+
+        snapshot: The current state, if it has already been fetched.
+        """
+        with self._poll_lock:
+            current = DeviceWatcher._raw_devices(
+                snapshot if snapshot is not None else SimctlSnapshot()
+            )
+            events = DeviceWatcher._diff(self._previous or {}, current)
+            self._previous = current
+
+            if events:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+
+            return events
+
+    def wake(self) -> None:
+        """Poll again as soon as possible."""
+        self.interval = self.min_interval
+        self._wake.set()
+
+    def _on_command(self, record: CommandRecord) -> None:
+        """Wake up when isim changes a device."""
+        if changes_list(record.args):
+            self.wake()
+
+    def events(self) -> Iterator[DeviceEvent]:
+        """Poll until stopped, yielding each event."""
+        # Stopping and starting again makes a new event, so keep this one
+        stopped = self._stopped
+        add_hook(self._on_command)
+
+        try:
+            while not stopped.is_set():
+                self._wake.clear()
+                yield from self.poll()
+                self._wake.wait(self.interval)
+        finally:
+            remove_hook(self._on_command)
+
+    def _run(self) -> None:
+        """Report events to the callback (on the watcher thread).
+
+        An exception from the callback is logged, and watching carries on.
+        """
+        assert self.callback is not None
+
+        try:
+            for event in self.events():
+                try:
+                    self.callback(event)
+                except Exception:
+                    logging.getLogger("isim").exception("Device watcher callback failed")
+        except Exception:
+            logging.getLogger("isim").exception("Device watcher stopped polling")
+
+    def start(self) -> None:
+        """Start polling on a background thread, calling the callback with each event."""
+        if self.callback is None:
+            raise ValueError("A callback is required to watch in the background")
+
+        if self._thread is not None:
+            raise ValueError("The watcher has already been started")
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="isim-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling. Blocks until the background thread (if any) has finished.
+
+        When called from the callback, this returns straight away and the
+        background thread finishes once the callback returns. The watcher can
+        be started again either way.
+        """
+        self._stopped.set()
+        self._wake.set()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+        self._thread = None
+
+    def __enter__(self) -> "DeviceWatcher":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type: object, exc_value: object, traceback: object) -> None:
+        self.stop()
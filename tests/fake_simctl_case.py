@@ -0,0 +1,42 @@
+"""A base for tests which run simctl commands against a fake simctl."""
+
+import os
+import sys
+import unittest
+from typing import TypeVar
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+from isim.executor import CommandExecutor, set_executor
+from isim.fake_simctl import FakeSimctl
+
+# pylint: enable=wrong-import-position
+
+ExecutorT = TypeVar("ExecutorT", bound=CommandExecutor)
+FakeT = TypeVar("FakeT", bound=FakeSimctl)
+
+
+class FakeSimctlTestCase(unittest.TestCase):
+    """Runs every command in each test against a new `FakeSimctl`."""
+
+    # How many devices the fake starts with for each device type and runtime
+    devices_per_pairing = 0
+
+    fake: FakeSimctl
+
+    def setUp(self):
+        self.fake = FakeSimctl.with_default_inventory(devices_per_pairing=self.devices_per_pairing)
+        self.use_executor(self.fake)
+
+    def use_executor(self, executor: ExecutorT) -> ExecutorT:
+        """Run commands with the executor for the rest of the test."""
+        previous = set_executor(executor)
+        self.addCleanup(set_executor, previous)
+        return executor
+
+    def use_fake(self, fake: FakeT) -> FakeT:
+        """Run commands with another fake (e.g. a subclass) with the same inventory."""
+        fake.runtimes = self.fake.runtimes
+        fake.device_types = self.fake.device_types
+        fake.devices = self.fake.devices
+        return self.use_executor(fake)
@@ -0,0 +1,135 @@
+"""Test the async API."""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from typing import List
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim.aio
+
+# pylint: enable=wrong-import-position
+
+FAKE_UDID = "9B9A9D5B-6D5E-4C61-8A40-4D4B36C0B6F1"
+
+FAKE_DEVICES = {
+    "devices": {
+        "com.apple.CoreSimulator.SimRuntime.iOS-99-0": [
+            {
+                "udid": FAKE_UDID,
+                "isAvailable": True,
+                "deviceTypeIdentifier": "io.myers.isim.device-type.Apple-Fridge",
+                "state": "Shutdown",
+                "name": "Kitchen Fridge",
+            }
+        ]
+    }
+}
+
+
+class FakeProcess:
+    """Pretends to be an asyncio subprocess running `xcrun simctl`."""
+
+    running = 0
+    max_running = 0
+    commands: List[List[str]] = []
+
+    def __init__(self, *args, **_) -> None:
+        self.args = list(args)
+        self.returncode = None
+        FakeProcess.commands.append(self.args)
+
+    async def communicate(self):
+        """Run the fake command."""
+        FakeProcess.running += 1
+        FakeProcess.max_running = max(FakeProcess.max_running, FakeProcess.running)
+        await asyncio.sleep(0.01)
+        FakeProcess.running -= 1
+
+        subcommand = self.args[2]
+        self.returncode = 0
+
+        if subcommand == "list":
+            return json.dumps(FAKE_DEVICES).encode("utf-8"), None
+
+        if subcommand == "create":
+            return (FAKE_UDID + "\n").encode("utf-8"), None
+
+        if subcommand == "install" and self.args[4] == "/missing.app":
+            self.returncode = 2
+
+        return b"", None
+
+
+async def fake_exec(*args, **kwargs):
+    """Replacement for `asyncio.create_subprocess_exec`."""
+    return FakeProcess(*args, **kwargs)
+
+
+class TestAio(unittest.TestCase):
+    """Test the async wrapper around simctl."""
+
+    def setUp(self):
+        FakeProcess.running = 0
+        FakeProcess.max_running = 0
+        FakeProcess.commands = []
+        patcher = mock.patch("asyncio.create_subprocess_exec", side_effect=fake_exec)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        isim.aio.set_concurrency_limit(os.cpu_count() or 4)
+
+    def test_commands(self):
+        """Test that commands are run as argv without a shell."""
+
+        async def run():
+            device = await isim.aio.AsyncDevice.from_identifier(FAKE_UDID)
+            await device.boot()
+            await device.install("/Apps/My App.app")
+            return device
+
+        device = asyncio.run(run())
+        self.assertEqual(device.name, "Kitchen Fridge")
+        self.assertIn(["xcrun", "simctl", "boot", FAKE_UDID], FakeProcess.commands)
+        self.assertIn(
+            ["xcrun", "simctl", "install", FAKE_UDID, "/Apps/My App.app"], FakeProcess.commands
+        )
+
+    def test_create(self):
+        """Test that creating a device returns the new device."""
+        device_type = mock.Mock(identifier="io.myers.isim.device-type.Apple-Fridge")
+        runtime = mock.Mock(identifier="com.apple.CoreSimulator.SimRuntime.iOS-99-0")
+        device = asyncio.run(isim.aio.AsyncDevice.create("Fridge", device_type, runtime))
+        self.assertEqual(device.udid, FAKE_UDID)
+
+    def test_failure(self):
+        """Test that failed commands raise the same error as the sync API."""
+
+        async def run():
+            device = await isim.aio.AsyncDevice.from_identifier(FAKE_UDID)
+            await device.install("/missing.app")
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            asyncio.run(run())
+
+    def test_concurrency_limit(self):
+        """Test that no more than the limit of commands run at once."""
+        isim.aio.set_concurrency_limit(3)
+
+        async def run():
+            device = await isim.aio.AsyncDevice.from_identifier(FAKE_UDID)
+            await asyncio.gather(*[device.shutdown() for _ in range(10)])
+
+        asyncio.run(run())
+        self.assertEqual(FakeProcess.max_running, 3)
+
+    def test_invalid_concurrency_limit(self):
+        """Test that the limit has to allow at least one command."""
+        with self.assertRaises(ValueError):
+            isim.aio.set_concurrency_limit(0)
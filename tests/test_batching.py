@@ -0,0 +1,148 @@
+"""Test batched media and skipped installs."""
+
+import os
+import plistlib
+import sys
+import tempfile
+import unittest
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim import batching, bulk
+from isim.hashing import hash_tree
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestBatching(FakeSimctlTestCase):
+    """Test batched media and skipped installs."""
+
+    devices_per_pairing = 1
+
+    temp_dir: str
+    devices: List[isim.Device]
+
+    def setUp(self):
+        super().setUp()
+
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+
+        self.devices = isim.Device.list_all()["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][:2]
+        for device in self.devices:
+            device.boot()
+
+    def write(self, relative_path: str, contents: bytes) -> str:
+        """Write a file into the temporary directory, returning its path."""
+        path = os.path.join(self.temp_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "wb") as output_file:
+            output_file.write(contents)
+
+        return path
+
+    def make_app(self, version: str, executable: bytes = b"binary", name: str = "Example") -> str:
+        """Write an app bundle, returning its path."""
+        path = os.path.join(self.temp_dir, f"{name}.app")
+        info = {"CFBundleIdentifier": f"com.example.{name.lower()}", "CFBundleVersion": version}
+        self.write(f"{name}.app/Info.plist", plistlib.dumps(info))
+        self.write(f"{name}.app/{name}", executable)
+        return path
+
+    def commands(self, subcommand: str) -> List[List[str]]:
+        """Return the commands run with the subcommand."""
+        return [command for command in self.fake.commands if command[0] == subcommand]
+
+    def test_batch_arguments(self):
+        """Test that paths are split into batches that fit the limit."""
+        paths = [f"/photos/{index:04}.jpg" for index in range(1000)]
+        batches = batching.batch_arguments(paths, max_argument_bytes=4096)
+
+        self.assertGreater(len(batches), 1)
+        self.assertEqual([path for batch in batches for path in batch], paths)
+
+        for batch in batches:
+            self.assertLessEqual(sum(len(path) + 9 for path in batch) + 256, 4096)
+
+    def test_add_media(self):
+        """Test that media is added in batches and only once per device."""
+        photos = [self.write(f"photo{index}.jpg", f"photo {index}".encode()) for index in range(50)]
+        duplicate = self.write("copy.jpg", b"photo 0")
+
+        added = batching.add_media(self.devices[0], photos + [duplicate], max_argument_bytes=1024)
+        self.assertEqual(added, photos)
+        batches = self.commands("addmedia")
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(sorted(path for batch in batches for path in batch[2:]), sorted(photos))
+
+        new_photo = self.write("new.jpg", b"new photo")
+        self.assertEqual(batching.add_media(self.devices[0], photos + [new_photo]), [new_photo])
+
+        results = bulk.add_media(self.devices, photos)
+        self.assertEqual(results[self.devices[0].udid].value, [])
+        self.assertEqual(results[self.devices[1].udid].value, photos)
+
+        # Erasing the device removes the media
+        self.devices[0].shutdown()
+        self.devices[0].erase()
+        self.devices[0].boot()
+        self.assertEqual(batching.add_media(self.devices[0], photos), photos)
+
+    def test_install(self):
+        """Test that unchanged apps aren't installed again."""
+        app = self.make_app("1")
+        device = self.devices[0]
+
+        self.assertTrue(batching.install(device, app))
+        self.assertFalse(batching.install(device, app))
+        self.assertEqual(len(self.commands("install")), 1)
+
+        # A change to the contents is installed
+        self.make_app("1", executable=b"rebuilt")
+        self.assertTrue(batching.install(device, app))
+        self.assertFalse(batching.install(device, app))
+
+        # As is a reinstall after the app was removed
+        device.uninstall("com.example.example")
+        self.assertTrue(batching.install(device, app))
+
+        # And after an install which didn't go through batching
+        device.install(app)
+        self.assertTrue(batching.install(device, app))
+        self.assertEqual(len(self.commands("install")), 5)
+
+        # Installing or removing another app doesn't forget this one
+        other_app = self.make_app("1", name="Other")
+        device.install(other_app)
+        device.uninstall("com.example.other")
+        self.assertFalse(batching.install(device, app))
+
+        results = bulk.install_if_changed(self.devices, app)
+        self.assertEqual(
+            {udid: result.value for udid, result in results.items()},
+            {self.devices[0].udid: False, self.devices[1].udid: True},
+        )
+
+    def test_hash_tree(self):
+        """Test that tree hashes depend on contents and layout but not timestamps."""
+        app = self.make_app("1")
+        digest = hash_tree(app, max_workers=2)
+
+        os.utime(os.path.join(app, "Example"), (0, 0))
+        self.assertEqual(hash_tree(app), digest)
+
+        os.rename(os.path.join(app, "Example"), os.path.join(app, "Renamed"))
+        self.assertNotEqual(hash_tree(app), digest)
+
+        os.rename(os.path.join(app, "Renamed"), os.path.join(app, "Example"))
+        os.chmod(os.path.join(app, "Example"), 0o755)
+        self.assertNotEqual(hash_tree(app), digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+"""Test following devices as they boot."""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim import bulk
+from isim.boot_status import BootProgress, parse_phase
+from isim.executor import CommandProcess
+from isim.fake_simctl import FakeSimctl
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class SlowBootSimctl(FakeSimctl):
+    """A fake simctl where `bootstatus` takes a while."""
+
+    boot_time: float
+
+    def __init__(self, boot_time: float) -> None:
+        super().__init__()
+        self.boot_time = boot_time
+
+    def run(self, args: List[str], timeout: Optional[float] = None) -> str:
+        if args[0] == "bootstatus":
+            if timeout is not None and timeout < self.boot_time:
+                time.sleep(timeout)
+                raise subprocess.TimeoutExpired(["xcrun", "simctl"] + args, timeout)
+            time.sleep(self.boot_time)
+        return super().run(args, timeout)
+
+
+def python_process(script: str, **kwargs) -> CommandProcess:
+    """Start a Python script as if it were a simctl command."""
+    # pylint: disable=consider-using-with
+    process = subprocess.Popen(
+        [sys.executable, "-c", script],
+        universal_newlines=True,
+        stdout=subprocess.PIPE,
+    )
+    # pylint: enable=consider-using-with
+    assert process.stdout is not None
+    return CommandProcess(["script"], process.stdout, process, **kwargs)
+
+
+class TestCommandProcess(unittest.TestCase):
+    """Test reading command output as it arrives."""
+
+    def test_lines_arrive_before_exit(self):
+        """Test that lines can be read while the command is still running."""
+        script = "import sys, time; print('first', flush=True); time.sleep(30)"
+
+        with python_process(script) as process:
+            self.assertEqual(process.readline(), "first")
+            self.assertIsNone(process.poll())
+
+        self.assertIsNotNone(process.returncode)
+
+    def test_failure(self):
+        """Test that a failing command raises once its output is read."""
+        script = "print('output'); raise SystemExit(3)"
+
+        with python_process(script) as process:
+            lines = []
+            with self.assertRaises(subprocess.CalledProcessError) as context:
+                for line in process.lines():
+                    lines.append(line)
+
+        self.assertEqual(lines, ["output"])
+        self.assertEqual(context.exception.returncode, 3)
+
+    def test_timeout(self):
+        """Test that a command which runs out of time is killed."""
+        script = "import time; time.sleep(30)"
+        process = python_process(script, timeout=0.2)
+
+        with self.assertRaises(subprocess.TimeoutExpired):
+            list(process.lines())
+
+        self.assertIsNotNone(process.returncode)
+
+    def test_backpressure(self):
+        """Test that closing a command with a full buffer doesn't hang."""
+        script = "while True: print('x' * 100)"
+        process = python_process(script, max_buffered_lines=4)
+
+        self.assertEqual(process.readline(), "x" * 100)
+        process.close(grace_period=1)
+        self.assertIsNotNone(process.returncode)
+
+    def test_exit_callback(self):
+        """Test that exit callbacks run exactly once."""
+        calls = []
+        process = CommandProcess.finished(["list"], "a\nb\n")
+        process.on_exit.append(calls.append)
+
+        self.assertEqual(list(process.lines()), ["a", "b"])
+        process.close()
+        self.assertEqual(calls, [process])
+
+
+class TestBootStatus(FakeSimctlTestCase):
+    """Test waiting for devices to boot."""
+
+    def create_device(self, name: str) -> isim.Device:
+        """Create a new iPhone."""
+        runtime = isim.Runtime.from_name("iOS 17.0")
+        device_type = isim.DeviceType.from_name("iPhone 15")
+        return isim.Device.create(name, device_type, runtime)
+
+    def test_parse_phase(self):
+        """Test parsing the phases out of bootstatus output."""
+        self.assertEqual(parse_phase("Waiting on System App"), "System App")
+        self.assertEqual(parse_phase("  Waiting on Data Migration  "), "Data Migration")
+        self.assertIsNone(parse_phase("Finished Waiting on System App"))
+        self.assertIsNone(parse_phase("Device booted in 1.2 seconds"))
+
+    def test_boot_and_wait(self):
+        """Test booting a device and waiting for it."""
+        device = self.create_device("Boot Test")
+        updates: List[BootProgress] = []
+
+        device.boot(wait=True, progress=updates.append)
+
+        self.assertEqual(self.fake.commands[-1], ["bootstatus", device.udid, "-b"])
+        self.assertTrue(updates)
+        self.assertEqual(updates[1].phase, "System App")
+        self.assertEqual(updates[-1].phase, "System App")
+        self.assertTrue(all(update.udid == device.udid for update in updates))
+
+        device.refresh_state()
+        self.assertEqual(device.state, "Booted")
+
+    def test_boot_status_not_booted(self):
+        """Test that waiting on a device without booting it fails if it isn't booted."""
+        device = self.create_device("Not Booted")
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            device.boot_status()
+
+        device.boot()
+        self.assertTrue(device.boot_status())
+
+    def test_wait_until_booted(self):
+        """Test that waiting on many devices takes as long as the slowest one."""
+        devices = [self.create_device(f"Device {index}") for index in range(16)]
+        self.use_fake(SlowBootSimctl(0.2))
+
+        threads = set()
+
+        def progress(_: BootProgress) -> None:
+            threads.add(threading.get_ident())
+
+        start = time.monotonic()
+        results = bulk.wait_until_booted(devices, progress=progress)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(list(results.keys()), [device.udid for device in devices])
+        self.assertTrue(all(result.succeeded for result in results.values()))
+        self.assertLess(elapsed, 0.2 * len(devices) / 2)
+        self.assertGreater(len(threads), 1)
+
+        for device in devices:
+            device.refresh_state()
+            self.assertEqual(device.state, "Booted")
+
+    def test_wait_until_booted_timeout(self):
+        """Test that devices which take too long get a timeout."""
+        device = self.create_device("Slow Device")
+        self.use_fake(SlowBootSimctl(0.5))
+
+        results = bulk.wait_until_booted([device], timeout=0.1)
+
+        self.assertIsInstance(results[device.udid].error, subprocess.TimeoutExpired)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Test bulk device operations."""
+
+import concurrent.futures
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+import isim.bulk
+
+# pylint: enable=wrong-import-position
+
+
+def fake_devices(count):
+    """Create some stand in devices."""
+    return [mock.Mock(spec=isim.Device, udid=f"UDID-{index}") for index in range(count)]
+
+
+class TestBulk(unittest.TestCase):
+    """Test running operations across many devices."""
+
+    def test_results(self):
+        """Test that results and errors are reported per device."""
+        devices = fake_devices(4)
+        devices[2].launch.side_effect = subprocess.CalledProcessError(1, "launch")
+        for device in devices[:2] + devices[3:]:
+            device.launch.return_value = f"{device.udid}: 1234\n"
+
+        results = isim.bulk.launch(devices, "io.myers.testapp", max_workers=2)
+
+        self.assertEqual(list(results.keys()), [device.udid for device in devices])
+        self.assertTrue(results["UDID-0"].succeeded)
+        self.assertEqual(results["UDID-0"].value, "UDID-0: 1234\n")
+        self.assertFalse(results["UDID-2"].succeeded)
+        self.assertIsInstance(results["UDID-2"].error, subprocess.CalledProcessError)
+        for device in devices:
+            device.launch.assert_called_once_with("io.myers.testapp")
+
+    def test_bounded(self):
+        """Test that no more than max_workers devices are worked on at once."""
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def operation(_):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        isim.bulk.run_on_devices(fake_devices(12), operation, max_workers=3)
+        self.assertLessEqual(running[1], 3)
+
+    def test_fail_fast(self):
+        """Test that fail fast stops new devices from being started."""
+        devices = fake_devices(10)
+        devices[0].erase.side_effect = ValueError("Broken")
+
+        results = isim.bulk.erase(devices, max_workers=1, fail_fast=True)
+
+        self.assertIsInstance(results["UDID-0"].error, ValueError)
+        for udid in [device.udid for device in devices[1:]]:
+            self.assertIsInstance(results[udid].error, concurrent.futures.CancelledError)
+
+    def test_timeout(self):
+        """Test that the timeout is applied to the commands for each device."""
+
+        def operation(_):
+            time.sleep(0.05)
+            return isim.base_types.remaining_command_time("boot")
+
+        results = isim.bulk.run_on_devices(fake_devices(2), operation, timeout=0.01)
+        for result in results.values():
+            self.assertIsInstance(result.error, subprocess.TimeoutExpired)
+
+        results = isim.bulk.run_on_devices(fake_devices(2), operation, timeout=60)
+        for result in results.values():
+            self.assertTrue(result.succeeded)
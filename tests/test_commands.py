@@ -0,0 +1,85 @@
+"""Test how simctl commands are run."""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.base_types import SimulatorControlBase
+from isim.executor import use_executor
+from isim.fake_simctl import FakeSimctl
+from isim.instrumentation import CommandRecord, add_hook, remove_hook
+
+# pylint: enable=wrong-import-position
+
+FAKE_DEVICE_INFO = {
+    "udid": "9B9A9D5B-6D5E-4C61-8A40-4D4B36C0B6F1",
+    "isAvailable": True,
+    "deviceTypeIdentifier": "io.myers.isim.device-type.Apple-Fridge",
+    "state": "Shutdown",
+    "name": "Kitchen Fridge",
+}
+
+
+def fake_run(*args, **_):
+    """Pretend to be `xcrun simctl`."""
+    return subprocess.CompletedProcess(args[0], 0, stdout="")
+
+
+class TestCommands(unittest.TestCase):
+    """Test that commands are run as argv without a shell."""
+
+    def test_no_shell(self):
+        """Test that arguments are passed through untouched."""
+        device = isim.Device(FAKE_DEVICE_INFO, "com.apple.CoreSimulator.SimRuntime.iOS-99-0")
+
+        with mock.patch("subprocess.run", side_effect=fake_run) as run:
+            device.rename('Dale\'s "Fridge" $HOME')
+            device.addmedia(["/tmp/a b.png", "/tmp/c'd.png"])
+
+        rename_call, addmedia_call = run.call_args_list
+        self.assertEqual(
+            rename_call.args[0],
+            ["xcrun", "simctl", "rename", device.udid, 'Dale\'s "Fridge" $HOME'],
+        )
+        self.assertEqual(
+            addmedia_call.args[0],
+            ["xcrun", "simctl", "addmedia", device.udid, "/tmp/a b.png", "/tmp/c'd.png"],
+        )
+        for call in run.call_args_list:
+            self.assertFalse(call.kwargs.get("shell", False))
+
+    def test_string_commands(self):
+        """Test that string commands are still split using shell syntax."""
+        with mock.patch("subprocess.run", side_effect=fake_run) as run:
+            SimulatorControlBase.run_command('rename booted "New Name"')
+
+        self.assertEqual(run.call_args.args[0], ["xcrun", "simctl", "rename", "booted", "New Name"])
+
+    def test_diagnose(self):
+        """Test that diagnose goes through the executor, and the instrumentation."""
+        fake = FakeSimctl.with_default_inventory(devices_per_pairing=1)
+
+        with use_executor(fake):
+            device = isim.Device.list_all()["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][0]
+
+            records: List[CommandRecord] = []
+            add_hook(records.append)
+            self.addCleanup(remove_hook, records.append)
+
+            with tempfile.TemporaryDirectory() as temp_dir:
+                output_path = os.path.join(temp_dir, "isim diagnose")
+                archive = isim.diagnose(output_path=output_path, udids=device.udid)
+
+                self.assertEqual(archive, output_path + ".tar.gz")
+                self.assertTrue(os.path.exists(archive))
+
+            self.assertEqual(fake.commands[-1][0], "diagnose")
+            self.assertIn(f"--output={output_path}", fake.commands[-1])
+            self.assertEqual([record.subcommand for record in records], ["diagnose"])
@@ -0,0 +1,118 @@
+"""Test resolving many app containers at once."""
+
+import copy
+import os
+import plistlib
+import sys
+import tempfile
+import unittest
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.containers import METADATA_FILE_NAME
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+_BUNDLE_IDS = ["com.example.one", "com.example.two"]
+
+
+class TestContainers(FakeSimctlTestCase):
+    """Test resolving many app containers at once."""
+
+    devices_per_pairing = 1
+
+    devices: List[isim.Device]
+
+    def setUp(self):
+        super().setUp()
+
+        self.devices = isim.Device.list_all()["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][:2]
+
+        for device in self.devices:
+            device.boot()
+
+            for bundle_id in _BUNDLE_IDS:
+                self.fake.apps.setdefault(device.udid, {})[bundle_id] = f"/build/{bundle_id}.app"
+
+    def lookups(self) -> int:
+        """Return how many container lookups have been run."""
+        return len([command for command in self.fake.commands if command[0] == "get_app_container"])
+
+    def test_resolve(self):
+        """Test that every container is resolved, matching single lookups."""
+        device = self.devices[0]
+        containers = device.get_app_containers(
+            _BUNDLE_IDS + ["com.example.missing"], ["app", "data"], max_workers=4
+        )
+
+        self.assertEqual(self.lookups(), 6)
+        self.assertEqual(containers["com.example.missing"], {"app": None, "data": None})
+
+        for bundle_id in _BUNDLE_IDS:
+            for kind in ["app", "data"]:
+                self.assertEqual(
+                    containers[bundle_id][kind], device.get_app_container(bundle_id, kind)
+                )
+
+    def test_cache(self):
+        """Test that results are cached per device until the device's apps change."""
+        first, second = self.devices
+        expected = first.get_app_containers(_BUNDLE_IDS, ["data"])
+        second.get_app_containers(_BUNDLE_IDS, ["data"])
+        self.assertEqual(self.lookups(), 4)
+
+        self.assertEqual(first.get_app_containers(_BUNDLE_IDS, ["data"]), expected)
+        self.assertEqual(self.lookups(), 4)
+
+        first.uninstall("com.example.two")
+        containers = first.get_app_containers(_BUNDLE_IDS, ["data"])
+        self.assertIsNone(containers["com.example.two"]["data"])
+        self.assertEqual(self.lookups(), 6)
+
+        # The other device is unaffected
+        second.get_app_containers(_BUNDLE_IDS, ["data"])
+        self.assertEqual(self.lookups(), 6)
+
+        second.shutdown()
+        second.erase()
+        second.boot()
+        second.get_app_containers(_BUNDLE_IDS, ["data"])
+        self.assertEqual(self.lookups(), 8)
+
+    def test_from_disk(self):
+        """Test reading the containers from the metadata on disk."""
+        with tempfile.TemporaryDirectory() as data_path:
+            containers = os.path.join(data_path, "Containers")
+            expected = {
+                "app": os.path.join(containers, "Bundle", "Application", "A", "One.app"),
+                "data": os.path.join(containers, "Data", "Application", "B"),
+                "group.com.example": os.path.join(containers, "Shared", "AppGroup", "C"),
+            }
+
+            for kind, path in expected.items():
+                identifier = "group.com.example" if kind.startswith("group") else _BUNDLE_IDS[0]
+                container = os.path.dirname(path) if kind == "app" else path
+                os.makedirs(path)
+
+                with open(os.path.join(container, METADATA_FILE_NAME), "wb") as metadata_file:
+                    plistlib.dump({"MCMMetadataIdentifier": identifier}, metadata_file)
+
+            raw_info = copy.deepcopy(self.devices[0].raw_info)
+            raw_info["dataPath"] = data_path
+            device = isim.Device(raw_info, self.devices[0].runtime_id)
+
+            resolved = device.get_app_containers(_BUNDLE_IDS[:1], list(expected), from_disk=True)
+            self.assertEqual(resolved, {_BUNDLE_IDS[0]: expected})
+            self.assertEqual(self.lookups(), 0)
+
+            # Anything not on disk falls back to simctl
+            resolved = device.get_app_containers(_BUNDLE_IDS[1:], ["app"], from_disk=True)
+            self.assertIsNotNone(resolved[_BUNDLE_IDS[1]]["app"])
+            self.assertEqual(self.lookups(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Test resolving the devices in watch pairs."""
+
+import os
+import sys
+import unittest
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestDevicePairs(FakeSimctlTestCase):
+    """Test resolving the devices in watch pairs."""
+
+    pair_ids: List[str]
+
+    def setUp(self):
+        super().setUp()
+
+        iphone = isim.DeviceType.from_name("iPhone 15")
+        apple_watch = isim.DeviceType.from_name("Apple Watch Series 9 (45mm)")
+        ios = isim.Runtime.from_name("iOS 17.0")
+        watchos = isim.Runtime.from_name("watchOS 10.0")
+
+        self.pair_ids = []
+
+        for index in range(3):
+            phone = isim.Device.create(f"Phone {index}", iphone, ios)
+            watch = isim.Device.create(f"Watch {index}", apple_watch, watchos)
+            self.pair_ids.append(phone.pair(watch))
+
+    def list_commands(self) -> int:
+        """Return how many list commands have been run."""
+        return len([command for command in self.fake.commands if command[0] == "list"])
+
+    def test_watch_and_phone(self):
+        """Test that the watch and phone of a pair are the paired devices."""
+        pair = isim.DevicePair.list_all()[0]
+
+        self.assertEqual(pair.watch().udid, pair.watch_udid)
+        self.assertEqual(pair.phone().udid, pair.phone_udid)
+        self.assertTrue(pair.watch().name.startswith("Watch"))
+
+        # The devices are only looked up once
+        before = self.list_commands()
+        pair.watch()
+        pair.phone()
+        self.assertEqual(self.list_commands(), before)
+
+    def test_list_all_resolved(self):
+        """Test that every pair is resolved from a single list."""
+        before = self.list_commands()
+        pairs = isim.DevicePair.list_all_resolved()
+        self.assertEqual(self.list_commands(), before + 1)
+
+        self.assertEqual(sorted(pair.identifier for pair in pairs), sorted(self.pair_ids))
+
+        for pair in pairs:
+            self.assertEqual(pair.watch().udid, pair.watch_udid)
+            self.assertEqual(pair.phone().udid, pair.phone_udid)
+
+        self.assertEqual(self.list_commands(), before + 1)
+
+    def test_not_shared(self):
+        """Test that pairs aren't shared, and that a new snapshot is used when passed."""
+        snapshot = isim.SimctlSnapshot()
+        pair = isim.DevicePair.list_all_resolved(snapshot)[0]
+        self.assertIsNot(pair, isim.DevicePair.list_all(snapshot)[0])
+        self.assertIsNot(pair.watch(), isim.DevicePair.list_all_resolved(snapshot)[0].watch())
+
+        pair.watch().rename("Renamed Watch")
+        self.assertTrue(pair.watch(snapshot).name.startswith("Watch"))
+        self.assertEqual(pair.watch(isim.SimctlSnapshot()).name, "Renamed Watch")
+
+    def test_unavailable_device(self):
+        """Test that pairs are still resolved when one of their devices is unavailable."""
+        pair = isim.DevicePair.list_all()[0]
+
+        for device in self.fake.devices["com.apple.CoreSimulator.SimRuntime.watchOS-10-0"]:
+            if device["udid"] == pair.watch_udid:
+                device["isAvailable"] = False
+                device["availabilityError"] = "runtime profile not found"
+
+        pairs = {pair.identifier: pair for pair in isim.DevicePair.list_all_resolved()}
+        self.assertEqual(len(pairs), 3)
+        self.assertEqual(pairs[pair.identifier].watch().udid, pair.watch_udid)
+        self.assertFalse(pairs[pair.identifier].watch().raw_info["isAvailable"])
+
+        # Unavailable devices are still skipped by ordinary lookups
+        with self.assertRaises(isim.DeviceNotFoundError):
+            _ = isim.Device.from_identifier(pair.watch_udid)
+
+    def test_state(self):
+        """Test parsing whether a pair is active and connected."""
+        pair = isim.DevicePair.list_all()[0]
+        self.assertTrue(pair.is_active)
+        self.assertFalse(pair.is_connected)
+
+        pair.watch().boot()
+        pair.phone().boot()
+
+        pair = isim.DevicePair.list_all()[0]
+        self.assertTrue(pair.is_active)
+        self.assertTrue(pair.is_connected)
+        self.assertEqual(pair.state, "(active, connected)")
+
+        info = dict(pair.raw_info, state="(inactive, disconnected)")
+        pair = isim.DevicePair(pair.identifier, info)
+        self.assertFalse(pair.is_active)
+        self.assertFalse(pair.is_connected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""Test reading devices from a device set on disk."""
+
+import os
+import plistlib
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.device_set import DeviceSetReader
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+# The keys which don't depend on where the device set lives
+_COMPARED_KEYS = ["udid", "name", "state", "isAvailable", "deviceTypeIdentifier"]
+
+
+class TestDeviceSetReader(FakeSimctlTestCase):
+    """Test reading devices from a device set on disk."""
+
+    devices_per_pairing = 2
+
+    path: str
+
+    def setUp(self):
+        super().setUp()
+
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "Devices")
+
+    @staticmethod
+    def comparable(device_info):
+        """Reduce device info to the compared keys, keyed by runtime and UDID."""
+        return {
+            runtime_id: {
+                info["udid"]: {key: info[key] for key in _COMPARED_KEYS} for info in devices
+            }
+            for runtime_id, devices in device_info.items()
+            if devices
+        }
+
+    def test_matches_simctl(self):
+        """Test that the reader returns the same devices as simctl."""
+        device = isim.Device.list_all()["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][0]
+        device.boot()
+        self.fake.write_device_set(self.path)
+
+        reader = DeviceSetReader(self.path, max_workers=4)
+        self.assertEqual(
+            TestDeviceSetReader.comparable(isim.Device.list_all_raw(device_set=reader)),
+            TestDeviceSetReader.comparable(isim.Device.list_all_raw()),
+        )
+
+        devices = isim.Device.list_all(device_set=reader)
+        read_device = [item for item in devices[device.runtime_id] if item == device][0]
+        self.assertEqual(read_device.state, "Booted")
+        self.assertEqual(
+            read_device.raw_info["dataPath"], os.path.join(self.path, device.udid, "data")
+        )
+
+    def test_no_commands(self):
+        """Test that reading the device set doesn't run simctl."""
+        self.fake.write_device_set(self.path)
+        isim.Device.list_all(device_set=DeviceSetReader(self.path))
+        self.assertEqual(self.fake.commands, [])
+
+    def test_skips_deleted_and_stray_entries(self):
+        """Test that deleted devices and directories without a device are ignored."""
+        self.fake.write_device_set(self.path)
+        udid = self.fake.devices["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][0]["udid"]
+        plist_path = os.path.join(self.path, udid, "device.plist")
+
+        with open(plist_path, "rb") as plist_file:
+            device_plist = plistlib.load(plist_file)
+
+        device_plist["isDeleted"] = True
+
+        with open(plist_path, "wb") as plist_file:
+            plistlib.dump(device_plist, plist_file)
+
+        os.mkdir(os.path.join(self.path, "Stray"))
+
+        devices = DeviceSetReader(self.path).list_all_raw()
+        udids = {info["udid"] for infos in devices.values() for info in infos}
+        self.assertNotIn(udid, udids)
+        self.assertEqual(len(udids), sum(len(infos) for infos in self.fake.devices.values()) - 1)
+
+    def test_available_runtimes(self):
+        """Test that devices on missing runtimes are marked as unavailable."""
+        self.fake.write_device_set(self.path)
+        reader = DeviceSetReader(
+            self.path, available_runtimes={"com.apple.CoreSimulator.SimRuntime.iOS-17-0"}
+        )
+
+        for runtime_id, devices in reader.list_all_raw().items():
+            available = runtime_id == "com.apple.CoreSimulator.SimRuntime.iOS-17-0"
+            self.assertTrue(all(info["isAvailable"] == available for info in devices))
+
+    def test_not_a_device_set(self):
+        """Test that a directory without device_set.plist is rejected."""
+        os.makedirs(self.path)
+
+        with self.assertRaises(FileNotFoundError):
+            DeviceSetReader(self.path).list_all_raw()
+
+
+if __name__ == "__main__":
+    unittest.main()
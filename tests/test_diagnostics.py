@@ -0,0 +1,122 @@
+"""Test collecting diagnostics from many devices."""
+
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import unittest
+from typing import List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.diagnostics import (
+    DiagnoseProgress,
+    DiagnosticsTooLargeError,
+    MANIFEST_FILE_NAME,
+    collect_diagnostics,
+)
+from isim.fake_simctl import FakeSimctl
+
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class HangingDiagnoseSimctl(FakeSimctl):
+    """A fake simctl where diagnose hangs for one device until it times out."""
+
+    hanging_udid: Optional[str] = None
+
+    def run(self, args: List[str], timeout: Optional[float] = None) -> str:
+        if args[0] == "diagnose" and f"--udid={self.hanging_udid}" in args:
+            threading.Event().wait(timeout)
+            raise subprocess.TimeoutExpired(["xcrun", "simctl"] + args, timeout or 0)
+        return super().run(args, timeout)
+
+
+class TestCollectDiagnostics(FakeSimctlTestCase):
+    """Test collecting diagnostics from many devices."""
+
+    devices_per_pairing = 1
+
+    fake: HangingDiagnoseSimctl
+    output_path: str
+    devices: List[isim.Device]
+
+    def setUp(self):
+        super().setUp()
+        self.fake = self.use_fake(HangingDiagnoseSimctl())
+
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.output_path = os.path.join(temp_dir.name, "diagnostics")
+        self.devices = isim.Device.list_all()["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][:3]
+
+    def test_collect(self):
+        """Test that each device gets a log, an archive and a manifest entry."""
+        updates: List[DiagnoseProgress] = []
+        manifest = collect_diagnostics(self.devices, self.output_path, progress=updates.append)
+
+        self.assertEqual(list(manifest.entries), [device.udid for device in self.devices])
+        self.assertEqual(manifest.failed, [])
+        self.assertEqual(len(manifest.archives), 3)
+        self.assertEqual({update.udid for update in updates}, {d.udid for d in self.devices})
+
+        for device in self.devices:
+            entry = manifest.entries[device.udid]
+            self.assertTrue(tarfile.is_tarfile(entry.archive_path))
+            self.assertEqual(entry.size, os.path.getsize(entry.archive_path))
+
+            with open(entry.log_path, "r", encoding="utf-8") as log_file:
+                self.assertIn(device.udid, log_file.read())
+
+        with open(
+            os.path.join(self.output_path, MANIFEST_FILE_NAME), "r", encoding="utf-8"
+        ) as manifest_file:
+            self.assertEqual(json.load(manifest_file), manifest.to_dict())
+
+    def test_no_archive(self):
+        """Test that diagnostics can be left as directories."""
+        manifest = collect_diagnostics(self.devices[:1], self.output_path, archive=False)
+        entry = manifest.entries[self.devices[0].udid]
+        self.assertTrue(os.path.isdir(entry.archive_path))
+
+    def test_size_budget(self):
+        """Test that devices over the size budget fail and their diagnostics are removed."""
+        manifest = collect_diagnostics(self.devices, self.output_path, max_size=10)
+
+        self.assertEqual(len(manifest.failed), 3)
+        self.assertEqual(manifest.archives, [])
+
+        for entry in manifest.failed:
+            self.assertIsInstance(entry.error, DiagnosticsTooLargeError)
+            self.assertFalse(os.path.exists(os.path.join(self.output_path, entry.udid + ".tar.gz")))
+
+    def test_timeout_budget(self):
+        """Test that a device running out of time doesn't hold up the others."""
+        self.fake.hanging_udid = self.devices[1].udid
+        manifest = collect_diagnostics(self.devices, self.output_path, timeout=0.5)
+
+        self.assertEqual([entry.udid for entry in manifest.failed], [self.devices[1].udid])
+        self.assertIsInstance(manifest.failed[0].error, subprocess.TimeoutExpired)
+        self.assertEqual(len(manifest.archives), 2)
+
+        # diagnose is given at least a second, rather than none
+        diagnose_commands = [command for command in self.fake.commands if command[0] == "diagnose"]
+        self.assertTrue(diagnose_commands)
+        self.assertTrue(all("--timeout=1" in command for command in diagnose_commands))
+
+    def test_existing_output(self):
+        """Test that existing output isn't overwritten."""
+        os.makedirs(self.output_path)
+
+        with self.assertRaises(FileExistsError):
+            collect_diagnostics(self.devices, self.output_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""Test the on-disk list cache."""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim import disk_cache
+from isim.aio import AsyncDevice
+from isim.base_types import invalidate_list_cache
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestDiskCache(FakeSimctlTestCase):
+    """Test the on-disk list cache."""
+
+    devices_per_pairing = 1
+
+    cache_path: str
+    device_set_path: str
+
+    def setUp(self):
+        super().setUp()
+
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_path = os.path.join(temp_dir.name, "cache", "simctl_list.json")
+        self.device_set_path = os.path.join(temp_dir.name, "Devices")
+        os.mkdir(self.device_set_path)
+        self.touch("device_set.plist")
+
+        for devices in self.fake.devices.values():
+            for device in devices:
+                os.mkdir(os.path.join(self.device_set_path, device["udid"]))
+                self.touch(device["udid"], "device.plist")
+
+        disk_cache.enable(self.cache_path, self.device_set_path)
+        self.addCleanup(disk_cache.disable)
+
+    def touch(self, *components: str) -> None:
+        """Create or update a file in the device set, moving its modification time on."""
+        path = os.path.join(self.device_set_path, *components)
+
+        with open(path, "a", encoding="utf-8"):
+            pass
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def list_commands(self) -> int:
+        """Return how many list commands have been run."""
+        return len([command for command in self.fake.commands if command[0] == "list"])
+
+    def new_process(self) -> None:
+        """Simulate a new process starting by dropping the in-memory state."""
+        disk_cache.enable(self.cache_path, self.device_set_path)
+
+    def test_reused_across_processes(self):
+        """Test that a later process resolves lookups without running simctl."""
+        runtime = isim.Runtime.from_id("com.apple.CoreSimulator.SimRuntime.iOS-17-0")
+        self.assertEqual(self.list_commands(), 1)
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        self.new_process()
+        self.assertEqual(isim.Runtime.from_id(runtime.identifier), runtime)
+        self.assertIsNotNone(isim.Device.from_name("iPhone 15 (0)", runtime))
+        self.assertEqual(self.list_commands(), 1)
+
+    def test_async_api(self):
+        """Test that the async API shares the disk cache with the sync one."""
+        isim.Runtime.list_all()
+        self.assertEqual(self.list_commands(), 1)
+
+        self.new_process()
+        devices = asyncio.run(AsyncDevice.list_all())
+        self.assertEqual(self.list_commands(), 1)
+        self.assertEqual(
+            {device.udid for runtime_devices in devices.values() for device in runtime_devices},
+            {
+                device.udid
+                for runtime_devices in isim.Device.list_all().values()
+                for device in runtime_devices
+            },
+        )
+
+        self.new_process()
+        self.touch("device_set.plist")
+        asyncio.run(AsyncDevice.list_all())
+        self.assertEqual(self.list_commands(), 2)
+
+        # The fresh output was saved for the next process
+        self.new_process()
+        isim.Runtime.list_all()
+        self.assertEqual(self.list_commands(), 2)
+
+    def test_invalidated_by_device_changes(self):
+        """Test that changes to the device set files invalidate the cache."""
+        device = isim.Device.list_all()["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][0]
+        self.assertEqual(self.list_commands(), 1)
+
+        self.new_process()
+        self.touch(device.udid, "device.plist")
+        isim.Device.list_all()
+        self.assertEqual(self.list_commands(), 2)
+
+        self.new_process()
+        os.mkdir(os.path.join(self.device_set_path, "NEW-DEVICE"))
+        isim.Device.list_all()
+        self.assertEqual(self.list_commands(), 3)
+
+        self.new_process()
+        self.touch("device_set.plist")
+        isim.Device.list_all()
+        self.assertEqual(self.list_commands(), 4)
+
+    def test_invalidated_by_commands(self):
+        """Test that commands which change the devices delete the cache."""
+        isim.Device.list_all()
+        self.assertTrue(os.path.exists(self.cache_path))
+        invalidate_list_cache()
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_corrupt_cache(self):
+        """Test that an unreadable cache file is ignored."""
+        os.makedirs(os.path.dirname(self.cache_path))
+
+        with open(self.cache_path, "w", encoding="utf-8") as cache_file:
+            cache_file.write("{not json")
+
+        self.assertEqual(len(isim.Runtime.list_all()), 4)
+        self.assertEqual(self.list_commands(), 1)
+
+        self.new_process()
+        self.assertEqual(len(isim.Runtime.list_all()), 4)
+        self.assertEqual(self.list_commands(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""Test isim against the fake simctl executor."""
+
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.executor import get_executor, use_executor
+from isim.fake_simctl import FakeSimctl
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestFakeSimctl(FakeSimctlTestCase):
+    """Test the device lifecycle using the fake simctl."""
+
+    def test_executor_restored(self):
+        """Test that the previous executor is restored after use."""
+        previous = get_executor()
+        with use_executor(FakeSimctl()):
+            self.assertIsNot(get_executor(), previous)
+        self.assertIs(get_executor(), previous)
+
+    def test_lifecycle(self):
+        """Test creating, booting, shutting down and deleting a device."""
+        runtime = isim.Runtime.from_name("iOS 17.0")
+        device_type = isim.DeviceType.from_name("iPhone 15")
+
+        device = isim.Device.create("Test Device", device_type, runtime)
+        self.assertEqual(device.name, "Test Device")
+        self.assertEqual(device.state, "Shutdown")
+        self.assertEqual(device.runtime(), runtime)
+        self.assertEqual(device.device_type(), device_type)
+
+        device.boot()
+        device.refresh_state()
+        self.assertEqual(device.state, "Booted")
+
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            device.boot()
+        self.assertEqual(context.exception.returncode, 149)
+
+        device.rename("Renamed Device")
+        device.shutdown()
+        device.refresh_state()
+        self.assertEqual(device.state, "Shutdown")
+        self.assertEqual(device.name, "Renamed Device")
+
+        clone_udid = device.clone("Cloned Device")
+        clone = isim.Device.from_identifier(clone_udid)
+        self.assertEqual(clone.runtime_id, runtime.identifier)
+
+        device.delete()
+        with self.assertRaises(isim.DeviceNotFoundError):
+            _ = isim.Device.from_identifier(device.udid)
+
+    def test_incompatible(self):
+        """Test that incompatible device types and runtimes are rejected."""
+        runtime = isim.Runtime.from_name("watchOS 10.0")
+        device_type = isim.DeviceType.from_name("iPhone 15")
+
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            _ = isim.Device.create("Test Device", device_type, runtime)
+
+        self.assertEqual(
+            context.exception.returncode, isim.base_types.ErrorCodes.INCOMPATIBLE_DEVICE.value
+        )
+
+    def test_upgrade(self):
+        """Test that upgrading moves a device to the new runtime."""
+        old_runtime = isim.Runtime.from_name("iOS 16.4")
+        new_runtime = isim.Runtime.from_name("iOS 17.0")
+        device_type = isim.DeviceType.from_name("iPhone 14")
+
+        device = isim.Device.create("Upgrade Device", device_type, old_runtime)
+        device.upgrade(new_runtime)
+        self.assertEqual(device.runtime(), new_runtime)
+
+        device = isim.Device.from_identifier(device.udid)
+        self.assertEqual(device.runtime_id, new_runtime.identifier)
+
+    def test_pairs(self):
+        """Test pairing and unpairing a watch and phone."""
+        phone = isim.Device.create(
+            "Phone", isim.DeviceType.from_name("iPhone 15"), isim.Runtime.from_name("iOS 17.0")
+        )
+        watch = isim.Device.create(
+            "Watch",
+            isim.DeviceType.from_name("Apple Watch Series 9 (45mm)"),
+            isim.Runtime.from_name("watchOS 10.0"),
+        )
+
+        pair_id = phone.pair(watch)
+        pairs = isim.DevicePair.list_all()
+        self.assertEqual([pair.identifier for pair in pairs], [pair_id])
+        self.assertEqual(pairs[0].watch_udid, watch.udid)
+        self.assertEqual(pairs[0].phone_udid, phone.udid)
+
+        pairs[0].unpair()
+        self.assertEqual(isim.DevicePair.list_all(), [])
+
+    def test_apps(self):
+        """Test installing and launching apps."""
+        device = isim.Device.create(
+            "Phone", isim.DeviceType.from_name("iPhone 15"), isim.Runtime.from_name("iOS 17.0")
+        )
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            device.install("/Apps/io.myers.testapp.app")
+
+        device.boot()
+        device.install("/Apps/io.myers.testapp.app")
+        self.assertTrue(device.launch("io.myers.testapp").startswith("io.myers.testapp: "))
+        self.assertTrue(device.get_app_container("io.myers.testapp").endswith(".app"))
+
+        device.uninstall("io.myers.testapp")
+        with self.assertRaises(subprocess.CalledProcessError):
+            device.launch("io.myers.testapp")
+
+    def test_large_inventory(self):
+        """Test that large inventories can be listed and searched."""
+        fake = FakeSimctl.with_default_inventory(devices_per_pairing=100)
+
+        with use_executor(fake):
+            devices = isim.Device.list_all()
+            self.assertEqual(
+                sum(len(runtime_devices) for runtime_devices in devices.values()), 1000
+            )
+            self.assertIsNotNone(
+                isim.Device.from_name("iPhone 15 (42)", isim.Runtime.from_name("iOS 16.4"))
+            )
@@ -0,0 +1,91 @@
+"""Test scanning the MobileInstallation logs."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+from isim import install_logs
+
+# pylint: enable=wrong-import-position
+
+
+def log_line(app_identifier, container):
+    """Create a log line recording a new data container."""
+    return (
+        "Mon Oct 16 10:00:00 2023 [1234] <notice> (0x16b) -[MIContainer makeContainerLiveReplacing"
+        f"ExistingContainer:reason:withError:]: Data container for {app_identifier} is now at "
+        f"{container}\n"
+    )
+
+
+class TestInstallLogs(unittest.TestCase):
+    """Test the reverse scanning install log index."""
+
+    def setUp(self):
+        install_logs.clear_cache()
+        handle, self.log_path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.log_path)
+
+    def write_log(self, lines):
+        """Write lines to the log, padding them with noise."""
+        with open(self.log_path, "w", encoding="utf-8") as log_file:
+            for index, line in enumerate(lines):
+                log_file.write(f"Unrelated line {index} " + "x" * (index % 50) + "\n")
+                log_file.write(line)
+
+    def test_latest_match(self):
+        """Test that the latest container for the app is returned, across chunk boundaries."""
+        lines = [log_line(f"io.myers.app{index % 5}", f"/data/{index}") for index in range(200)]
+        self.write_log(lines)
+
+        for chunk_size in [7, 64, 1000, 1000000]:
+            index = install_logs.InstallLogIndex(self.log_path, chunk_size=chunk_size)
+            self.assertEqual(index.find("io.myers.app2"), "/data/197")
+            self.assertEqual(index.find("io.myers.app0"), "/data/195")
+            self.assertIsNone(index.find("io.myers.missing"))
+            self.assertEqual(index.find("io.myers.app4"), "/data/199")
+
+    def test_resumes(self):
+        """Test that lookups for other apps carry on from where the last scan stopped."""
+        self.write_log(
+            [
+                log_line("io.myers.old", "/data/old"),
+                log_line("io.myers.testapp", "/data/first"),
+                log_line("io.myers.other", "/data/other"),
+                log_line("io.myers.testapp", "/data/second"),
+            ]
+        )
+
+        index = install_logs.InstallLogIndex(self.log_path, chunk_size=16)
+        self.assertEqual(index.find("io.myers.testapp"), "/data/second")
+        self.assertNotIn("io.myers.other", index.containers)
+        self.assertEqual(index.find("io.myers.old"), "/data/old")
+        self.assertEqual(index.containers["io.myers.other"], "/data/other")
+        self.assertEqual(index.find("io.myers.testapp"), "/data/second")
+
+    def test_no_trailing_newline(self):
+        """Test that the last line is found even without a new line at the end."""
+        with open(self.log_path, "w", encoding="utf-8") as log_file:
+            log_file.write(log_line("io.myers.testapp", "/data/latest").rstrip("\n"))
+
+        self.assertEqual(
+            install_logs.find_data_container(self.log_path, "io.myers.testapp"), "/data/latest"
+        )
+
+    def test_cache_invalidated(self):
+        """Test that the cached index is replaced when the log changes."""
+        self.write_log([log_line("io.myers.testapp", "/data/first")])
+        self.assertEqual(
+            install_logs.find_data_container(self.log_path, "io.myers.testapp"), "/data/first"
+        )
+
+        with open(self.log_path, "a", encoding="utf-8") as log_file:
+            log_file.write(log_line("io.myers.testapp", "/data/second"))
+
+        self.assertEqual(
+            install_logs.find_data_container(self.log_path, "io.myers.testapp"), "/data/second"
+        )
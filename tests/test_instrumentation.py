@@ -0,0 +1,114 @@
+"""Test command instrumentation."""
+
+import logging
+import os
+import subprocess
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim import instrumentation
+
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestInstrumentation(FakeSimctlTestCase):
+    """Test the hooks and statistics for simctl commands."""
+
+    devices_per_pairing = 1
+
+    records: list
+
+    def setUp(self):
+        super().setUp()
+        instrumentation.STATS.reset()
+        self.records = []
+        instrumentation.add_hook(self.records.append)
+        self.addCleanup(instrumentation.remove_hook, self.records.append)
+
+    def test_records(self):
+        """Test that each command is reported with its details."""
+        device = isim.Device.from_name("iPhone 15 (0)", isim.Runtime.from_name("iOS 17.0"))
+        assert device is not None
+        device.boot()
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            device.boot()
+
+        self.assertEqual(
+            [record.subcommand for record in self.records], ["list", "list", "boot", "boot"]
+        )
+        self.assertGreater(self.records[0].output_size, 0)
+        self.assertEqual(self.records[2].args, ["boot", device.udid])
+        self.assertEqual(self.records[2].exit_code, 0)
+        self.assertEqual(self.records[3].exit_code, 149)
+        self.assertIsInstance(self.records[3].error, subprocess.CalledProcessError)
+
+    def test_cached_lists(self):
+        """Test that list lookups served from the cache are reported as such."""
+        isim.base_types.set_list_cache_ttl(60)
+        self.addCleanup(isim.base_types.set_list_cache_ttl, 0)
+
+        _ = isim.Runtime.list_all()
+        _ = isim.Runtime.list_all()
+
+        self.assertEqual([record.cached for record in self.records], [False, True])
+        self.assertEqual(instrumentation.STATS.summary()["list"]["count"], 1)
+
+    def test_stats(self):
+        """Test that the statistics are aggregated per subcommand."""
+        for _ in range(3):
+            _ = isim.Runtime.list_all()
+
+        device = isim.Device.from_name("iPhone 15 (0)", isim.Runtime.from_name("iOS 17.0"))
+        assert device is not None
+        device.boot()
+
+        summary = instrumentation.STATS.summary()
+        self.assertEqual(summary["list"]["count"], 5)
+        self.assertEqual(summary["boot"]["count"], 1)
+        self.assertEqual(summary["boot"]["errors"], 0)
+        self.assertLessEqual(summary["list"]["p50"], summary["list"]["p95"])
+        self.assertLessEqual(summary["list"]["p95"], summary["list"]["max"])
+
+    def test_logging_hook(self):
+        """Test that the logging hook logs each command."""
+        hook = instrumentation.LoggingHook(level=logging.INFO)
+        instrumentation.add_hook(hook)
+        self.addCleanup(instrumentation.remove_hook, hook)
+
+        with self.assertLogs("isim", level=logging.INFO) as logs:
+            _ = isim.Runtime.list_all()
+
+        self.assertIn("simctl list runtimes --json", logs.output[0])
+
+    def test_span_hook(self):
+        """Test that the span hook reports spans to a tracer."""
+        tracer = mock.Mock()
+        hook = instrumentation.SpanHook(tracer)
+        instrumentation.add_hook(hook)
+        self.addCleanup(instrumentation.remove_hook, hook)
+
+        _ = isim.Runtime.list_all()
+
+        name = tracer.start_span.call_args.args[0]
+        attributes = tracer.start_span.call_args.kwargs["attributes"]
+        self.assertEqual(name, "simctl list")
+        self.assertEqual(attributes["simctl.exit_code"], 0)
+        tracer.start_span.return_value.end.assert_called_once()
+
+    def test_failing_hook(self):
+        """Test that a broken hook doesn't break commands."""
+
+        def broken_hook(_):
+            raise ValueError("Broken")
+
+        instrumentation.add_hook(broken_hook)
+        self.addCleanup(instrumentation.remove_hook, broken_hook)
+
+        with self.assertLogs("isim", level=logging.ERROR):
+            self.assertEqual(len(isim.Runtime.list_all()), 4)
@@ -0,0 +1,75 @@
+"""Test comparing device inventories."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.inventory import diff_devices
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestInventory(FakeSimctlTestCase):
+    """Test the inventory diff."""
+
+    devices_per_pairing = 1
+
+    def test_identity_and_content(self):
+        """Test the difference between the same identity and the same content."""
+        runtime = isim.Runtime.from_name("iOS 17.0")
+        device = isim.Device.from_name("iPhone 15 (0)", runtime)
+        assert device is not None
+        device.boot()
+        booted = isim.Device.from_identifier(device.udid)
+
+        self.assertTrue(device.same_identity(booted))
+        self.assertFalse(device.same_content(booted))
+        self.assertTrue(booted.same_content(isim.Device.from_identifier(device.udid)))
+        self.assertFalse(device.same_identity(runtime))
+
+        lookup = {device: "value"}
+        self.assertEqual(lookup[booted], "value")
+
+    def test_diff(self):
+        """Test diffing two inventories."""
+        before = isim.Device.list_all()
+        self.assertFalse(diff_devices(before, before))
+
+        runtime = isim.Runtime.from_name("iOS 17.0")
+        device_type = isim.DeviceType.from_name("iPhone 15")
+        booted = isim.Device.from_name("iPhone 15 (0)", runtime)
+        renamed = isim.Device.from_name("iPhone 14 (0)", runtime)
+        deleted = isim.Device.from_name("iPhone 15 Pro (0)", runtime)
+        assert booted is not None and renamed is not None and deleted is not None
+
+        booted.boot()
+        renamed.rename("Renamed")
+        deleted.delete()
+        created = isim.Device.create("New", device_type, runtime)
+
+        diff = diff_devices(before, isim.Device.list_all())
+
+        self.assertEqual(diff.added, [created])
+        self.assertEqual(diff.removed, [deleted])
+        self.assertEqual({new for _, new in diff.changed}, {booted, renamed})
+        self.assertEqual([new.state for _, new in diff.state_changed], ["Booted"])
+        self.assertEqual(
+            [(old.name, new.name) for old, new in diff.renamed], [("iPhone 14 (0)", "Renamed")]
+        )
+        self.assertEqual(str(diff), "1 added, 1 removed, 2 changed")
+
+    def test_diff_flat(self):
+        """Test diffing plain lists of devices."""
+        devices = [device for devices in isim.Device.list_all().values() for device in devices]
+        diff = diff_devices(devices[:-1], devices[1:])
+        self.assertEqual(diff.added, [devices[-1]])
+        self.assertEqual(diff.removed, [devices[0]])
+        self.assertEqual(diff.changed, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Test the simctl list cache."""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.base_types import SimulatorControlBase, SimulatorControlType
+
+# pylint: enable=wrong-import-position
+
+FAKE_RUNTIMES = {
+    "runtimes": [
+        {
+            "buildversion": "ABC123",
+            "bundlePath": "\\/Library\\/Developer\\/CoreSimulator\\/Profiles\\/Runtimes\\/iOS.simruntime",
+            "identifier": "io.myers.isim.runtime.iOS-99",
+            "isAvailable": True,
+            "name": "iOS 99.0",
+            "version": "99.0",
+        }
+    ]
+}
+
+
+def fake_run(*args, **_):
+    """Pretend to be `xcrun simctl`."""
+    if "list" in args[0]:
+        output = json.dumps(FAKE_RUNTIMES)
+    else:
+        output = ""
+    return subprocess.CompletedProcess(args[0], 0, stdout=output)
+
+
+class TestListCache(unittest.TestCase):
+    """Test the process wide simctl list cache."""
+
+    def tearDown(self):
+        isim.base_types.set_list_cache_ttl(0)
+
+    def test_disabled_by_default(self):
+        """Test that every lookup runs simctl when the cache is disabled."""
+        with mock.patch("subprocess.run", side_effect=fake_run) as run:
+            _ = isim.Runtime.list_all()
+            _ = isim.Runtime.list_all()
+            self.assertEqual(run.call_count, 2)
+
+    def test_cached(self):
+        """Test that lookups within the TTL reuse the previous output."""
+        isim.base_types.set_list_cache_ttl(60)
+        with mock.patch("subprocess.run", side_effect=fake_run) as run:
+            _ = isim.Runtime.list_all()
+            _ = isim.Runtime.from_id("io.myers.isim.runtime.iOS-99")
+            _ = isim.Runtime.from_name("iOS 99.0")
+            self.assertEqual(run.call_count, 1)
+
+    def test_expiry(self):
+        """Test that output is refreshed once the TTL has passed."""
+        isim.base_types.set_list_cache_ttl(60)
+        with mock.patch("subprocess.run", side_effect=fake_run) as run:
+            with mock.patch("time.monotonic", return_value=1000.0):
+                _ = isim.Runtime.list_all()
+            with mock.patch("time.monotonic", return_value=1061.0):
+                _ = isim.Runtime.list_all()
+            self.assertEqual(run.call_count, 2)
+
+    def test_invalidated_by_mutation(self):
+        """Test that commands which change the simulators invalidate the cache."""
+        isim.base_types.set_list_cache_ttl(60)
+        with mock.patch("subprocess.run", side_effect=fake_run) as run:
+            _ = isim.Runtime.list_all()
+            SimulatorControlBase.run_command("getenv booted HOME")
+            _ = isim.Runtime.list_all()
+            # Read only commands don't invalidate anything
+            self.assertEqual(run.call_count, 2)
+
+            SimulatorControlBase.run_command("delete unavailable")
+            _ = isim.Runtime.list_all()
+            self.assertEqual(run.call_count, 4)
+
+    def test_full_list_serves_types(self):
+        """Test that a cached full list is used for individual list types."""
+        isim.base_types.set_list_cache_ttl(60)
+        with mock.patch("subprocess.run", side_effect=fake_run) as run:
+            _ = SimulatorControlBase.list_all_types()
+            _ = SimulatorControlBase.list_type(SimulatorControlType.RUNTIME)
+            self.assertEqual(run.call_count, 1)
+
+    def test_indexes(self):
+        """Test that indexes are only kept while their output is in the cache."""
+        with mock.patch("subprocess.run", side_effect=fake_run):
+            self.assertIsNot(isim.Runtime.index(), isim.Runtime.index())
+
+            isim.base_types.set_list_cache_ttl(60)
+            self.assertIs(isim.Runtime.index(), isim.Runtime.index())
+
+            index = isim.Runtime.index()
+            isim.base_types.invalidate_list_cache()
+            self.assertIsNot(isim.Runtime.index(), index)
+
+    def test_negative_ttl(self):
+        """Test that a negative TTL is rejected."""
+        with self.assertRaises(ValueError):
+            isim.base_types.set_list_cache_ttl(-1)
@@ -0,0 +1,166 @@
+"""Test the device pool."""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.pool import DevicePool, PoolExhaustedError, RecyclePolicy
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestDevicePool(FakeSimctlTestCase):
+    """Test leasing devices from a pool."""
+
+    runtime: isim.Runtime
+    device_type: isim.DeviceType
+
+    def setUp(self):
+        super().setUp()
+        self.runtime = isim.Runtime.from_name("iOS 17.0")
+        self.device_type = isim.DeviceType.from_name("iPhone 15")
+
+    def pool(self, **kwargs) -> DevicePool:
+        """Create a pool which is closed at the end of the test."""
+        kwargs.setdefault("retry_delay", 0.01)
+        pool = DevicePool(**kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def udids(self):
+        """Return the UDIDs of the devices the fake has."""
+        return {device["udid"] for devices in self.fake.devices.values() for device in devices}
+
+    def subcommands(self):
+        """Return the subcommands the fake has run."""
+        return [command[0] for command in self.fake.commands]
+
+    def test_warm_devices(self):
+        """Test that prepared pairs get booted devices ahead of time."""
+        pool = self.pool(warm_count=2)
+        pool.prepare(self.device_type, self.runtime)
+
+        self.assertTrue(pool.wait_until_warm(timeout=5))
+        self.assertEqual(pool.booted_count, 2)
+
+        devices = isim.Device.list_all()[self.runtime.identifier]
+        self.assertEqual(len(devices), 2)
+        self.assertTrue(all(device.state == "Booted" for device in devices))
+        self.assertTrue(all(device.name.startswith("isim pool") for device in devices))
+
+    def test_lease_recycles(self):
+        """Test that a returned device is erased and reused."""
+        pool = self.pool(warm_count=0)
+
+        with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+            first_udid = device.udid
+            self.assertEqual(device.state, "Booted")
+
+        self.assertTrue(pool.wait_until_warm(timeout=5))
+        self.assertIn("erase", self.subcommands())
+
+        with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+            self.assertEqual(device.udid, first_udid)
+
+    def test_lease_replaces(self):
+        """Test that the replace policy deletes returned devices."""
+        pool = self.pool(warm_count=1, recycle=RecyclePolicy.REPLACE)
+
+        with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+            first_udid = device.udid
+
+        self.assertTrue(pool.wait_until_warm(timeout=5))
+
+        with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+            self.assertNotEqual(device.udid, first_udid)
+
+        self.assertNotIn(first_udid, self.udids())
+
+    def test_failed_lease_replaces(self):
+        """Test that a device is replaced if the lease body raised."""
+        pool = self.pool(warm_count=1)
+
+        with self.assertRaises(RuntimeError):
+            with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+                first_udid = device.udid
+                raise RuntimeError()
+
+        self.assertTrue(pool.wait_until_warm(timeout=5))
+        self.assertNotIn(first_udid, self.udids())
+
+    def test_max_booted(self):
+        """Test that leases wait for a device when the pool is full."""
+        pool = self.pool(warm_count=0, max_booted=1)
+        released = threading.Event()
+        leased = []
+
+        def lease_second():
+            with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+                leased.append(device.udid)
+
+        with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+            with self.assertRaises(PoolExhaustedError):
+                with pool.lease(self.device_type, self.runtime, timeout=0.1):
+                    pass
+
+            thread = threading.Thread(target=lease_second)
+            thread.start()
+            self.assertFalse(released.wait(0.1))
+            self.assertEqual(leased, [])
+            self.assertEqual(pool.booted_count, 1)
+
+        thread.join(5)
+        self.assertEqual(leased, [device.udid])
+
+    def test_max_booted_evicts_idle(self):
+        """Test that idle devices for other pairs make room for waiting callers."""
+        other_runtime = isim.Runtime.from_name("iOS 16.4")
+        pool = self.pool(warm_count=1, max_booted=1)
+        pool.prepare(self.device_type, other_runtime)
+        self.assertTrue(pool.wait_until_warm(timeout=5))
+
+        with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+            self.assertEqual(device.runtime_id, self.runtime.identifier)
+
+    def test_max_booted_counts_other_devices(self):
+        """Test that devices booted outside the pool count towards the limit."""
+        other = isim.Device.create("Someone Else's", self.device_type, self.runtime)
+        other.boot()
+        pool = self.pool(warm_count=1, max_booted=1, poll_interval=0.05)
+        pool.prepare(self.device_type, self.runtime)
+
+        self.assertTrue(pool.wait_until_warm(timeout=5))
+        self.assertEqual(pool.booted_count, 0)
+
+        with self.assertRaises(PoolExhaustedError):
+            with pool.lease(self.device_type, self.runtime, timeout=0.2):
+                pass
+
+        other.shutdown()
+
+        with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+            self.assertNotEqual(device.udid, other.udid)
+
+    def test_close(self):
+        """Test that closing the pool deletes its devices."""
+        pool = DevicePool(warm_count=2)
+        pool.prepare(self.device_type, self.runtime)
+        self.assertTrue(pool.wait_until_warm(timeout=5))
+
+        with pool.lease(self.device_type, self.runtime, timeout=5) as device:
+            pool.close()
+            self.assertIn(device.udid, self.udids())
+
+        self.assertEqual(self.udids(), set())
+
+        with self.assertRaises(ValueError):
+            pool.prepare(self.device_type, self.runtime)
+
+
+if __name__ == "__main__":
+    unittest.main()
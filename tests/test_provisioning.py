@@ -0,0 +1,129 @@
+"""Test provisioning devices from a golden image."""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.provisioning import GoldenImage, ProvisioningSpec
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestProvisioning(FakeSimctlTestCase):
+    """Test building golden devices and cloning them."""
+
+    app_path: str
+
+    def setUp(self):
+        super().setUp()
+
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.app_path = os.path.join(temp_dir.name, "com.example.App.app")
+        os.mkdir(self.app_path)
+
+        with open(os.path.join(self.app_path, "App"), "w", encoding="utf-8") as app_file:
+            app_file.write("binary")
+
+    def spec(self, **kwargs) -> ProvisioningSpec:
+        """Create a spec for an iPhone with the test app."""
+        kwargs.setdefault("apps", [self.app_path])
+        return ProvisioningSpec("UI Tests", "iPhone 15", "iOS 17.0", **kwargs)
+
+    def device_names(self):
+        """Return the names of every device."""
+        return sorted(
+            device.name for devices in isim.Device.list_all().values() for device in devices
+        )
+
+    def creates(self):
+        """Return how many devices have been created."""
+        return len([command for command in self.fake.commands if command[0] == "create"])
+
+    def test_fingerprint(self):
+        """Test that the fingerprint changes with the spec and its files."""
+        fingerprint = self.spec().fingerprint()
+        self.assertEqual(self.spec().fingerprint(), fingerprint)
+        self.assertNotEqual(self.spec(urls=["https://example.com"]).fingerprint(), fingerprint)
+        self.assertEqual(self.spec(env={"KEY": "value"}).fingerprint(), fingerprint)
+
+        with open(os.path.join(self.app_path, "App"), "w", encoding="utf-8") as app_file:
+            app_file.write("a new binary")
+
+        self.assertNotEqual(self.spec().fingerprint(), fingerprint)
+
+    def test_dict_round_trip(self):
+        """Test converting specs to and from dictionaries."""
+        spec = self.spec(media=["/photo.jpg"], env={"KEY": "value"})
+        self.assertEqual(ProvisioningSpec.from_dict(spec.to_dict()).to_dict(), spec.to_dict())
+
+    def test_golden_built_once(self):
+        """Test that the golden device is only built when the spec changes."""
+        golden = GoldenImage(self.spec())
+        self.assertIsNone(golden.device())
+
+        device = golden.ensure()
+        self.assertEqual(device.state, "Shutdown")
+        self.assertIn("com.example.App", self.fake.apps[device.udid])
+        self.assertEqual(golden.ensure().udid, device.udid)
+        self.assertEqual(self.creates(), 1)
+
+        changed = GoldenImage(self.spec(urls=["https://example.com"]))
+        changed_device = changed.ensure()
+        self.assertNotEqual(changed_device.udid, device.udid)
+        self.assertEqual(self.device_names(), [changed_device.name])
+
+    def test_failed_build(self):
+        """Test that a failed build leaves nothing behind."""
+        golden = GoldenImage(self.spec(urls=["https://example.com"]))
+        run = self.fake.run
+
+        def fail_openurl(args, timeout=None):
+            if args[0] == "openurl":
+                raise subprocess.CalledProcessError(1, ["xcrun", "simctl"] + args)
+            return run(args, timeout)
+
+        with mock.patch.object(self.fake, "run", side_effect=fail_openurl):
+            with self.assertRaises(subprocess.CalledProcessError):
+                golden.ensure()
+
+        self.assertEqual(self.device_names(), [])
+
+    def test_clone(self):
+        """Test cloning the golden device in parallel."""
+        golden = GoldenImage(self.spec(env={"TEST_MODE": "1"}))
+        devices = golden.clone(4, "Shard", boot=True, max_workers=4)
+
+        self.assertEqual(
+            sorted(device.name for device in devices), [f"Shard {i}" for i in range(1, 5)]
+        )
+        self.assertEqual(self.creates(), 1)
+
+        for device in devices:
+            self.assertEqual(device.state, "Booted")
+            self.assertIn("com.example.App", self.fake.apps[device.udid])
+            self.assertEqual(device.getenv("TEST_MODE"), "1")
+
+    def test_clone_failure(self):
+        """Test that clones are cleaned up if any of them fail."""
+        golden = GoldenImage(self.spec(env={"TEST_MODE": "1"}))
+        golden.ensure()
+
+        # Booted devices can't be cloned
+        golden.device().boot()
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            golden.clone(2)
+
+        self.assertEqual(len(self.device_names()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+"""Test reconciling devices with a desired inventory."""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from typing import Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.reconcile import (
+    ActionKind,
+    ActionStatus,
+    DeviceSpec,
+    FleetSpec,
+    FleetSpecError,
+    plan_reconcile,
+    reconcile,
+)
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+_SPEC = {
+    "devices": [
+        {"name": "CI iPhone", "device_type": "iPhone 15", "runtime": "iOS 17.0"},
+        {
+            "name": "CI Watch",
+            "device_type": "Apple Watch Series 9 (45mm)",
+            "runtime": "watchOS 10.0",
+        },
+        {
+            "name": "CI iPad",
+            "device_type": "iPad Pro (12.9-inch) (6th generation)",
+            "runtime": "iOS 17.0",
+        },
+    ],
+    "pairs": [{"watch": "CI Watch", "phone": "CI iPhone"}],
+}
+
+
+class TestReconcile(FakeSimctlTestCase):
+    """Test reconciling devices with a desired inventory."""
+
+    def devices(self) -> Dict[str, isim.Device]:
+        """Return every device, keyed by name."""
+        return {
+            device.name: device for devices in isim.Device.list_all().values() for device in devices
+        }
+
+    def kinds(self, spec: FleetSpec) -> List[ActionKind]:
+        """Return the kind of each action in the plan for a spec."""
+        return [action.kind for action in plan_reconcile(spec).actions]
+
+    def test_from_scratch(self):
+        """Test creating and pairing everything, then that nothing more is needed."""
+        spec = FleetSpec.from_dict(_SPEC)
+        plan = plan_reconcile(spec)
+        self.assertEqual(
+            [action.kind for action in plan.actions], [ActionKind.CREATE] * 3 + [ActionKind.PAIR]
+        )
+
+        # The pair waits for both of its devices
+        self.assertCountEqual(plan.actions[3].dependencies, plan.actions[:2])
+
+        self.assertTrue(plan.execute(max_workers=4))
+        self.assertTrue(all(action.status == ActionStatus.DONE for action in plan.actions))
+
+        devices = self.devices()
+        self.assertEqual(set(devices), {"CI iPhone", "CI Watch", "CI iPad"})
+
+        pairs = isim.DevicePair.list_all()
+        self.assertEqual(len(pairs), 1)
+        self.assertEqual(pairs[0].watch_udid, devices["CI Watch"].udid)
+        self.assertEqual(pairs[0].phone_udid, devices["CI iPhone"].udid)
+
+        self.assertFalse(plan_reconcile(spec))
+
+    def test_minimal_plan(self):
+        """Test that existing devices are renamed, upgraded or replaced as needed."""
+        iphone = isim.DeviceType.from_name("iPhone 15")
+        ios_16 = isim.Runtime.from_name("iOS 16.4")
+        old_iphone = isim.Device.create("CI iPhone", iphone, ios_16)
+        renamed = isim.Device.create(
+            "Old Watch",
+            isim.DeviceType.from_name("Apple Watch Series 9 (45mm)"),
+            isim.Runtime.from_name("watchOS 10.0"),
+        )
+        wrong_type = isim.Device.create("CI iPad", iphone, isim.Runtime.from_name("iOS 17.0"))
+        unmanaged = isim.Device.create("Someone Else's", iphone, ios_16)
+
+        spec = FleetSpec.from_dict(_SPEC)
+        spec.devices[1].udid = renamed.udid
+
+        self.assertEqual(
+            self.kinds(spec),
+            [
+                ActionKind.UPGRADE,
+                ActionKind.RENAME,
+                ActionKind.DELETE,
+                ActionKind.CREATE,
+                ActionKind.PAIR,
+            ],
+        )
+
+        self.assertEqual(reconcile(spec).failed, [])
+
+        devices = self.devices()
+        self.assertEqual(devices["CI iPhone"].udid, old_iphone.udid)
+        self.assertEqual(
+            devices["CI iPhone"].runtime_id, "com.apple.CoreSimulator.SimRuntime.iOS-17-0"
+        )
+        self.assertEqual(devices["CI Watch"].udid, renamed.udid)
+        self.assertNotEqual(devices["CI iPad"].udid, wrong_type.udid)
+        self.assertEqual(devices["Someone Else's"].udid, unmanaged.udid)
+
+        # A device given by UDID is never replaced
+        spec.devices[2].udid = unmanaged.udid
+
+        with self.assertRaises(FleetSpecError):
+            plan_reconcile(spec)
+
+    def test_prune(self):
+        """Test that pruning removes anything not in the spec, reusing devices where it can."""
+        iphone = isim.DeviceType.from_name("iPhone 15")
+        ios_17 = isim.Runtime.from_name("iOS 17.0")
+        spare = isim.Device.create("Spare", iphone, ios_17)
+        isim.Device.create("Extra", iphone, isim.Runtime.from_name("iOS 16.4"))
+
+        spec = FleetSpec.from_dict(dict(_SPEC, prune=True))
+        reconcile(spec)
+        devices = self.devices()
+        self.assertEqual(set(devices), {"CI iPhone", "CI Watch", "CI iPad"})
+        self.assertEqual(devices["CI iPhone"].udid, spare.udid)
+
+        # Pairs which aren't in the spec are removed too
+        watch = isim.Device.create(
+            "Another Watch",
+            isim.DeviceType.from_name("Apple Watch Series 9 (45mm)"),
+            isim.Runtime.from_name("watchOS 10.0"),
+        )
+        self.fake.pairs.clear()
+        devices["CI iPhone"].pair(watch)
+
+        self.assertEqual(self.kinds(spec), [ActionKind.DELETE, ActionKind.PAIR])
+
+        spec = FleetSpec.from_dict(dict(_SPEC, pairs=[], prune=True))
+        devices["CI iPhone"].pair(devices["CI Watch"])
+        self.assertEqual(self.kinds(spec), [ActionKind.DELETE, ActionKind.UNPAIR])
+
+    def test_other_pairs(self):
+        """Test that pairs outside the spec are only removed to free a watch in it."""
+        spec = FleetSpec.from_dict(dict(_SPEC, devices=_SPEC["devices"][:2]))
+        reconcile(spec)
+        devices = self.devices()
+        apple_watch = isim.DeviceType.from_name("Apple Watch Series 9 (45mm)")
+        watchos = isim.Runtime.from_name("watchOS 10.0")
+
+        # A phone can have several watches, so another one is left alone
+        personal_watch = isim.Device.create("Personal Watch", apple_watch, watchos)
+        devices["CI iPhone"].pair(personal_watch)
+        self.assertFalse(plan_reconcile(spec))
+
+        # But a watch can only have one phone
+        personal_phone = isim.Device.create(
+            "Personal iPhone",
+            isim.DeviceType.from_name("iPhone 15"),
+            isim.Runtime.from_name("iOS 17.0"),
+        )
+        self.fake.pairs = {
+            identifier: pair
+            for identifier, pair in self.fake.pairs.items()
+            if pair["watch"]["udid"] != devices["CI Watch"].udid
+        }
+        devices["CI Watch"].pair(personal_phone)
+
+        plan = plan_reconcile(spec)
+        self.assertEqual(
+            [action.kind for action in plan.actions], [ActionKind.UNPAIR, ActionKind.PAIR]
+        )
+        self.assertIn("CI Watch and Personal iPhone", plan.actions[0].description)
+        self.assertEqual(plan.actions[1].dependencies, [plan.actions[0]])
+
+    def test_failure_skips_dependents(self):
+        """Test that actions depending on a failed one are skipped."""
+        spec = FleetSpec(
+            [
+                DeviceSpec("CI iPhone", "iPhone 15", "iOS 17.0"),
+                DeviceSpec("CI Watch", "Apple Watch Series 9 (45mm)", "watchOS 10.0"),
+            ],
+            [("CI Watch", "CI iPhone")],
+        )
+        plan = plan_reconcile(spec)
+
+        # Make the watch impossible to create
+        self.fake.device_types = [
+            device_type
+            for device_type in self.fake.device_types
+            if "Watch" not in device_type["name"]
+        ]
+
+        finished: List[ActionKind] = []
+        self.assertFalse(plan.execute(progress=lambda action: finished.append(action.kind)))
+        self.assertEqual(
+            [action.status for action in plan.actions],
+            [ActionStatus.DONE, ActionStatus.FAILED, ActionStatus.SKIPPED],
+        )
+        self.assertIsNotNone(plan.actions[1].error)
+        self.assertCountEqual(finished, [ActionKind.CREATE, ActionKind.CREATE, ActionKind.PAIR])
+
+    def test_dry_run(self):
+        """Test that a dry run prints the plan without changing anything."""
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(output):
+            plan = reconcile(FleetSpec.from_dict(_SPEC), dry_run=True)
+
+        self.assertEqual(output.getvalue().splitlines(), plan.describe())
+        self.assertEqual(
+            output.getvalue().splitlines()[-1], "4. pair CI Watch and CI iPhone (after 1, 2)"
+        )
+        self.assertEqual(self.devices(), {})
+
+    def test_load(self):
+        """Test loading and validating specs."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "spec.json")
+
+            with open(path, "w", encoding="utf-8") as spec_file:
+                json.dump(_SPEC, spec_file)
+
+            self.assertEqual(FleetSpec.load(path).to_dict(), dict(_SPEC, prune=False))
+
+        with self.assertRaises(FleetSpecError):
+            FleetSpec.from_dict(dict(_SPEC, pairs=[{"watch": "Missing", "phone": "CI iPhone"}]))
+
+        with self.assertRaises(FleetSpecError):
+            FleetSpec.from_dict({"devices": _SPEC["devices"] * 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
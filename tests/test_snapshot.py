@@ -0,0 +1,242 @@
+"""Test simctl snapshots."""
+
+import copy
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+
+# pylint: enable=wrong-import-position
+
+# pylint: disable=line-too-long
+FAKE_LIST_OUTPUT = {
+    "devicetypes": [
+        {
+            "name": "Apple Fridge 1.0",
+            "bundlePath": "\\/Applications\\/Xcode.app\\/Contents\\/Developer\\/Platforms\\/iPhoneOS.platform\\/Library\\/Developer\\/CoreSimulator\\/Profiles\\/DeviceTypes\\/Apple Fridge.simdevicetype",
+            "identifier": "io.myers.isim.device-type.Apple-Fridge",
+        },
+        {
+            "name": "Apple Toaster 1.0",
+            "bundlePath": "\\/Applications\\/Xcode.app\\/Contents\\/Developer\\/Platforms\\/WatchOS.platform\\/Library\\/Developer\\/CoreSimulator\\/Profiles\\/DeviceTypes\\/Apple Toaster.simdevicetype",
+            "identifier": "io.myers.isim.device-type.Apple-Toaster",
+        },
+    ],
+    "runtimes": [
+        {
+            "buildversion": "ABC123",
+            "bundlePath": "\\/Library\\/Developer\\/CoreSimulator\\/Profiles\\/Runtimes\\/iOS 99.0.simruntime",
+            "identifier": "com.apple.CoreSimulator.SimRuntime.iOS-99-0",
+            "isAvailable": True,
+            "name": "iOS 99.0",
+            "version": "99.0",
+        },
+        {
+            "buildversion": "DEF456",
+            "bundlePath": "\\/Library\\/Developer\\/CoreSimulator\\/Profiles\\/Runtimes\\/watchOS 99.0.simruntime",
+            "identifier": "com.apple.CoreSimulator.SimRuntime.watchOS-99-0",
+            "isAvailable": True,
+            "name": "watchOS 99.0",
+            "version": "99.0",
+        },
+    ],
+    "devices": {
+        "com.apple.CoreSimulator.SimRuntime.iOS-99-0": [
+            {
+                "udid": "9B9A9D5B-6D5E-4C61-8A40-4D4B36C0B6F1",
+                "isAvailable": True,
+                "deviceTypeIdentifier": "io.myers.isim.device-type.Apple-Fridge",
+                "state": "Shutdown",
+                "name": "Kitchen Fridge",
+            },
+            {
+                "udid": "0E5A7E44-1B0B-4B55-8C5A-1F9F1BB8A0D2",
+                "isAvailable": False,
+                "deviceTypeIdentifier": "io.myers.isim.device-type.Apple-Fridge",
+                "state": "Shutdown",
+                "name": "Broken Fridge",
+            },
+        ],
+        "com.apple.CoreSimulator.SimRuntime.watchOS-99-0": [
+            {
+                "udid": "5C3F1F7A-2A5E-4D36-9C7C-8B3C8E1E6B0F",
+                "isAvailable": True,
+                "deviceTypeIdentifier": "io.myers.isim.device-type.Apple-Toaster",
+                "state": "Booted",
+                "name": "Kitchen Toaster",
+            },
+        ],
+    },
+    "pairs": {
+        "D4B4A2B1-3C1E-4F0B-9A0D-2E2A1B6C7D8E": {
+            "watch": {
+                "name": "Kitchen Toaster",
+                "udid": "5C3F1F7A-2A5E-4D36-9C7C-8B3C8E1E6B0F",
+                "state": "Booted",
+            },
+            "phone": {
+                "name": "Kitchen Fridge",
+                "udid": "9B9A9D5B-6D5E-4C61-8A40-4D4B36C0B6F1",
+                "state": "Shutdown",
+            },
+            "state": "(active, disconnected)",
+        }
+    },
+}
+# pylint: enable=line-too-long
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test the single-shot simctl list snapshot."""
+
+    def test_collections(self):
+        """Test that every collection is built from the one snapshot."""
+        snapshot = isim.SimctlSnapshot(FAKE_LIST_OUTPUT)
+
+        runtimes = isim.Runtime.list_all(snapshot)
+        self.assertEqual(
+            [runtime.identifier for runtime in runtimes],
+            [runtime["identifier"] for runtime in FAKE_LIST_OUTPUT["runtimes"]],
+        )
+
+        device_types = isim.DeviceType.list_all(snapshot)
+        self.assertEqual(len(device_types), 2)
+
+        device_pairs = isim.DevicePair.list_all(snapshot)
+        self.assertEqual(len(device_pairs), 1)
+        self.assertEqual(device_pairs[0].watch_udid, "5C3F1F7A-2A5E-4D36-9C7C-8B3C8E1E6B0F")
+
+        devices = isim.Device.list_all(snapshot)
+        self.assertEqual(len(devices["com.apple.CoreSimulator.SimRuntime.iOS-99-0"]), 1)
+        self.assertEqual(len(devices["com.apple.CoreSimulator.SimRuntime.watchOS-99-0"]), 1)
+
+    def test_lookups(self):
+        """Test that lookups resolve against the snapshot."""
+        snapshot = isim.SimctlSnapshot(FAKE_LIST_OUTPUT)
+
+        device = isim.Device.from_identifier("9B9A9D5B-6D5E-4C61-8A40-4D4B36C0B6F1", snapshot)
+        self.assertEqual(device.name, "Kitchen Fridge")
+        self.assertEqual(device.runtime(snapshot).name, "iOS 99.0")
+        self.assertEqual(device.device_type(snapshot).name, "Apple Fridge 1.0")
+
+        device = isim.Device.from_name("Kitchen Toaster", snapshot=snapshot)
+        self.assertIsNotNone(device)
+
+        with self.assertRaises(isim.DeviceNotFoundError):
+            _ = isim.Device.from_identifier("Hodor", snapshot)
+
+        runtime = isim.Runtime.from_name_or_id("iOS 99.0", snapshot)
+        self.assertEqual(isim.Runtime.from_name_or_id(runtime.identifier, snapshot), runtime)
+        device_type = isim.DeviceType.from_name_or_id(
+            "io.myers.isim.device-type.Apple-Fridge", snapshot
+        )
+        self.assertEqual(device_type.name, "Apple Fridge 1.0")
+
+        with self.assertRaises(isim.RuntimeNotFoundError):
+            _ = isim.Runtime.from_name("Hodor", snapshot)
+
+        with self.assertRaises(isim.RuntimeNotFoundError):
+            _ = isim.Runtime.from_name_or_id("Hodor", snapshot)
+
+        with self.assertRaises(isim.DeviceTypeNotFoundError):
+            _ = isim.DeviceType.from_id("Hodor", snapshot)
+
+    def test_index_reused(self):
+        """Test that the lookup indexes are only built once per snapshot."""
+        snapshot = isim.SimctlSnapshot(FAKE_LIST_OUTPUT)
+        self.assertIs(isim.Device.index(snapshot), isim.Device.index(snapshot))
+        self.assertIs(isim.Runtime.index(snapshot), isim.Runtime.index(snapshot))
+        self.assertIs(isim.DeviceType.index(snapshot), isim.DeviceType.index(snapshot))
+
+        other_snapshot = isim.SimctlSnapshot(copy.deepcopy(FAKE_LIST_OUTPUT))
+        self.assertIsNot(isim.Device.index(snapshot), isim.Device.index(other_snapshot))
+
+    def test_from_name_multiple_matches(self):
+        """Test that the runtime is used to pick between devices with the same name."""
+        raw_info = copy.deepcopy(FAKE_LIST_OUTPUT)
+        watch = raw_info["devices"]["com.apple.CoreSimulator.SimRuntime.watchOS-99-0"][0]
+        watch["name"] = "Kitchen Fridge"
+        snapshot = isim.SimctlSnapshot(raw_info)
+
+        with self.assertRaises(isim.device.MultipleMatchesException):
+            _ = isim.Device.from_name("Kitchen Fridge", snapshot=snapshot)
+
+        runtime = isim.Runtime.from_name("watchOS 99.0", snapshot)
+        device = isim.Device.from_name("Kitchen Fridge", runtime, snapshot)
+        self.assertIsNotNone(device)
+        assert device is not None
+        self.assertEqual(device.udid, watch["udid"])
+
+    def test_returned_collections_are_copies(self):
+        """Test that modifying a returned collection doesn't modify the snapshot."""
+        snapshot = isim.SimctlSnapshot(FAKE_LIST_OUTPUT)
+        runtimes = isim.Runtime.list_all(snapshot)
+        runtimes.clear()
+        self.assertEqual(len(isim.Runtime.list_all(snapshot)), 2)
+
+    def test_returned_devices_are_not_shared(self):
+        """Test that changing a device returned by a lookup doesn't change the snapshot."""
+        snapshot = isim.SimctlSnapshot(FAKE_LIST_OUTPUT)
+        udid = "9B9A9D5B-6D5E-4C61-8A40-4D4B36C0B6F1"
+
+        device = isim.Device.from_identifier(udid, snapshot)
+        self.assertIsNot(device, isim.Device.from_identifier(udid, snapshot))
+
+        device.name = "Garage Fridge"
+        device.runtime_id = "com.apple.CoreSimulator.SimRuntime.watchOS-99-0"
+
+        self.assertEqual(isim.Device.from_identifier(udid, snapshot).name, "Kitchen Fridge")
+        self.assertIsNotNone(isim.Device.from_name("Kitchen Fridge", snapshot=snapshot))
+        self.assertIsNone(isim.Device.from_name("Garage Fridge", snapshot=snapshot))
+        self.assertEqual(
+            [
+                device.udid
+                for device in snapshot.devices()["com.apple.CoreSimulator.SimRuntime.iOS-99-0"]
+            ],
+            [udid],
+        )
+
+    def test_empty_pairs(self):
+        """Test that a host without any pairs gives an empty list rather than an error."""
+        snapshot = isim.SimctlSnapshot(dict(FAKE_LIST_OUTPUT, pairs={}))
+        self.assertEqual(isim.DevicePair.list_all(snapshot), [])
+
+    def test_compact_models(self):
+        """Test that models use slots and share the raw output rather than copying it."""
+        snapshot = isim.SimctlSnapshot(FAKE_LIST_OUTPUT)
+        device = isim.Device.from_identifier("9B9A9D5B-6D5E-4C61-8A40-4D4B36C0B6F1", snapshot)
+        raw_device = FAKE_LIST_OUTPUT["devices"]["com.apple.CoreSimulator.SimRuntime.iOS-99-0"][0]
+        self.assertIs(device.raw_info, raw_device)
+
+        items = [device] + isim.Runtime.list_all(snapshot) + isim.DeviceType.list_all(snapshot)
+        items += isim.DevicePair.list_all(snapshot)
+
+        for item in items:
+            self.assertFalse(hasattr(item, "__dict__"))
+
+    def test_identity_equality(self):
+        """Test that equality and hashing are based on the identifier."""
+        snapshot = isim.SimctlSnapshot(FAKE_LIST_OUTPUT)
+        raw_info = copy.deepcopy(FAKE_LIST_OUTPUT)
+        device_info = raw_info["devices"]["com.apple.CoreSimulator.SimRuntime.iOS-99-0"][0]
+        device_info["state"] = "Booted"
+        changed_snapshot = isim.SimctlSnapshot(raw_info)
+
+        device = isim.Device.from_identifier(device_info["udid"], snapshot)
+        changed_device = isim.Device.from_identifier(device_info["udid"], changed_snapshot)
+        self.assertEqual(device, changed_device)
+        self.assertEqual(hash(device), hash(changed_device))
+        self.assertEqual(len({device, changed_device}), 1)
+
+        runtimes = isim.Runtime.list_all(snapshot)
+        self.assertNotEqual(runtimes[0], runtimes[1])
+        self.assertEqual(set(runtimes), set(isim.Runtime.list_all(changed_snapshot)))
+
+    def test_missing_type(self):
+        """Test that a missing list type is an error."""
+        snapshot = isim.SimctlSnapshot({"devices": {}})
+        with self.assertRaises(ValueError):
+            _ = isim.Runtime.list_all(snapshot)
@@ -0,0 +1,171 @@
+"""Test installing from the staged bundle cache."""
+
+import os
+import plistlib
+import sys
+import tempfile
+import unittest
+from typing import List, Tuple
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim import staging
+from isim.hashing import hash_tree
+from isim.staging import BundleCache, InstallPipeline, InstallStatus
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestStaging(FakeSimctlTestCase):
+    """Test installing from the staged bundle cache."""
+
+    devices_per_pairing = 2
+
+    app_path: str
+    cache: BundleCache
+    devices: List[isim.Device]
+
+    def setUp(self):
+        super().setUp()
+
+        temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(temp_dir.cleanup)
+        self.cache = BundleCache(os.path.join(temp_dir.name, "cache"))
+        self.app_path = os.path.join(temp_dir.name, "build", "Example.app")
+        os.makedirs(os.path.join(self.app_path, "Frameworks"))
+
+        with open(os.path.join(self.app_path, "Info.plist"), "wb") as info_file:
+            plistlib.dump({"CFBundleIdentifier": "com.example.app"}, info_file)
+
+        with open(os.path.join(self.app_path, "Frameworks", "Lib"), "wb") as lib_file:
+            lib_file.write(b"library")
+
+        os.symlink("Frameworks/Lib", os.path.join(self.app_path, "Lib"))
+
+        self.devices = [
+            device
+            for devices in isim.Device.list_all().values()
+            for device in devices
+            if device.runtime_id.endswith("iOS-17-0")
+        ][:4]
+
+        for device in self.devices:
+            device.boot()
+
+    def test_stage(self):
+        """Test that a bundle is copied once, under its content hash."""
+        staged_path = self.cache.stage(self.app_path)
+        digest = hash_tree(self.app_path)
+
+        self.assertEqual(staged_path, os.path.join(self.cache.path, digest, "Example.app"))
+        self.assertEqual(hash_tree(staged_path), digest)
+        self.assertTrue(os.path.islink(os.path.join(staged_path, "Lib")))
+
+        with mock.patch("shutil.copytree") as copytree:
+            self.assertEqual(self.cache.stage(self.app_path), staged_path)
+            copytree.assert_not_called()
+
+    def test_digest_reused_across_runs(self):
+        """Test that an unchanged bundle isn't hashed again, even by a new cache object."""
+        digest = self.cache.digest(self.app_path)
+
+        with mock.patch.object(staging, "hash_tree") as hash_tree_mock:
+            self.assertEqual(BundleCache(self.cache.path).digest(self.app_path), digest)
+            hash_tree_mock.assert_not_called()
+
+        with open(os.path.join(self.app_path, "Frameworks", "Lib"), "wb") as lib_file:
+            lib_file.write(b"rebuilt library")
+
+        self.assertNotEqual(BundleCache(self.cache.path).digest(self.app_path), digest)
+
+    def test_single_file_bundle(self):
+        """Test that a rebuilt single file bundle gets a new digest and staged copy."""
+        bundle_path = os.path.join(os.path.dirname(self.app_path), "Example.ipa")
+
+        with open(bundle_path, "w", encoding="utf-8") as bundle_file:
+            bundle_file.write("v1")
+
+        first = self.cache.stage(bundle_path)
+
+        with open(bundle_path, "w", encoding="utf-8") as bundle_file:
+            bundle_file.write("v2 with more")
+
+        second = self.cache.stage(bundle_path)
+        self.assertNotEqual(first, second)
+
+        with open(second, "r", encoding="utf-8") as staged_file:
+            self.assertEqual(staged_file.read(), "v2 with more")
+
+    def test_prune(self):
+        """Test that the least recently used bundles are removed first."""
+        digests = []
+
+        for version in range(3):
+            with open(os.path.join(self.app_path, "Frameworks", "Lib"), "wb") as lib_file:
+                lib_file.write(b"library" * 1000 + bytes([version]))
+
+            staged_path = self.cache.stage(self.app_path)
+            digest = os.path.basename(os.path.dirname(staged_path))
+            os.utime(os.path.dirname(staged_path), (1000 + version, 1000 + version))
+            digests.append(digest)
+
+        # Using a bundle again makes it the most recently used
+        self.cache.stage(os.path.join(self.cache.path, digests[0], "Example.app"))
+
+        self.assertEqual(self.cache.prune(max_size=15000, keep=[digests[1]]), [digests[2]])
+        self.assertEqual(sorted(os.listdir(self.cache.path)), sorted(digests[:2] + ["hashes.json"]))
+
+        self.assertEqual(self.cache.prune(max_age=3600), [digests[1]])
+
+        # A cache with limits prunes itself, but never the bundle just staged
+        cache = BundleCache(self.cache.path, max_size=0)
+        staged_path = cache.stage(self.app_path)
+        self.assertEqual(
+            os.listdir(cache.path).count(os.path.basename(os.path.dirname(staged_path))), 1
+        )
+        self.assertEqual(len([name for name in os.listdir(cache.path) if name != "hashes.json"]), 1)
+
+    def test_install(self):
+        """Test installing on many devices, with the status of each one."""
+        updates: List[Tuple[str, InstallStatus]] = []
+        pipeline = InstallPipeline(self.cache, max_workers=2)
+        results = pipeline.install(
+            self.devices[:3],
+            self.app_path,
+            progress=lambda udid, status: updates.append((udid, status)),
+        )
+
+        self.assertEqual(list(results), [device.udid for device in self.devices[:3]])
+        self.assertTrue(all(r.status == InstallStatus.INSTALLED for r in results.values()))
+        self.assertEqual(
+            {udid: install.status for udid, install in pipeline.statuses().items()},
+            {udid: install.status for udid, install in results.items()},
+        )
+
+        staged_path = self.cache.staged_path(self.app_path, hash_tree(self.app_path))
+        self.assertEqual(
+            {self.fake.apps[device.udid]["com.example.app"] for device in self.devices[:3]},
+            {staged_path},
+        )
+
+        for device in self.devices[:3]:
+            self.assertEqual(
+                [status for udid, status in updates if udid == device.udid],
+                [InstallStatus.PENDING, InstallStatus.INSTALLING, InstallStatus.INSTALLED],
+            )
+
+        # Devices which already have it are skipped, and failures are reported
+        self.devices[3].shutdown()
+        results = pipeline.install(self.devices, self.app_path)
+        self.assertEqual(
+            [result.status for result in results.values()],
+            [InstallStatus.SKIPPED] * 3 + [InstallStatus.FAILED],
+        )
+        self.assertIsNotNone(results[self.devices[3].udid].error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,267 @@
+"""Test streaming the output of long running commands."""
+
+import asyncio
+import concurrent.futures
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.aio import AsyncDevice
+from isim.executor import CommandExecutor, CommandProcess
+from isim.instrumentation import CommandRecord, add_hook, remove_hook
+
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+# Prints a line a second until it is stopped
+_CHATTY_SCRIPT = """
+import itertools, sys, time
+for index in itertools.count():
+    print(f"line {index}", flush=True)
+    time.sleep(1)
+"""
+
+# Prints nothing until it is stopped
+_SILENT_SCRIPT = """
+import time
+time.sleep(60)
+"""
+
+# Writes the "video" when interrupted, like `simctl io recordVideo`
+_RECORD_SCRIPT = """
+import signal, sys, time
+signal.signal(signal.SIGINT, signal.default_int_handler)
+try:
+    print("Recording started", flush=True)
+    time.sleep(60)
+except KeyboardInterrupt:
+    with open(sys.argv[1], "w") as video:
+        video.write("finished")
+"""
+
+
+class ScriptExecutor(CommandExecutor):
+    """Runs a Python script in place of each simctl command."""
+
+    scripts: Dict[str, str]
+    started: List[List[str]]
+
+    def __init__(self, scripts: Dict[str, str]) -> None:
+        self.scripts = scripts
+        self.started = []
+
+    def run(self, args: List[str], timeout: Optional[float] = None) -> str:
+        raise NotImplementedError()
+
+    def start(self, args: List[str], timeout: Optional[float] = None) -> CommandProcess:
+        self.started.append(args)
+        key = args[2] if args[0] == "io" else args[0]
+        # pylint: disable=consider-using-with
+        process = subprocess.Popen(
+            [sys.executable, "-c", self.scripts[key], args[-1]],
+            universal_newlines=True,
+            stdout=subprocess.PIPE,
+        )
+        # pylint: enable=consider-using-with
+        assert process.stdout is not None
+        return CommandProcess(args, process.stdout, process, timeout=timeout)
+
+
+class TestStreaming(FakeSimctlTestCase):
+    """Test streaming the output of long running commands."""
+
+    devices_per_pairing = 1
+
+    device: isim.Device
+
+    def setUp(self):
+        super().setUp()
+        runtime_id = "com.apple.CoreSimulator.SimRuntime.iOS-17-0"
+        self.device = isim.Device(self.fake.devices[runtime_id][0], runtime_id)
+
+    def test_spawn_streaming(self):
+        """Test that output arrives while the process runs, and closing stops it."""
+        executor = ScriptExecutor({"spawn": _CHATTY_SCRIPT})
+        self.use_executor(executor)
+
+        with self.device.spawn_streaming("/usr/bin/log stream") as process:
+            self.assertEqual(process.readline(), "line 0")
+            self.assertIsNone(process.poll())
+
+        self.assertIsNotNone(process.returncode)
+        self.assertEqual(executor.started, [["spawn", self.device.udid, "/usr/bin/log", "stream"]])
+
+    def test_instrumentation(self):
+        """Test that streamed commands are recorded with their output, and stopping isn't a failure."""
+        self.use_executor(ScriptExecutor({"spawn": _CHATTY_SCRIPT}))
+        records: List[CommandRecord] = []
+        add_hook(records.append)
+        self.addCleanup(remove_hook, records.append)
+
+        with self.device.spawn_streaming("/usr/bin/log stream") as process:
+            self.assertEqual(process.readline(), "line 0")
+
+        self.assertTrue(process.stopped)
+        self.assertEqual(len(records), 1)
+        self.assertIsNone(records[0].error)
+        self.assertGreaterEqual(records[0].output_size, len("line 0\n"))
+
+        with isim.base_types.command_timeout(0.5):
+            process = self.device.spawn_streaming("/usr/bin/log stream")
+
+        with self.assertRaises(subprocess.TimeoutExpired):
+            for _ in process:
+                pass
+
+        self.assertIsInstance(records[1].error, subprocess.TimeoutExpired)
+
+    def test_async_iteration(self):
+        """Test that output can be read from async code."""
+        self.use_executor(ScriptExecutor({"spawn": _CHATTY_SCRIPT}))
+
+        async def first_lines() -> List[str]:
+            lines = []
+
+            async with await AsyncDevice(self.device).spawn_streaming("tail -f x") as process:
+                async for line in process:
+                    lines.append(line)
+                    if len(lines) == 2:
+                        break
+
+            self.assertIsNotNone(process.returncode)
+            return lines
+
+        self.assertEqual(asyncio.run(first_lines()), ["line 0", "line 1"])
+
+    def test_idle_async_streams(self):
+        """Test that idle async readers don't tie up the event loop's worker threads."""
+        self.use_executor(ScriptExecutor({"spawn": _SILENT_SCRIPT}))
+        processes = [self.device.spawn_streaming("sleep") for _ in range(4)]
+
+        for process in processes:
+            self.addCleanup(process.close, 0)
+
+        async def use_executor_while_reading() -> int:
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=2))
+            readers = [asyncio.ensure_future(process.readline_async()) for process in processes]
+            await asyncio.sleep(0.1)
+
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(None, lambda: 42), 5)
+            finally:
+                for reader in readers:
+                    reader.cancel()
+
+                await asyncio.gather(*readers, return_exceptions=True)
+
+        self.assertEqual(asyncio.run(use_executor_while_reading()), 42)
+
+    def test_async_timeout(self):
+        """Test that an async read which times out closes the command off the event loop."""
+        self.use_executor(ScriptExecutor({"spawn": _SILENT_SCRIPT}))
+
+        with isim.base_types.command_timeout(0.2):
+            process = self.device.spawn_streaming("sleep")
+
+        close_threads: List[int] = []
+        close = process.close
+
+        def slow_close(grace_period: float = 5.0) -> None:
+            close_threads.append(threading.get_ident())
+            time.sleep(0.3)
+            close(grace_period)
+
+        process.close = slow_close  # type: ignore
+
+        async def read_with_ticks() -> int:
+            ticks = 0
+
+            async def tick() -> None:
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.05)
+                    ticks += 1
+
+            ticker = asyncio.ensure_future(tick())
+
+            try:
+                with self.assertRaises(subprocess.TimeoutExpired):
+                    await process.readline_async()
+            finally:
+                ticker.cancel()
+
+            return ticks
+
+        loop_thread = threading.get_ident()
+        self.assertGreater(asyncio.run(read_with_ticks()), 5)
+        self.assertTrue(process.timed_out)
+        self.assertIsNotNone(process.returncode)
+        self.assertNotIn(loop_thread, close_threads)
+
+    def test_record_video(self):
+        """Test that closing a recording interrupts it so the video is finished."""
+        self.use_executor(ScriptExecutor({"recordVideo": _RECORD_SCRIPT}))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "video.mp4")
+
+            with self.device.record_video(path, codec="hevc") as recording:
+                self.assertEqual(recording.readline(), "Recording started")
+
+            with open(path, "r", encoding="utf-8") as video:
+                self.assertEqual(video.read(), "finished")
+
+            self.assertEqual(
+                recording.args, ["io", self.device.udid, "recordVideo", "--codec=hevc", path]
+            )
+
+            with self.assertRaises(FileExistsError):
+                self.device.record_video(path)
+
+            async def record_async(path: str) -> CommandProcess:
+                device = AsyncDevice(self.device)
+
+                async with await device.record_video(path, codec="h264") as recording:
+                    self.assertEqual(await recording.readline_async(), "Recording started")
+
+                return recording
+
+            recording = asyncio.run(record_async(os.path.join(temp_dir, "async.mp4")))
+            self.assertIn("--codec=h264", recording.args)
+
+    def test_launch_with_console(self):
+        """Test launching with the console attached, against the fake simctl."""
+        device = isim.Device.list_all()["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][0]
+        device.boot()
+        self.fake.apps[device.udid] = {"com.example.app": "/tmp/App.app"}
+
+        with device.launch_with_console(
+            "com.example.app", ["-verbose"], terminate_running_process=True
+        ) as process:
+            self.assertTrue(process.readline().startswith("com.example.app: "))
+
+        self.assertEqual(
+            self.fake.commands[-1],
+            [
+                "launch",
+                "--console-pty",
+                "--terminate-running-process",
+                device.udid,
+                "com.example.app",
+                "-verbose",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
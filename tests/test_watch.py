@@ -0,0 +1,116 @@
+"""Test watching for device changes."""
+
+import os
+import queue
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import isim
+from isim.watch import ChangeKind, DeviceEvent, DeviceWatcher
+from tests.fake_simctl_case import FakeSimctlTestCase
+
+# pylint: enable=wrong-import-position
+
+
+class TestDeviceWatcher(FakeSimctlTestCase):
+    """Test the device watcher."""
+
+    devices_per_pairing = 1
+
+    def first_device(self) -> isim.Device:
+        """Return an iOS 17 device."""
+        return isim.Device.list_all()["com.apple.CoreSimulator.SimRuntime.iOS-17-0"][0]
+
+    def test_poll(self):
+        """Test that polling reports only what changed."""
+        watcher = DeviceWatcher()
+        initial = watcher.poll()
+        self.assertEqual(len(initial), 10)
+        self.assertTrue(all(event.kind == ChangeKind.ADDED for event in initial))
+        self.assertEqual(watcher.poll(), [])
+
+        device = self.first_device()
+        device.boot()
+        device.rename("Renamed")
+
+        events = watcher.poll()
+        self.assertEqual(sorted(event.kind.value for event in events), ["renamed", "state_changed"])
+        self.assertTrue(all(event.device == device for event in events))
+        self.assertTrue(all(event.previous is not None for event in events))
+
+        device.delete()
+        events = watcher.poll()
+        self.assertEqual([event.kind for event in events], [ChangeKind.REMOVED])
+        self.assertEqual(events[0].device.name, "Renamed")
+
+    def test_adaptive_interval(self):
+        """Test that the interval backs off while nothing changes and resets on a change."""
+        watcher = DeviceWatcher(min_interval=1, max_interval=5, backoff=2)
+        watcher.poll()
+        self.assertEqual(watcher.interval, 1)
+
+        watcher.poll()
+        watcher.poll()
+        self.assertEqual(watcher.interval, 4)
+        watcher.poll()
+        self.assertEqual(watcher.interval, 5)
+
+        self.first_device().boot()
+        watcher.poll()
+        self.assertEqual(watcher.interval, 1)
+
+    def test_background(self):
+        """Test that commands run through isim wake a background watcher."""
+        events: "queue.Queue[DeviceEvent]" = queue.Queue()
+
+        with DeviceWatcher(events.put, min_interval=60, max_interval=60):
+            for _ in range(10):
+                self.assertEqual(events.get(timeout=5).kind, ChangeKind.ADDED)
+
+            device = self.first_device()
+            device.boot()
+
+            event = events.get(timeout=5)
+            self.assertEqual(event.kind, ChangeKind.STATE_CHANGED)
+            self.assertEqual(event.device.state, "Booted")
+
+    def test_callback_errors(self):
+        """Test that a failing callback is logged and doesn't stop the watcher."""
+        events: "queue.Queue[DeviceEvent]" = queue.Queue()
+
+        def callback(event: DeviceEvent) -> None:
+            events.put(event)
+            raise RuntimeError("Callback failed")
+
+        with self.assertLogs("isim", level="ERROR") as logs:
+            with DeviceWatcher(callback, min_interval=60, max_interval=60):
+                for _ in range(10):
+                    events.get(timeout=5)
+
+        self.assertEqual(len(logs.records), 10)
+
+    def test_stop_from_callback(self):
+        """Test that a watcher stopped from its own callback can be started again."""
+        stopped = threading.Event()
+
+        def callback(_: DeviceEvent) -> None:
+            watcher.stop()
+            stopped.set()
+
+        watcher = DeviceWatcher(callback, min_interval=60, max_interval=60)
+        watcher.start()
+        self.assertTrue(stopped.wait(5))
+
+        stopped.clear()
+        watcher.callback = lambda _: stopped.set()
+        watcher.start()
+        self.first_device().boot()
+        self.assertTrue(stopped.wait(5))
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()